@@ -0,0 +1,119 @@
+"""
+Capa de base de datos asíncrona (SQLAlchemy AsyncSession sobre asyncpg), opcional.
+
+Con ASYNC_DB_ENABLED los endpoints de lectura calientes se registran como async def
+(ver main.db_get): la consulta ya no ocupa un hilo del threadpool mientras espera a
+PostgreSQL, así que muchas peticiones concurrentes comparten el event loop.
+
+El cuerpo de cada endpoint sigue siendo el mismo código síncrono (crud, pagination,
+fulltext, totals); async_endpoint lo ejecuta con AsyncSession.run_sync, donde cada
+consulta se envía a asyncpg y se espera sin bloquear el loop. La respuesta se valida
+dentro de run_sync para que las relaciones perezosas (tags) se carguen ahí y no al
+serializar, fuera del contexto asíncrono.
+
+Si sqlalchemy[asyncio] (greenlet) o asyncpg no están instalados, AVAILABLE es False y
+la aplicación sigue con los endpoints síncronos (con un aviso si ASYNC_DB_ENABLED está
+activo). Ambos están comentados como opcionales en requirements.txt.
+"""
+
+import inspect
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Depends, Response
+from pydantic import TypeAdapter
+from sqlalchemy.engine import make_url
+
+try:
+    import asyncpg  # noqa: F401
+    import greenlet  # noqa: F401
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    AVAILABLE = True
+    _IMPORT_ERROR = None
+except ImportError as e:
+    AsyncSession = None
+    AVAILABLE = False
+    _IMPORT_ERROR = e
+
+import database
+import db_pool
+from config import ASYNC_DB_ENABLED, ASYNC_DB_STATEMENT_CACHE_SIZE
+
+engine = None
+SessionLocal = None
+
+
+def async_url(url: str) -> Tuple[Any, Dict[str, Any]]:
+    """DATABASE_URL (psycopg2) -> (URL postgresql+asyncpg, connect_args).
+    asyncpg no entiende sslmode en la URL: se pasa como ssl (por defecto require, como database.py).
+    """
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    ssl = query.pop("sslmode", "require")
+    if ASYNC_DB_STATEMENT_CACHE_SIZE <= 0:
+        # pgbouncer en modo transacción no conserva las sentencias preparadas entre transacciones
+        query["prepared_statement_cache_size"] = "0"
+    parsed = parsed.set(drivername="postgresql+asyncpg", query=query)
+    connect_args = {"statement_cache_size": max(0, ASYNC_DB_STATEMENT_CACHE_SIZE)}
+    if ssl != "disable":
+        connect_args["ssl"] = ssl
+    return parsed, connect_args
+
+
+def init(url: Optional[str] = None) -> bool:
+    """Crear el engine asíncrono (no conecta hasta la primera consulta)"""
+    global engine, SessionLocal
+    if not AVAILABLE:
+        return False
+    parsed, connect_args = async_url(url or database.DATABASE_URL)
+    engine = create_async_engine(parsed, connect_args=connect_args, **db_pool.engine_kwargs(async_engine=True))
+    db_pool.configure(engine.sync_engine, "async")
+    SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    return True
+
+
+def enabled() -> bool:
+    return ASYNC_DB_ENABLED and AVAILABLE
+
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+
+async def dispose() -> None:
+    if engine is not None:
+        await engine.dispose()
+
+
+def async_endpoint(sync_fn: Callable, response_model: Any = None) -> Callable:
+    """
+    Versión async def de un endpoint síncrono que recibe db: Session.
+    Misma firma (FastAPI lee los parámetros de __signature__) con db de get_db asíncrono.
+    """
+    signature = inspect.signature(sync_fn)
+    params = [
+        p.replace(annotation=AsyncSession, default=Depends(get_db)) if p.name == "db" else p
+        for p in signature.parameters.values()
+    ]
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+
+    def call(session, kwargs):
+        result = sync_fn(db=session, **kwargs)
+        if adapter is not None and not isinstance(result, Response):
+            result = adapter.validate_python(result, from_attributes=True)
+        return result
+
+    async def endpoint(db, **kwargs):
+        return await db.run_sync(call, kwargs)
+
+    # Sin functools.wraps: __wrapped__ haría que FastAPI viera la función síncrona
+    endpoint.__name__ = sync_fn.__name__
+    endpoint.__doc__ = sync_fn.__doc__
+    endpoint.__signature__ = signature.replace(parameters=params)
+    return endpoint
+
+
+if enabled():
+    init()
+elif ASYNC_DB_ENABLED:
+    print(f"⚠️ ASYNC_DB_ENABLED sin asyncpg/greenlet ({_IMPORT_ERROR}): se usan los endpoints síncronos")
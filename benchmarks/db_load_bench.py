@@ -0,0 +1,132 @@
+"""
+Prueba de carga de los endpoints de lectura calientes: síncronos (threadpool) frente a
+async def sobre asyncpg (ASYNC_DB_ENABLED, ver async_db.py).
+
+Arranca dos servidores uvicorn contra la misma DATABASE_URL, uno con cada modo, y
+lanza contra cada uno la misma mezcla de peticiones con N clientes concurrentes
+durante unos segundos. Muestra peticiones/segundo, latencias p50/p95/p99 y errores.
+
+Uso (desde la raíz del repo, con DATABASE_URL apuntando a un catálogo con datos):
+    python benchmarks/db_load_bench.py --concurrency 16 64 --duration 15
+
+Para medir servidores ya arrancados (por ejemplo detrás del proxy de producción):
+    python benchmarks/db_load_bench.py --url sync=http://host:8000 --url async=http://host:8001
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_TERMS = ["star", "the", "amor", "guerra", "noche", "man", "el", "de"]
+
+
+def request_mix(media_ids):
+    """Generador infinito de (path, params) con el reparto típico del frontend"""
+    rng = random.Random(1)
+    while True:
+        roll = rng.random()
+        if roll < 0.4:
+            yield "/medias", {"limit": 24, "skip": rng.choice([0, 24, 48]), "include_total": "true"}
+        elif roll < 0.6:
+            yield "/search", {"q": rng.choice(SEARCH_TERMS), "limit": 24}
+        elif roll < 0.85:
+            yield f"/medias/{rng.choice(media_ids)}", None
+        else:
+            yield "/posters-optimized", {"media_ids": ",".join(map(str, rng.sample(media_ids, min(24, len(media_ids)))))}
+
+
+def start_server(port: int, async_db: bool) -> subprocess.Popen:
+    env = dict(os.environ, ASYNC_DB_ENABLED="true" if async_db else "false",
+               SEARCH_INDEX_ENABLED="false", SIMILARITY_ENABLED="false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+
+
+def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/medias", params={"limit": 1}, timeout=5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} no responde")
+
+
+async def load(url: str, media_ids, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    mix = request_mix(media_ids)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path, params = next(mix)
+                started = time.perf_counter()
+                try:
+                    r = await client.get(path, params=params)
+                    ok = r.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    return len(latencies) / elapsed, pct(0.5), pct(0.95), pct(0.99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga sync vs async de los endpoints de lectura")
+    parser.add_argument("--url", action="append", default=[], help="nombre=url de un servidor ya arrancado")
+    parser.add_argument("--port", type=int, default=8100, help="Primer puerto para los servidores lanzados")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--duration", type=float, default=15)
+    args = parser.parse_args()
+
+    servers = []
+    if args.url:
+        targets = [tuple(item.split("=", 1)) for item in args.url]
+    else:
+        targets = []
+        for offset, (name, is_async) in enumerate((("sync", False), ("async", True))):
+            port = args.port + offset
+            servers.append(start_server(port, is_async))
+            targets.append((name, f"http://127.0.0.1:{port}"))
+    try:
+        for _, url in targets:
+            wait_ready(url)
+        media_ids = [m["id"] for m in httpx.get(f"{targets[0][1]}/medias", params={"limit": 200}).json()] or [1]
+        print(f"{'modo':8} {'clientes':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errores':>8}")
+        for concurrency in args.concurrency:
+            for name, url in targets:
+                rps, p50, p95, p99, errors = asyncio.run(load(url, media_ids, concurrency, args.duration))
+                print(f"{name:8} {concurrency:8d} {rps:9.1f} {p50:9.1f} {p95:9.1f} {p99:9.1f} {errors:8d}")
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
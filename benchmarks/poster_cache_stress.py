@@ -0,0 +1,113 @@
+"""
+Prueba de estrés del cache de portadas en memoria.
+
+Varios hilos llaman a get_batch_poster_cache/set_batch_poster_cache sobre claves
+solapadas (como hace el threadpool de FastAPI) y se comprueba que:
+  - cada valor leído corresponde a su clave (sin mezclas entre hilos),
+  - los contadores de estadísticas cuadran con las operaciones hechas,
+  - la contabilidad de bytes del LRU coincide con las entradas presentes.
+
+Uso (desde la raíz del repo):
+    python benchmarks/poster_cache_stress.py --threads 32 --ops 2000 --keys 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import poster_cache  # noqa: E402
+
+
+def _value_for(key: str) -> str:
+    return f"https://image.tmdb.org/t/p/w500/{key}.jpg"
+
+
+def _worker(seed: int, ops: int, keys: list, batch: int, errors: list, counts: list) -> None:
+    rng = random.Random(seed)
+    lookups = 0
+    try:
+        for _ in range(ops):
+            sample = rng.sample(keys, batch)
+            if rng.random() < 0.3:
+                poster_cache.set_batch_poster_cache({k: _value_for(k) for k in sample})
+            else:
+                result = poster_cache.get_batch_poster_cache(sample)
+                lookups += len(sample)
+                for k, v in result.items():
+                    if v is not None and v != _value_for(k):
+                        errors.append(f"{k}: {v}")
+    except Exception as e:  # pragma: no cover - se informa al final
+        errors.append(repr(e))
+    counts.append(lookups)
+
+
+def _check_accounting() -> list:
+    problems = []
+    cache = poster_cache._memory_cache
+    for i, (shard, lock) in enumerate(zip(cache._shards, cache._locks)):
+        with lock:
+            expected = sum(entry[3] for entry in shard._data.values())
+            if expected != shard.bytes:
+                problems.append(f"shard {i}: bytes={shard.bytes} esperado={expected}")
+            if shard.bytes > shard.max_bytes:
+                problems.append(f"shard {i}: {shard.bytes} bytes supera el máximo {shard.max_bytes}")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=2000, help="operaciones por hilo")
+    parser.add_argument("--keys", type=int, default=5000, help="claves distintas")
+    parser.add_argument("--batch", type=int, default=20, help="claves por operación batch")
+    args = parser.parse_args()
+
+    # Forzar el backend en memoria aunque haya Redis local
+    poster_cache.redis_client = None
+    poster_cache.clear_poster_cache()
+    before = poster_cache.get_cache_stats()
+
+    keys = [poster_cache.get_cache_key(i, "es") for i in range(args.keys)]
+    errors: list = []
+    counts: list = []
+    threads = [
+        threading.Thread(target=_worker, args=(seed, args.ops, keys, args.batch, errors, counts))
+        for seed in range(args.threads)
+    ]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stats = poster_cache.get_cache_stats()
+    total_ops = args.threads * args.ops
+    lookups = sum(counts)
+    served = (stats["hits"] - before["hits"]) + (stats["stale_hits"] - before["stale_hits"])
+    missed = stats["misses"] - before["misses"]
+    if served + missed != lookups:
+        errors.append(f"estadísticas: hits+misses={served + missed} lecturas={lookups}")
+    errors.extend(_check_accounting())
+
+    print(f"hilos={args.threads} operaciones={total_ops} claves={args.keys} batch={args.batch}")
+    print(f"tiempo={elapsed:.2f}s  {total_ops / elapsed:,.0f} ops/s  {total_ops * args.batch / elapsed:,.0f} claves/s")
+    print(f"entradas={stats['memory_cache_size']} bytes={stats['memory_cache_bytes']} "
+          f"shards={stats['memory_shards']} evictions={stats['memory_evictions']} "
+          f"hit_rate={stats['hit_rate']:.1f}%")
+
+    if errors:
+        print(f"❌ {len(errors)} errores, p. ej.: {errors[:5]}")
+        return 1
+    print("✅ Sin inconsistencias")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
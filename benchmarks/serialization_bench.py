@@ -0,0 +1,140 @@
+"""
+Microbenchmark de la serialización de /medias con limit=200 (FAST_JSON_ENABLED).
+
+1. Petición completa /medias?limit=200 con TestClient sobre SQLite en memoria:
+   tiempo de CPU del proceso por petición con el camino normal de FastAPI
+   (response_model) y con fast_json (la consulta es la misma en ambos casos).
+   Se alternan rondas de los dos caminos y se da la mediana: el ruido de la máquina
+   es del mismo orden que la diferencia.
+2. Solo la serialización de las 200 filas ORM (con tags):
+   - encoder:   validar + model_dump + jsonable_encoder + json.dumps
+   - dump_json: validar + dump_json
+   - fast_json: fast_json.render (TypeAdapter precompilado, sin segunda validación)
+   - orjson:    orjson.dumps de los dicts ya volcados (si está instalado)
+
+El resultado depende de la versión de FastAPI (las recientes ya serializan el
+response_model con dump_json); conviene ejecutarlo con la que se despliega.
+
+Uso (desde la raíz del repo):
+    python benchmarks/serialization_bench.py --rows 2000 --limit 200 --repeat 50 --rounds 9
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import fastapi  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+import fast_json  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+
+
+def seed(session_factory, rows: int) -> None:
+    db = session_factory()
+    tags = [models.Tag(nombre=f"tag{i}") for i in range(8)]
+    db.add_all(tags)
+    for i in range(rows):
+        media = models.Media(
+            titulo=f"Título {i}", titulo_ingles=f"Title {i}", anio=1990 + i % 35, genero="Drama, Acción",
+            sinopsis="Sinopsis de ejemplo con algo de longitud. " * 8, director="Directora Ejemplo",
+            elenco=", ".join(f"Actor {j}" for j in range(12)), imagen=f"https://image.tmdb.org/t/p/w500/{i}.jpg",
+            estado="Finalizada", tipo="película" if i % 3 else "serie", nota_personal=(i % 10) or None,
+            nota_imdb=5 + (i % 50) / 10, anotacion_personal="## Notas\n- punto uno\n- punto dos\n" * 4,
+            fecha_creacion=datetime(2024, 1, 1, 0, 0, i % 60),
+        )
+        media.tags = tags[i % 3:i % 3 + 2]
+        db.add(media)
+    db.commit()
+    db.close()
+
+
+def cpu_per_call(fn, repeat: int) -> float:
+    fn()  # calentar (compilar adaptadores, caches de SQLAlchemy)
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Serialización de /medias (FAST_JSON_ENABLED)")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=9)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    Session_ = sessionmaker(bind=engine, autoflush=False)
+    seed(Session_, args.rows)
+
+    def override_db():
+        db = Session_()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_db] = override_db
+    client = TestClient(main.app)
+    params = {"limit": args.limit}
+
+    def request(enabled: bool):
+        main.FAST_JSON_ENABLED = enabled
+        return client.get("/medias", params=params)
+
+    same = request(False).json() == request(True).json()
+    print(f"FastAPI {fastapi.__version__}")
+    print(f"== /medias?limit={args.limit} (CPU ms por petición, mediana de {args.rounds} rondas "
+          f"alternas de {args.repeat}) ==")
+    rounds = {False: [], True: []}
+    for _ in range(args.rounds):
+        for enabled, times in rounds.items():
+            times.append(cpu_per_call(lambda: request(enabled), args.repeat))
+    main.FAST_JSON_ENABLED = False
+    normal, fast = statistics.median(rounds[False]), statistics.median(rounds[True])
+    print(f"FastAPI   {normal:8.2f} ms")
+    print(f"fast_json {fast:8.2f} ms   ({(fast / normal - 1) * 100:+.0f}%; mismo JSON: {same})")
+
+    db = Session_()
+    items = main.crud.get_medias_query(db, ordered=True).limit(args.limit).all()
+    for media in items:
+        media.tags  # cargadas de antemano: se mide solo la serialización
+    adapter = fast_json.adapter(List[schemas.Media])
+
+    def encoder():
+        value = adapter.validate_python(items, from_attributes=True)
+        return json.dumps(jsonable_encoder([m.model_dump() for m in value])).encode("utf-8")
+
+    def dump_json():
+        return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+    print(f"\n== Solo serialización de {len(items)} filas (CPU ms por llamada) ==")
+    print(f"encoder   {cpu_per_call(encoder, args.repeat):8.2f} ms")
+    print(f"dump_json {cpu_per_call(dump_json, args.repeat):8.2f} ms")
+    print(f"fast_json {cpu_per_call(lambda: fast_json.render(items, List[schemas.Media]), args.repeat):8.2f} ms")
+    orjson = fast_json.orjson
+    if orjson is not None:
+        dumped = adapter.dump_python(adapter.validate_python(items, from_attributes=True))
+        print(f"orjson    {cpu_per_call(lambda: orjson.dumps(dumped), args.repeat):8.2f} ms (solo volcado de dicts)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,124 @@
+"""
+Benchmark de los motores de similares sobre un catálogo sintético.
+
+Compara, para cada tamaño de catálogo:
+  - actual:   el cálculo de get_similares_para_media (intersección de sets de géneros
+              y keywords con cada media que comparte algún género)
+  - postings: similarity.Features (postings invertidos con IDF, Python puro)
+  - sparse:   similarity_matrix.SparseEngine (NumPy/SciPy), si está instalado
+
+Se mide el tiempo por media sobre una muestra y se extrapola al catálogo completo
+(con --full el motor sparse calcula todas las filas de verdad), además de una
+recomendación multi-semilla de 5 títulos con postings y con sparse.
+
+Uso (desde la raíz del repo):
+    python benchmarks/similarity_bench.py --sizes 10000 100000 --sample 100
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import similarity  # noqa: E402
+import similarity_matrix  # noqa: E402
+
+GENEROS = [f"genero{i}" for i in range(20)]
+
+
+def synthetic_catalog(size: int, seed: int):
+    """{media_id: (generos, keywords)} con keywords de frecuencia tipo Zipf"""
+    rng = random.Random(seed)
+    vocab = max(100, size // 5)
+    catalog = {}
+    for media_id in range(1, size + 1):
+        generos = set(rng.sample(GENEROS, rng.randint(1, 3)))
+        keywords = {min(vocab, int(rng.paretovariate(0.8))) for _ in range(rng.randint(0, 12))}
+        catalog[media_id] = (generos, keywords)
+    return catalog
+
+
+def actual_scores(catalog, media_id: int, n: int):
+    """Réplica en memoria de get_similares_para_media (sin la consulta SQL)"""
+    base_generos, base_keywords = catalog[media_id]
+    scores = []
+    for other, (generos, keywords) in catalog.items():
+        if other == media_id or not (base_generos & generos):
+            continue
+        score = len(base_generos & generos) + 2 * len(base_keywords & keywords)
+        if score > 0:
+            scores.append((score, other))
+    scores.sort(key=lambda x: (-x[0], -x[1]))
+    return scores[:n]
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def run(size: int, sample: int, top: int, full: bool, seed: int) -> None:
+    rng = random.Random(seed)
+    catalog = synthetic_catalog(size, seed)
+    docs = {
+        media_id: frozenset([("g", g) for g in generos] + [("k", k) for k in keywords])
+        for media_id, (generos, keywords) in catalog.items()
+    }
+    queries = rng.sample(sorted(catalog), min(sample, size))
+    print(f"\n== {size} medias (muestra de {len(queries)}) ==")
+
+    _, elapsed = _timed(lambda: [actual_scores(catalog, q, top) for q in queries])
+    per_item = elapsed / len(queries)
+    print(f"actual    {per_item * 1000:9.2f} ms/media   catálogo completo ~{per_item * size:9.1f} s")
+
+    features, build = _timed(similarity.Features, docs)
+    _, elapsed = _timed(lambda: [similarity.top_neighbours(features.scores(docs[q], exclude=q), top) for q in queries])
+    per_item = elapsed / len(queries)
+    print(f"postings  {per_item * 1000:9.2f} ms/media   catálogo completo ~{per_item * size + build:9.1f} s (índice {build:.2f} s)")
+
+    seeds = rng.sample(sorted(catalog), 5)
+    _, rec_py = _timed(similarity.recommend, features, seeds, top)
+
+    if not similarity_matrix.AVAILABLE:
+        print("sparse    numpy/scipy no instalados")
+        print(f"recomendación 5 semillas: postings {rec_py * 1000:.1f} ms")
+        return
+    engine, build = _timed(similarity_matrix.SparseEngine, docs)
+    if full:
+        _, elapsed = _timed(engine.compute_all, top)
+        print(f"sparse    catálogo completo {elapsed + build:9.1f} s (matriz {build:.2f} s)")
+    else:
+        rows = min(size, max(len(queries), 1000))
+        _, elapsed = _timed(engine.compute_all, top, 0, rows)
+        per_item = elapsed / rows
+        print(f"sparse    {per_item * 1000:9.2f} ms/media   catálogo completo ~{per_item * size + build:9.1f} s (matriz {build:.2f} s)")
+    _, rec_sparse = _timed(engine.recommend, seeds, top)
+    print(f"recomendación 5 semillas: postings {rec_py * 1000:.1f} ms, sparse {rec_sparse * 1000:.1f} ms")
+
+    # Mismo resultado en los dos motores
+    check = queries[:20]
+    expected = {q: similarity.top_neighbours(features.scores(docs[q], exclude=q), top) for q in check}
+    by_row = {q: engine.compute_all(top, engine.row_of[q], engine.row_of[q] + 1).get(q, []) for q in check}
+    mismatches = sum(1 for q in check if [m for _, m in expected[q]] != [m for _, m in by_row[q]])
+    print(f"comprobación postings == sparse: {len(check) - mismatches}/{len(check)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de motores de similares")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--sample", type=int, default=100, help="Medias consultadas por motor")
+    parser.add_argument("--top", type=int, default=24)
+    parser.add_argument("--full", action="store_true", help="El motor sparse calcula el catálogo completo")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.sample, args.top, args.full, args.seed)
+
+
+if __name__ == "__main__":
+    main()
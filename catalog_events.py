@@ -0,0 +1,50 @@
+"""
+Eventos de escritura del catálogo.
+crud.py los emite después de cada commit para que las estructuras derivadas en
+memoria (estadísticas, caches, índices) se actualicen de forma incremental.
+Los suscriptores se ejecutan en el mismo hilo que la escritura; un error en uno
+de ellos nunca hace fallar la petición.
+"""
+
+import threading
+import traceback
+from typing import Callable, List, Optional
+
+MEDIA_CREATED = "media_created"
+MEDIA_UPDATED = "media_updated"
+MEDIA_DELETED = "media_deleted"
+# Cambios de tags (media_id es None); el borrado afecta a todas sus medias
+TAG_CREATED = "tag_created"
+TAG_DELETED = "tag_deleted"
+
+# fn(evento, media_id, media) — `media` es el objeto ORM recién guardado (None al borrar)
+Subscriber = Callable[[str, Optional[int], Optional[object]], None]
+
+_subscribers: List[Subscriber] = []
+_lock = threading.Lock()
+
+
+def subscribe(fn: Subscriber) -> Subscriber:
+    """Registrar un suscriptor (se puede usar como decorador)"""
+    with _lock:
+        if fn not in _subscribers:
+            _subscribers.append(fn)
+    return fn
+
+
+def unsubscribe(fn: Subscriber) -> None:
+    with _lock:
+        if fn in _subscribers:
+            _subscribers.remove(fn)
+
+
+def emit(event: str, media_id: Optional[int], media: Optional[object] = None) -> None:
+    """Notificar a los suscriptores de una escritura ya confirmada"""
+    with _lock:
+        subscribers = list(_subscribers)
+    for fn in subscribers:
+        try:
+            fn(event, media_id, media)
+        except Exception:
+            print(f"⚠️ Error en suscriptor de {event}: {getattr(fn, '__name__', fn)}")
+            traceback.print_exc()
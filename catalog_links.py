@@ -0,0 +1,304 @@
+"""
+Tablas normalizadas de géneros y personas.
+
+Media.genero, Media.elenco y Media.director siguen siendo texto separado por comas
+(es lo que envía y recibe el frontend); a partir de ellos se mantienen las tablas
+genero/persona y sus tablas de enlace, de forma que filtrar por género, buscar por
+persona o agrupar estadísticas sean joins indexados en lugar de ILIKE '%x%'.
+
+El elenco puede incluir el TMDb ID entre paréntesis: "Tom Hanks (31), Tim Allen (12898)".
+
+Backfill de las filas existentes (por lotes, idempotente; retoma desde la primera
+media sin enlaces y al terminar deja la marca en catalog_meta):
+    python catalog_links.py [--batch-size 500]
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import exists, func, or_, select
+from sqlalchemy.orm import Session
+
+import models
+
+ROL_ACTOR = "actor"
+ROL_DIRECTOR = "director"
+
+BACKFILL_MARK = "links_backfill"
+
+_PERSONA_RE = re.compile(r"^(.*?)\s*\((\d+)\)\s*$")
+
+
+def clave(nombre: Optional[str]) -> str:
+    """Nombre normalizado para identificar géneros y personas sin TMDb ID"""
+    return models.normalize_str(nombre).strip()
+
+
+def parse_generos(value: Optional[str]) -> Dict[str, str]:
+    """'Acción, Drama' -> {clave: nombre} sin duplicados"""
+    generos: Dict[str, str] = {}
+    for nombre in (value or "").split(","):
+        nombre = nombre.strip()
+        if nombre:
+            generos.setdefault(clave(nombre), nombre)
+    return generos
+
+
+def parse_personas(value: Optional[str]) -> List[Tuple[str, Optional[int]]]:
+    """'Tom Hanks (31), Otra Persona' -> [('Tom Hanks', 31), ('Otra Persona', None)]"""
+    personas = []
+    for parte in (value or "").split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        match = _PERSONA_RE.match(parte)
+        if match and match.group(1).strip():
+            personas.append((match.group(1).strip(), int(match.group(2))))
+        else:
+            personas.append((parte, None))
+    return personas
+
+
+def _persona_key(nombre: str, tmdb_id: Optional[int]):
+    return ("tmdb", tmdb_id) if tmdb_id is not None else ("clave", clave(nombre))
+
+
+def insert_ignore(db: Session, table):
+    """INSERT ... ON CONFLICT DO NOTHING según el dialecto (PostgreSQL en producción)"""
+    if db.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table).on_conflict_do_nothing()
+
+
+class _IdCache:
+    """Ids de géneros/personas ya resueltos (evita repetir consultas durante el backfill)"""
+
+    def __init__(self):
+        self.generos: Dict[str, int] = {}
+        self.personas: Dict[tuple, int] = {}
+
+
+def _genero_ids(db: Session, generos: Dict[str, str], cache: _IdCache) -> Dict[str, int]:
+    missing = [k for k in generos if k not in cache.generos]
+    if missing:
+        db.execute(insert_ignore(db, models.Genero.__table__), [
+            {"clave": k, "nombre": generos[k]} for k in missing
+        ])
+        rows = db.execute(select(models.Genero.clave, models.Genero.id).where(models.Genero.clave.in_(missing)))
+        cache.generos.update({k: i for k, i in rows})
+    return {k: cache.generos[k] for k in generos}
+
+
+def _persona_ids(db: Session, personas: Dict[tuple, Tuple[str, Optional[int]]], cache: _IdCache) -> Dict[tuple, int]:
+    missing = [key for key in personas if key not in cache.personas]
+    if missing:
+        db.execute(insert_ignore(db, models.Persona.__table__), [
+            {"nombre": personas[key][0], "clave": clave(personas[key][0]), "tmdb_id": personas[key][1]}
+            for key in missing
+        ])
+        tmdb_ids = [key[1] for key in missing if key[0] == "tmdb"]
+        claves = [key[1] for key in missing if key[0] == "clave"]
+        if tmdb_ids:
+            rows = db.execute(select(models.Persona.tmdb_id, models.Persona.id).where(models.Persona.tmdb_id.in_(tmdb_ids)))
+            cache.personas.update({("tmdb", t): i for t, i in rows})
+        if claves:
+            rows = db.execute(select(models.Persona.clave, models.Persona.id).where(
+                models.Persona.clave.in_(claves), models.Persona.tmdb_id.is_(None)
+            ))
+            cache.personas.update({("clave", c): i for c, i in rows})
+    return {key: cache.personas[key] for key in personas}
+
+
+def link_medias(db: Session, rows: Iterable[tuple], cache: Optional[_IdCache] = None) -> int:
+    """
+    Crea los enlaces de género/persona para filas (id, genero, elenco, director).
+    Idempotente; no hace commit. Devuelve cuántos enlaces se intentaron insertar.
+    """
+    cache = cache or _IdCache()
+    rows = list(rows)
+    generos: Dict[str, str] = {}
+    personas: Dict[tuple, Tuple[str, Optional[int]]] = {}
+    parsed = []
+    for media_id, genero, elenco, director in rows:
+        media_generos = parse_generos(genero)
+        media_personas = [(ROL_ACTOR, p) for p in parse_personas(elenco)] + \
+                         [(ROL_DIRECTOR, p) for p in parse_personas(director)]
+        for k, nombre in media_generos.items():
+            generos.setdefault(k, nombre)
+        for _, (nombre, tmdb_id) in media_personas:
+            personas.setdefault(_persona_key(nombre, tmdb_id), (nombre, tmdb_id))
+        parsed.append((media_id, media_generos, media_personas))
+
+    genero_ids = _genero_ids(db, generos, cache) if generos else {}
+    persona_ids = _persona_ids(db, personas, cache) if personas else {}
+
+    genero_links = []
+    persona_links = []
+    for media_id, media_generos, media_personas in parsed:
+        genero_links.extend({"media_id": media_id, "genero_id": genero_ids[k]} for k in media_generos)
+        seen = set()
+        for orden, (rol, (nombre, tmdb_id)) in enumerate(media_personas):
+            persona_id = persona_ids[_persona_key(nombre, tmdb_id)]
+            if (persona_id, rol) in seen:
+                continue
+            seen.add((persona_id, rol))
+            persona_links.append({"media_id": media_id, "persona_id": persona_id, "rol": rol, "orden": orden})
+    if genero_links:
+        db.execute(insert_ignore(db, models.media_genero), genero_links)
+    if persona_links:
+        db.execute(insert_ignore(db, models.MediaPersona.__table__), persona_links)
+    return len(genero_links) + len(persona_links)
+
+
+def sync_media(db: Session, media) -> None:
+    """Rehace los enlaces de una media a partir de sus campos de texto (sin commit)"""
+    db.execute(models.media_genero.delete().where(models.media_genero.c.media_id == media.id))
+    db.execute(models.MediaPersona.__table__.delete().where(models.MediaPersona.media_id == media.id))
+    link_medias(db, [(media.id, media.genero, media.elenco, media.director)])
+
+
+def backfill(db: Session, batch_size: int = 500, verbose: bool = True, after_id: int = 0) -> Dict[str, int]:
+    """
+    Crea los enlaces de las medias con id > after_id, por lotes ordenados por id
+    (paginación por clave, sin OFFSET) con un commit por lote. Al terminar guarda la
+    marca BACKFILL_MARK: hasta entonces los enlaces pueden estar incompletos.
+    """
+    cache = _IdCache()
+    last_id = after_id
+    medias = links = 0
+    started = time.time()
+    while True:
+        rows = db.execute(
+            select(models.Media.id, models.Media.genero, models.Media.elenco, models.Media.director)
+            .where(models.Media.id > last_id)
+            .order_by(models.Media.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        links += link_medias(db, rows, cache)
+        db.commit()
+        medias += len(rows)
+        last_id = rows[-1][0]
+        if verbose:
+            print(f"  ... {medias} medias enlazadas")
+    mark_done(db)
+    result = {"medias": medias, "links": links, "elapsed_ms": round((time.time() - started) * 1000)}
+    if verbose:
+        print(f"✅ Backfill de géneros/personas: {medias} medias, {links} enlaces en {result['elapsed_ms']} ms")
+    return result
+
+
+def is_done(db: Session) -> bool:
+    """El backfill terminó alguna vez (las escrituras posteriores mantienen los enlaces)"""
+    return db.get(models.CatalogMeta, BACKFILL_MARK) is not None
+
+
+def mark_done(db: Session) -> None:
+    db.execute(insert_ignore(db, models.CatalogMeta.__table__), [
+        {"clave": BACKFILL_MARK, "valor": datetime.utcnow().isoformat()}
+    ])
+    db.commit()
+
+
+def first_unlinked_id(db: Session) -> Optional[int]:
+    """Id de la primera media con género o personas en texto pero sin ningún enlace"""
+    def filled(column):
+        return func.coalesce(func.trim(column), "") != ""
+
+    return db.execute(
+        select(func.min(models.Media.id)).where(
+            or_(filled(models.Media.genero), filled(models.Media.elenco), filled(models.Media.director)),
+            ~exists().where(models.media_genero.c.media_id == models.Media.id),
+            ~exists().where(models.MediaPersona.media_id == models.Media.id),
+        )
+    ).scalar()
+
+
+# --- Estado de las tablas de enlace en este proceso ---
+
+_enabled = False  # las tablas existen: las escrituras mantienen los enlaces
+_ready = False    # además están completas: las lecturas pueden usarlas
+_ready_lock = threading.Lock()
+
+
+def create_tables(engine) -> None:
+    """Crear las tablas de géneros/personas si no existen (el resto del esquema ya existe)"""
+    global _enabled
+    models.Base.metadata.create_all(bind=engine, tables=[
+        models.Genero.__table__,
+        models.Persona.__table__,
+        models.media_genero,
+        models.MediaPersona.__table__,
+        models.CatalogMeta.__table__,
+    ])
+    _enabled = True
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def is_ready() -> bool:
+    """True cuando las tablas de enlace están completas y se pueden usar en las consultas"""
+    return _ready
+
+
+def ensure_links(session_factory) -> None:
+    """
+    Al arrancar: si el backfill no ha terminado nunca (sin marca en catalog_meta), lo
+    lanza en segundo plano desde la primera media sin enlaces. Mientras tanto las
+    consultas siguen usando los campos de texto. Un backfill interrumpido (reinicio,
+    caída) o el de otro worker a medias no deja la marca, así que se retoma.
+    """
+    global _ready
+    db = session_factory()
+    try:
+        if is_done(db):
+            _ready = True
+            return
+        start = first_unlinked_id(db)
+    except Exception as e:
+        print(f"⚠️ No se pudo comprobar el estado de géneros/personas: {e}")
+        return
+    finally:
+        db.close()
+
+    def run():
+        global _ready
+        with _ready_lock:
+            db = session_factory()
+            try:
+                if start is None:
+                    mark_done(db)
+                else:
+                    backfill(db, after_id=start - 1)
+                _ready = True
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Error en el backfill de géneros/personas: {e}")
+            finally:
+                db.close()
+
+    threading.Thread(target=run, name="catalog-links-backfill", daemon=True).start()
+
+
+if __name__ == "__main__":
+    import argparse
+    import database
+
+    parser = argparse.ArgumentParser(description="Backfill de las tablas de géneros y personas")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    create_tables(database.engine)
+    session = database.SessionLocal()
+    try:
+        backfill(session, batch_size=args.batch_size)
+    finally:
+        session.close()
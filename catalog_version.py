@@ -0,0 +1,169 @@
+"""
+Versión del catálogo para la cache HTTP de las lecturas (ETag / Last-Modified / 304).
+
+Cada escritura del catálogo (catalog_events, incluidas las portadas que se guardan
+al resolverlas en TMDb) incrementa un contador y anota la hora. El ETag de /medias,
+/medias/{id}, /tags y las estadísticas es esa versión más un hash de la URL, así que
+un If-None-Match que coincide se responde con 304 sin ejecutar el endpoint ni tocar
+la base de datos.
+
+Con Redis (poster_cache.redis_client) el contador es compartido entre procesos
+(INCR). Sin Redis vive en memoria y solo es válido con un único proceso: con varios
+workers un 304 podría confirmar datos que otro ya cambió, así que la cache HTTP se
+desactiva salvo que CATALOG_CACHE_SINGLE_PROCESS lo declare (la hora de arranque
+forma parte del ETag para que un reinicio no reutilice ETags antiguos).
+
+El ETag es débil (W/"..."): el mismo valor acompaña a la respuesta sin comprimir y a
+la comprimida por GZipMiddleware, que tienen bytes distintos.
+"""
+
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Tuple
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+import catalog_events
+import poster_cache
+from config import (
+    CATALOG_CACHE_MAX_AGE,
+    CATALOG_CACHE_S_MAXAGE,
+    CATALOG_CACHE_SINGLE_PROCESS,
+    CATALOG_HTTP_CACHE_ENABLED,
+)
+from http_cache import etag_matches, not_modified_since
+
+REDIS_VERSION_KEY = "catalog:version"
+REDIS_MODIFIED_KEY = "catalog:modified"
+
+# Rutas GET con ETag de versión: listados, detalle, tags y estadísticas
+_EXACT_PATHS = {
+    "/medias", "/tags", "/medias/count", "/medias/top5", "/medias/distribucion_generos",
+    "/medias/generos_vistos", "/medias/peor_pelicula", "/medias/peor_serie",
+    "/medias/vistos_por_anio", "/medias/top_personas", "/medias/stats",
+}
+
+
+def is_cacheable(request: Request) -> bool:
+    path = request.url.path.rstrip("/") or "/"
+    if path not in _EXACT_PATHS and not (path.startswith("/medias/") and path[len("/medias/"):].isdigit()):
+        return False
+    params = request.query_params
+    # Orden aleatorio sin semilla: cada petición devuelve otra página
+    if params.get("order_by") == "random" and not params.get("seed") and not params.get("cursor"):
+        return False
+    return True
+
+
+class CatalogVersion:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._modified = time.time()
+        self.bumps = 0
+        self.not_modified = 0
+
+    def bump(self, *_args) -> None:
+        """Nueva versión (se puede suscribir directamente a catalog_events)"""
+        now = time.time()
+        with self._lock:
+            self._version += 1
+            self._modified = max(now, self._modified)
+            self.bumps += 1
+        redis_client = poster_cache.redis_client
+        if redis_client:
+            try:
+                pipe = redis_client.pipeline()
+                pipe.incr(REDIS_VERSION_KEY)
+                pipe.set(REDIS_MODIFIED_KEY, repr(now))
+                pipe.execute()
+            except Exception:
+                pass
+
+    def current(self) -> Tuple[int, float]:
+        """(versión, hora de la última escritura)"""
+        redis_client = poster_cache.redis_client
+        if redis_client:
+            try:
+                version, modified = redis_client.mget(REDIS_VERSION_KEY, REDIS_MODIFIED_KEY)
+                if version is not None and modified is not None:
+                    return int(version), float(modified)
+            except Exception:
+                pass
+        with self._lock:
+            return self._version, self._modified
+
+    def get_stats(self):
+        version, modified = self.current()
+        return {
+            "version": version,
+            "last_modified": datetime.fromtimestamp(modified, timezone.utc).isoformat(),
+            "bumps": self.bumps,
+            "not_modified": self.not_modified,
+            "backend": "redis" if poster_cache.redis_client else "memory",
+            "enabled": enabled(),
+        }
+
+
+version = CatalogVersion()
+catalog_events.subscribe(version.bump)
+
+
+def etag_for(request: Request, current: int, modified: float) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.md5(f"{request.url.path}?{query}".encode("utf-8")).hexdigest()[:16]
+    return f'W/"{current:x}-{int(modified * 1000):x}-{digest}"'
+
+
+def _headers(etag: str, modified: float) -> dict:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}, s-maxage={CATALOG_CACHE_S_MAXAGE}, must-revalidate",
+    }
+    # Last-Modified va en segundos: dentro del mismo segundo de la última escritura otra
+    # escritura tendría la misma fecha, así que hasta que pase no se envía
+    if time.time() >= int(modified) + 1:
+        headers["Last-Modified"] = format_datetime(datetime.fromtimestamp(int(modified), timezone.utc), usegmt=True)
+    return headers
+
+
+def enabled() -> bool:
+    """Cache HTTP activa: con Redis, o sin él si se ha declarado un único proceso"""
+    return CATALOG_HTTP_CACHE_ENABLED and (poster_cache.redis_client is not None or CATALOG_CACHE_SINGLE_PROCESS)
+
+
+def check_backend() -> None:
+    """Al arrancar: avisar si la cache HTTP queda desactivada por falta de Redis"""
+    if CATALOG_HTTP_CACHE_ENABLED and not enabled():
+        print(
+            "⚠️ Cache HTTP del catálogo desactivada: sin Redis la versión no se comparte entre "
+            "workers. Con un solo proceso, activarla con CATALOG_CACHE_SINGLE_PROCESS=true"
+        )
+
+
+async def middleware(request: Request, call_next):
+    """304 sin ejecutar el endpoint si el cliente ya tiene esta versión; ETag en las respuestas 200"""
+    if not enabled() or request.method not in ("GET", "HEAD") or not is_cacheable(request):
+        return await call_next(request)
+    if poster_cache.redis_client:
+        current, modified = await run_in_threadpool(version.current)
+    else:
+        current, modified = version.current()
+    etag = etag_for(request, current, modified)
+    headers = _headers(etag, modified)
+    # If-None-Match tiene prioridad; If-Modified-Since solo si no viene
+    if request.headers.get("if-none-match"):
+        fresh = etag_matches(request, etag)
+    else:
+        fresh = not_modified_since(request, modified)
+    if fresh:
+        version.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    response = await call_next(request)
+    if response.status_code == 200 and "etag" not in response.headers:
+        response.headers.update(headers)
+    return response
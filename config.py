@@ -16,6 +16,89 @@ TMDB_BEARER = os.getenv("TMDB_BEARER")
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
 
+# Cliente TMDb compartido (pool de conexiones keep-alive)
+TMDB_HTTP2 = os.getenv("TMDB_HTTP2", "true").lower() in ("1", "true", "yes")
+TMDB_MAX_CONNECTIONS = int(os.getenv("TMDB_MAX_CONNECTIONS", "20"))
+TMDB_MAX_KEEPALIVE = int(os.getenv("TMDB_MAX_KEEPALIVE", "10"))
+TMDB_KEEPALIVE_EXPIRY = float(os.getenv("TMDB_KEEPALIVE_EXPIRY", "30"))
+# Peticiones simultáneas permitidas por host (TMDb limita ~40-50 req/s por IP)
+TMDB_MAX_CONCURRENCY_PER_HOST = int(os.getenv("TMDB_MAX_CONCURRENCY_PER_HOST", "16"))
+# Presupuesto compartido de peticiones por segundo (0 = sin límite) y ráfaga permitida
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_BURST = int(os.getenv("TMDB_RATE_BURST", "20"))
+# Temporadas de series: agrupar con append_to_response=season/1,season/2,... (máx. 20 por llamada)
+TMDB_SEASONS_APPEND = os.getenv("TMDB_SEASONS_APPEND", "false").lower() in ("1", "true", "yes")
+# Resolución de portadas en paralelo (búsqueda /tmdb?listar=true)
+TMDB_POSTER_CONCURRENCY = int(os.getenv("TMDB_POSTER_CONCURRENCY", "8"))
+# Segundos máximos por petición; lo no resuelto usa el poster_path del resultado de búsqueda
+TMDB_SEARCH_POSTER_DEADLINE = float(os.getenv("TMDB_SEARCH_POSTER_DEADLINE", "2.5"))
+# Portadas que faltan en /posters-optimized resueltas a la vez contra TMDb
+POSTER_BACKFILL_WORKERS = int(os.getenv("POSTER_BACKFILL_WORKERS", "12"))
+
+# Cache de respuestas de los proxies /tmdb/... (TTL en segundos por tipo de endpoint)
+TMDB_CACHE_TTLS = {
+    "external_ids": int(os.getenv("TMDB_CACHE_TTL_EXTERNAL_IDS", str(7 * 86400))),
+    "watch_providers": int(os.getenv("TMDB_CACHE_TTL_WATCH_PROVIDERS", str(6 * 3600))),
+    "detail": int(os.getenv("TMDB_CACHE_TTL_DETAIL", "86400")),
+    "credits": int(os.getenv("TMDB_CACHE_TTL_CREDITS", "86400")),
+    "recommendations": int(os.getenv("TMDB_CACHE_TTL_RECOMMENDATIONS", str(6 * 3600))),
+}
+TMDB_CACHE_MAX_BYTES = int(os.getenv("TMDB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# max-age enviado a los navegadores; después revalidan con If-None-Match (304)
+TMDB_CACHE_CLIENT_MAX_AGE = int(os.getenv("TMDB_CACHE_CLIENT_MAX_AGE", "300"))
+
+# Estadísticas del catálogo precalculadas en memoria (stats_snapshot.py)
+STATS_SNAPSHOT_ENABLED = os.getenv("STATS_SNAPSHOT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Segundos máximos que puede tener la instantánea antes de reconstruirse desde la BD
+STATS_STALE_AFTER = float(os.getenv("STATS_STALE_AFTER", "600"))
+
+# Totales de listados (X-Total-Count): cache por filtros, invalidada con cada escritura
+TOTALS_CACHE_TTL = float(os.getenv("TOTALS_CACHE_TTL", "300"))
+TOTALS_CACHE_MAX_ENTRIES = int(os.getenv("TOTALS_CACHE_MAX_ENTRIES", "2048"))
+# total_mode=estimate: por encima de estas filas estimadas se usa la estimación del planificador
+TOTALS_ESTIMATE_THRESHOLD = int(os.getenv("TOTALS_ESTIMATE_THRESHOLD", "5000"))
+
+# Modo por defecto de /search: auto | fulltext | fuzzy | ilike (ver fulltext.py)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "auto").lower()
+# Índice en memoria para /search/suggest (search_index.py)
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Similares precalculados en la tabla media_similar (similarity.py)
+SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() in ("1", "true", "yes")
+SIMILARITY_TOP_N = int(os.getenv("SIMILARITY_TOP_N", "24"))
+# auto: matrices dispersas si numpy/scipy están instalados | python: postings en Python
+SIMILARITY_ENGINE = os.getenv("SIMILARITY_ENGINE", "auto").lower()
+
+# Serialización rápida de respuestas (fast_json.py): medias validadas una vez y volcadas a bytes
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Cache HTTP de las lecturas del catálogo (catalog_version.py): ETag por versión y 304
+CATALOG_HTTP_CACHE_ENABLED = os.getenv("CATALOG_HTTP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# max-age para navegadores y s-maxage para CDN; con 0 guardan la respuesta pero revalidan siempre (304)
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "0"))
+CATALOG_CACHE_S_MAXAGE = int(os.getenv("CATALOG_CACHE_S_MAXAGE", "0"))
+# Sin Redis la versión vive en cada proceso: los 304 solo se activan si se declara un único proceso
+CATALOG_CACHE_SINGLE_PROCESS = os.getenv("CATALOG_CACHE_SINGLE_PROCESS", "false").lower() in ("1", "true", "yes")
+
+# Pool de conexiones a PostgreSQL (database.py y async_db.py, ver db_pool.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Segundos máximos esperando una conexión libre antes de fallar
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+# always: comprobar cada conexión al sacarla del pool | idle: solo si lleva más de
+# DB_PRE_PING_IDLE segundos sin usarse | off: nunca
+DB_PRE_PING = os.getenv("DB_PRE_PING", "always").lower()
+DB_PRE_PING_IDLE = float(os.getenv("DB_PRE_PING_IDLE", "30"))
+# Milisegundos máximos por sentencia (0 = el límite del servidor)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+# Endpoints de lectura calientes (/medias, /search, /medias/{id}, /posters-optimized) en
+# async def sobre asyncpg (async_db.py); si no, síncronos en el threadpool
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB_ENABLED", "false").lower() in ("1", "true", "yes")
+# Sentencias preparadas por conexión en asyncpg (0 con el Transaction Pooler de Supabase / pgbouncer)
+ASYNC_DB_STATEMENT_CACHE_SIZE = int(os.getenv("ASYNC_DB_STATEMENT_CACHE_SIZE", "100"))
+
 
 def get_tmdb_auth_headers():
     """Return authorization headers for TMDb, preferring Bearer token."""
@@ -3,16 +3,23 @@ import schemas
 from sqlalchemy.orm import Session
 import os
 import unicodedata
-import requests
+import tmdb_client
+import catalog_events
+import catalog_links
+import similarity
 import sqlalchemy as sa
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 
 def get_medias_query(db: Session, skip: int = 0, limit: int = 5000, order_by: str = None, tipo: str = None, pendiente: bool = None,
                      genero: str = None, min_year: int = None, max_year: int = None, min_nota: float = None, min_nota_personal: float = None,
-                     favorito: bool = None, tag_id: int = None, tmdb_id: int = None):
+                     favorito: bool = None, tag_id: int = None, tmdb_id: int = None, ordered: bool = True,
+                     with_tags: bool = True):
     # Eager load de relaciones necesarias para evitar listas de tags vacías al serializar
-    query = db.query(models.Media).options(joinedload(models.Media.tags))
+    # (with_tags=False en las proyecciones que no devuelven tags)
+    query = db.query(models.Media)
+    if with_tags:
+        query = query.options(joinedload(models.Media.tags))
     # Aplicar filtros
     if tipo:
         query = query.filter(models.Media.tipo.ilike(tipo))
@@ -21,7 +28,11 @@ def get_medias_query(db: Session, skip: int = 0, limit: int = 5000, order_by: st
     if favorito is not None:
         query = query.filter(models.Media.favorito == favorito)
     if genero:
-        query = query.filter(models.Media.genero.ilike(f"%{genero}%"))
+        if catalog_links.is_ready():
+            # EXISTS sobre media_genero (indexado) en lugar de ILIKE sobre el texto
+            query = query.filter(models.Media.generos.any(models.Genero.clave == catalog_links.clave(genero)))
+        else:
+            query = query.filter(models.Media.genero.ilike(f"%{genero}%"))
     if min_year:
         query = query.filter(models.Media.anio >= min_year)
     if max_year:
@@ -34,7 +45,9 @@ def get_medias_query(db: Session, skip: int = 0, limit: int = 5000, order_by: st
         query = query.join(models.Media.tags).filter(models.Tag.id == tag_id)
     if tmdb_id is not None:
         query = query.filter(models.Media.tmdb_id == tmdb_id)
-    # Ordenamiento según el filtro recibido
+    # Ordenamiento según el filtro recibido (ordered=False: lo aplica pagination.fetch_page)
+    if not ordered:
+        return query
     if order_by == "fecha" or order_by is None or order_by == "fecha_creacion":
         query = query.order_by(models.Media.fecha_creacion.desc())
     elif order_by == "nota_personal":
@@ -62,6 +75,12 @@ from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
 
 def get_similares_para_media(db: Session, media_id: int, n=24):
+    if similarity.index.is_ready():
+        similares = _get_similares_precalculados(db, media_id, n)
+        if similares:
+            return similares
+    if catalog_links.is_ready():
+        return _get_similares_sql(db, media_id, n)
     base = db.query(models.Media).filter(models.Media.id == media_id).first()
     if not base:
         return []
@@ -87,6 +106,69 @@ def get_similares_para_media(db: Session, media_id: int, n=24):
     scores.sort(key=lambda x: (-x[0], -x[1].fecha_creacion.timestamp() if x[1].fecha_creacion else 0))
     return [m for _, m in scores[:n]]
 
+def _get_similares_precalculados(db: Session, media_id: int, n=24):
+    """Vecinos guardados en media_similar (una lectura por clave primaria, ver similarity.py)"""
+    return (
+        db.query(models.Media)
+        .join(models.MediaSimilar, models.MediaSimilar.similar_id == models.Media.id)
+        .filter(models.MediaSimilar.media_id == media_id)
+        .order_by(models.MediaSimilar.rank)
+        .limit(n)
+        .all()
+    )
+
+def _get_similares_sql(db: Session, media_id: int, n=24):
+    """
+    Misma puntuación que get_similares_para_media (géneros compartidos + 2 * keywords compartidas)
+    calculada en SQL con las tablas de enlace: solo se cargan las n medias resultantes.
+    """
+    mg, mk = models.media_genero, models.media_keyword
+    base_generos = sa.select(mg.c.genero_id).where(mg.c.media_id == media_id)
+    base_keywords = sa.select(mk.c.keyword_id).where(mk.c.media_id == media_id)
+    generos_comunes = (
+        sa.select(mg.c.media_id, sa.func.count().label("n"))
+        .where(mg.c.genero_id.in_(base_generos), mg.c.media_id != media_id)
+        .group_by(mg.c.media_id)
+        .subquery()
+    )
+    keywords_comunes = (
+        sa.select(mk.c.media_id, sa.func.count().label("n"))
+        .where(mk.c.keyword_id.in_(base_keywords), mk.c.media_id != media_id)
+        .group_by(mk.c.media_id)
+        .subquery()
+    )
+    score = sa.func.coalesce(generos_comunes.c.n, 0) + 2 * sa.func.coalesce(keywords_comunes.c.n, 0)
+    base_tiene_generos = db.query(base_generos.exists()).scalar()
+    if base_tiene_generos:
+        # Candidatas: las que comparten al menos un género
+        candidatas = sa.select(generos_comunes.c.media_id.label("media_id")).outerjoin(
+            keywords_comunes, keywords_comunes.c.media_id == generos_comunes.c.media_id
+        )
+    else:
+        candidatas = sa.select(keywords_comunes.c.media_id.label("media_id")).outerjoin(
+            generos_comunes, generos_comunes.c.media_id == keywords_comunes.c.media_id
+        )
+    ranking = (
+        candidatas.add_columns(score.label("score"))
+        .join(models.Media, models.Media.id == candidatas.selected_columns.media_id)
+        .order_by(score.desc(), models.Media.fecha_creacion.desc().nullslast())
+        .limit(n)
+    )
+    ids = [row.media_id for row in db.execute(ranking)]
+    medias = {m.id: m for m in db.query(models.Media).filter(models.Media.id.in_(ids))} if ids else {}
+    return [medias[i] for i in ids if i in medias]
+
+def get_medias_by_persona(db: Session, person_tmdb_id: int, rol: str = None):
+    """Medias en las que participa la persona con ese TMDb ID (join indexado por persona.tmdb_id)"""
+    media_ids = (
+        sa.select(models.MediaPersona.media_id)
+        .join(models.Persona, models.Persona.id == models.MediaPersona.persona_id)
+        .where(models.Persona.tmdb_id == person_tmdb_id)
+    )
+    if rol:
+        media_ids = media_ids.where(models.MediaPersona.rol == rol)
+    return db.query(models.Media).filter(models.Media.id.in_(media_ids)).all()
+
 
 def create_media(db: Session, media: schemas.MediaCreate):
     # Si se proporciona tmdb_id, comprobar duplicados
@@ -110,7 +192,6 @@ def create_media(db: Session, media: schemas.MediaCreate):
     )
     db_media.tags = tags
     # --- Añadir keywords de TMDb si hay tmdb_id y tipo ---
-    from config import TMDB_API_KEY, TMDB_BASE_URL, get_tmdb_auth_headers, REQUEST_TIMEOUT
     def normalize_tipo(tipo):
         if not tipo:
             return ''
@@ -123,17 +204,13 @@ def create_media(db: Session, media: schemas.MediaCreate):
     if getattr(media, 'tmdb_id', None) and getattr(media, 'tipo', None):
         tipo_norm = normalize_tipo(media.tipo)
         if tipo_norm == 'pelicula':
-            url = f"{TMDB_BASE_URL}/movie/{media.tmdb_id}/keywords"
+            url = f"/movie/{media.tmdb_id}/keywords"
         elif tipo_norm == 'serie':
-            url = f"{TMDB_BASE_URL}/tv/{media.tmdb_id}/keywords"
+            url = f"/tv/{media.tmdb_id}/keywords"
         else:
             url = None
         if url:
-            headers = get_tmdb_auth_headers()
-            params = {}
-            if not headers and TMDB_API_KEY:
-                params["api_key"] = TMDB_API_KEY
-            resp = requests.get(url, headers=headers or None, params=params, timeout=REQUEST_TIMEOUT)
+            resp = tmdb_client.get(url)
             if resp.status_code == 200:
                 data = resp.json()
                 kw_list = data.get('keywords') if tipo_norm == 'pelicula' else data.get('results')
@@ -150,8 +227,12 @@ def create_media(db: Session, media: schemas.MediaCreate):
                         if db_kw not in db_media.keywords:
                             db_media.keywords.append(db_kw)
     db.add(db_media)
+    if catalog_links.is_enabled():
+        db.flush()
+        catalog_links.sync_media(db, db_media)
     db.commit()
     db.refresh(db_media)
+    catalog_events.emit(catalog_events.MEDIA_CREATED, db_media.id, db_media)
     return db_media
 
 def delete_media(db: Session, media_id: int):
@@ -159,6 +240,7 @@ def delete_media(db: Session, media_id: int):
     if db_media:
         db.delete(db_media)
         db.commit()
+        catalog_events.emit(catalog_events.MEDIA_DELETED, media_id)
     return db_media
 
 def update_media_pendiente(db: Session, media_id: int, pendiente: bool):
@@ -167,6 +249,7 @@ def update_media_pendiente(db: Session, media_id: int, pendiente: bool):
         db_media.pendiente = pendiente
         db.commit()
         db.refresh(db_media)
+        catalog_events.emit(catalog_events.MEDIA_UPDATED, media_id, db_media)
     return db_media
 
 def update_media_favorito(db: Session, media_id: int, favorito: bool):
@@ -175,6 +258,7 @@ def update_media_favorito(db: Session, media_id: int, favorito: bool):
         db_media.favorito = favorito
         db.commit()
         db.refresh(db_media)
+        catalog_events.emit(catalog_events.MEDIA_UPDATED, media_id, db_media)
     return db_media
 
 def update_media_anotacion_personal(db: Session, media_id: int, anotacion_personal: str):
@@ -183,13 +267,20 @@ def update_media_anotacion_personal(db: Session, media_id: int, anotacion_person
         db_media.anotacion_personal = anotacion_personal
         db.commit()
         db.refresh(db_media)
+        catalog_events.emit(catalog_events.MEDIA_UPDATED, media_id, db_media)
     return db_media
 
+def get_pendientes_query(db: Session):
+    return db.query(models.Media).filter(models.Media.pendiente == True)
+
+def get_favoritos_query(db: Session):
+    return db.query(models.Media).filter(models.Media.favorito == True)
+
 def get_pendientes(db: Session, skip: int = 0, limit: int = 24):
-    return db.query(models.Media).filter(models.Media.pendiente == True).offset(skip).limit(limit).all()
+    return get_pendientes_query(db).offset(skip).limit(limit).all()
 
 def get_favoritos(db: Session, skip: int = 0, limit: int = 24):
-    return db.query(models.Media).filter(models.Media.favorito == True).offset(skip).limit(limit).all()
+    return get_favoritos_query(db).offset(skip).limit(limit).all()
 
 # CRUD para tags
 
@@ -217,6 +308,7 @@ def create_tag(db: Session, tag: schemas.TagCreate):
         db.add(db_tag)
         db.commit()
         db.refresh(db_tag)
+        catalog_events.emit(catalog_events.TAG_CREATED, None)
         return db_tag
     except IntegrityError:
         db.rollback()
@@ -228,6 +320,7 @@ def add_tag_to_media(db: Session, media_id: int, tag_id: int):
     if media and tag and tag not in media.tags:
         media.tags.append(tag)
         db.commit()
+        catalog_events.emit(catalog_events.MEDIA_UPDATED, media_id, media)
         # Devolver con tags eager-loaded para que el frontend reciba los tags
         from sqlalchemy.orm import joinedload
         return db.query(models.Media).options(joinedload(models.Media.tags)).filter(models.Media.id == media_id).first()
@@ -242,6 +335,7 @@ def remove_tag_from_media(db: Session, media_id: int, tag_id: int):
     if media and tag and tag in media.tags:
         media.tags.remove(tag)
         db.commit()
+        catalog_events.emit(catalog_events.MEDIA_UPDATED, media_id, media)
         # Devolver con tags eager-loaded
         from sqlalchemy.orm import joinedload
         return db.query(models.Media).options(joinedload(models.Media.tags)).filter(models.Media.id == media_id).first()
@@ -253,6 +347,7 @@ def delete_tag(db: Session, tag_id: int):
     if db_tag:
         db.delete(db_tag)
         db.commit()
+        catalog_events.emit(catalog_events.TAG_DELETED, None)
     return db_tag
 
 def create_lista(db: Session, lista: schemas.ListaCreate):
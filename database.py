@@ -3,6 +3,8 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+import db_pool
+
 # Cargar variables de entorno desde .env si está disponible
 try:
     from dotenv import load_dotenv
@@ -16,16 +18,22 @@ if not DATABASE_URL:
     raise ValueError("La variable de entorno DATABASE_URL no está configurada en las variables de entorno del sistema")
 
 # Para Session Pooler de Supabase, usar SSL
+# Tamaño, pre-ping y statement_timeout del pool desde config (DB_POOL_*, ver db_pool.py)
 engine = create_engine(
     DATABASE_URL,
     connect_args={"sslmode": "require"},
-    pool_pre_ping=True,  # Verificar conexiones antes de usar
-    pool_recycle=300     # Reciclar conexiones cada 5 minutos
+    **db_pool.engine_kwargs()
 )
+db_pool.configure(engine, "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Normalización de texto en SQL (translate + lower + btrim), usada por stats.py.
+# Si se cambian, hay que recrear idx_media_tipo_norm.
+NORM_ACCENTS = "ÁÀÉÈÍÌÓÒÚÙÜÑáàéèíìóòúùüñ"
+NORM_PLAIN = "AAEEIIOOUUUNaaeeiioouuun"
+
 def optimize_poster_indexes():
     """Crear índices optimizados para consultas de portadas"""
     try:
@@ -125,6 +133,24 @@ def optimize_search_indexes():
                 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_nota_personal 
                 ON media (nota_personal)
             """))
+            # Paginación por cursor: (clave de orden, id) en el mismo orden que pagination.py
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_fecha_id_desc 
+                ON media (fecha_creacion DESC, id DESC)
+            """))
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_nota_personal_id_desc 
+                ON media (nota_personal DESC NULLS LAST, id DESC)
+            """))
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_nota_imdb_id_desc 
+                ON media (nota_imdb DESC NULLS LAST, id DESC)
+            """))
+            # Tipo normalizado ('pelicula'/'serie') + nota: conteos y top/peor por tipo en stats.py
+            conn.execute(text(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_tipo_norm 
+                ON media ((btrim(lower(translate(tipo, '{NORM_ACCENTS}', '{NORM_PLAIN}')))), nota_personal)
+            """))
             # AUTOCOMMIT se encarga del commit
     except Exception:
         # Si falla (permiso/extension no disponible), continuar sin bloquear el arranque
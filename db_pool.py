@@ -0,0 +1,234 @@
+"""
+Configuración y telemetría del pool de conexiones (database.py y async_db.py).
+
+- Tamaño, desbordamiento, espera máxima y reciclado desde config (DB_POOL_*).
+- Pre-ping propio en el checkout para poder contar los fallos:
+    always: se comprueba la conexión en cada checkout (lo que hacía pool_pre_ping)
+    idle:   solo si lleva más de DB_PRE_PING_IDLE segundos devuelta al pool
+    off:    nunca; una conexión caída falla en la primera consulta
+  Un ping fallido por desconexión invalida la conexión y el pool abre otra.
+- DB_STATEMENT_TIMEOUT_MS se fija con SET en cada conexión nueva.
+- Métricas por pool: conexiones en uso, desbordamiento, histograma del tiempo de
+  espera en el checkout, timeouts, fallos de pre-ping y conexiones abiertas e
+  invalidadas. Se exponen en /health (get_stats) y en /metrics (Prometheus).
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from config import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_PRE_PING,
+    DB_PRE_PING_IDLE,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+PRE_PING_MODES = ("always", "idle", "off")
+
+# Límites superiores (ms) de los intervalos del histograma de espera
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)  # el último: > 10 s
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.pre_pings = 0
+        self.pre_ping_failures = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_buckets[bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+            self.wait_count += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        pool = self.pool
+        with self._lock:
+            stats = {
+                "pool_size": pool.size() if pool is not None else None,
+                "checked_out": pool.checkedout() if pool is not None else None,
+                "checked_in": pool.checkedin() if pool is not None else None,
+                # overflow() parte de -pool_size: solo cuenta lo abierto por encima del tamaño
+                "overflow": max(0, pool.overflow()) if pool is not None else None,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "timeout_s": DB_POOL_TIMEOUT,
+                "pre_ping": DB_PRE_PING,
+                "statement_timeout_ms": DB_STATEMENT_TIMEOUT_MS,
+                "checkouts": self.wait_count,
+                "wait_avg_ms": round(self.wait_sum / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_histogram_ms": {
+                    **{f"<={bound}": n for bound, n in zip(WAIT_BUCKETS_MS, self.wait_buckets)},
+                    f">{WAIT_BUCKETS_MS[-1]}": self.wait_buckets[-1],
+                },
+                "timeouts": self.timeouts,
+                "pre_pings": self.pre_pings,
+                "pre_ping_failures": self.pre_ping_failures,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+        return stats
+
+    def prometheus(self) -> List[str]:
+        """Líneas de exposición de Prometheus con la etiqueta pool=<nombre>"""
+        stats = self.get_stats()
+        label = f'pool="{self.name}"'
+        lines = []
+        for name in ("pool_size", "checked_out", "checked_in", "overflow"):
+            if stats[name] is not None:
+                lines.append(f"db_pool_{name}{{{label}}} {stats[name]}")
+        with self._lock:
+            cumulative = 0
+            for bound, n in zip(WAIT_BUCKETS_MS, self.wait_buckets):
+                cumulative += n
+                lines.append(f'db_pool_wait_seconds_bucket{{{label},le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'db_pool_wait_seconds_bucket{{{label},le="+Inf"}} {self.wait_count}')
+            lines.append(f"db_pool_wait_seconds_sum{{{label}}} {self.wait_sum:.6f}")
+            lines.append(f"db_pool_wait_seconds_count{{{label}}} {self.wait_count}")
+        for name in ("timeouts", "pre_pings", "pre_ping_failures", "connects", "invalidations"):
+            lines.append(f"db_pool_{name}_total{{{label}}} {stats[name]}")
+        return lines
+
+
+class _TimedCheckout:
+    """Mide la espera de _do_get (cola del pool o apertura de conexión) en metrics"""
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() sustituye el pool por uno nuevo: conserva las métricas
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_kwargs(async_engine: bool = False) -> Dict[str, Any]:
+    """Argumentos del pool para create_engine / create_async_engine"""
+    return {
+        "poolclass": TimedAsyncQueuePool if async_engine else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        # El pre-ping lo hace configure() según DB_PRE_PING
+        "pool_pre_ping": False,
+    }
+
+
+registry: Dict[str, PoolMetrics] = {}
+
+
+def configure(engine, name: str) -> PoolMetrics:
+    """Engancha pre-ping, statement_timeout y métricas a un engine (síncrono o .sync_engine)"""
+    metrics = registry[name] = PoolMetrics(name)
+    metrics.pool = engine.pool
+    engine.pool.metrics = metrics
+    dialect = engine.dialect
+    mode = DB_PRE_PING if DB_PRE_PING in PRE_PING_MODES else "always"
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, record):
+        metrics._count("connects")
+        record.info["checkin_at"] = None
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"SET statement_timeout = {int(DB_STATEMENT_TIMEOUT_MS)}")
+            finally:
+                cursor.close()
+            # Fuera de la transacción del checkout: el rollback al devolverla no lo deshace
+            dbapi_connection.commit()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, record):
+        record.info["checkin_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, record, exception):
+        metrics._count("invalidations")
+
+    if mode == "off":
+        return metrics
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, record, proxy):
+        checkin_at = record.info.get("checkin_at")
+        # Conexión recién abierta: no hace falta comprobarla
+        if checkin_at is None:
+            return
+        if mode == "idle" and time.monotonic() - checkin_at < DB_PRE_PING_IDLE:
+            return
+        metrics._count("pre_pings")
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            metrics._count("pre_ping_failures")
+            if dialect.is_disconnect(e, dbapi_connection, None):
+                # El pool descarta esta conexión y reintenta con otra
+                raise exc.DisconnectionError() from e
+            raise
+
+    return metrics
+
+
+def get_stats() -> Dict[str, Any]:
+    return {name: metrics.get_stats() for name, metrics in registry.items()}
+
+
+def prometheus_text() -> str:
+    lines = [
+        "# HELP db_pool_checked_out Conexiones en uso",
+        "# TYPE db_pool_checked_out gauge",
+        "# HELP db_pool_wait_seconds Espera para obtener una conexión del pool",
+        "# TYPE db_pool_wait_seconds histogram",
+        "# HELP db_pool_pre_ping_failures_total Pre-pings fallidos",
+        "# TYPE db_pool_pre_ping_failures_total counter",
+    ]
+    for metrics in registry.values():
+        lines.extend(metrics.prometheus())
+    return "\n".join(lines) + "\n"
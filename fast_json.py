@@ -0,0 +1,59 @@
+"""
+Serialización JSON rápida de las respuestas (opcional, FAST_JSON_ENABLED).
+
+- Listados y detalle de medias: las filas de SQLAlchemy se validan una sola vez con
+  un TypeAdapter precompilado del modelo de respuesta y se vuelcan directamente a
+  bytes JSON (pydantic-core). El endpoint devuelve un Response ya hecho, así que
+  FastAPI no vuelve a validar contra response_model (en los endpoints síncronos,
+  además, en otro salto al threadpool) ni pasa por jsonable_encoder + json.dumps.
+- Respuestas sin modelo (dicts como /posters-optimized): orjson si está instalado.
+
+Sin FAST_JSON_ENABLED todo sigue el camino normal de FastAPI. La ganancia depende de
+la versión de FastAPI: las más recientes ya vuelcan el response_model con dump_json y
+ahí no hay diferencia (benchmarks/serialization_bench.py).
+"""
+
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@lru_cache(maxsize=64)
+def adapter(annotation: Any) -> TypeAdapter:
+    """TypeAdapter compilado una vez por modelo (schemas.Media, List[schemas.Media], ...)"""
+    return TypeAdapter(annotation)
+
+
+def copy_headers(source: Optional[Response], target: Response) -> Response:
+    """Cabeceras puestas en el Response inyectado (X-Total-Count, X-Next-Cursor, ...)"""
+    if source is not None:
+        for name, value in source.headers.items():
+            if name not in ("content-length", "content-type"):
+                target.headers[name] = value
+    return target
+
+
+def render(content: Any, annotation: Any, response: Optional[Response] = None) -> Response:
+    """Valida `content` (objetos ORM) con el modelo y lo devuelve serializado"""
+    model = adapter(annotation)
+    body = model.dump_json(model.validate_python(content, from_attributes=True))
+    return copy_headers(response, Response(content=body, media_type="application/json"))
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content: Any, response: Optional[Response] = None) -> Response:
+    """dict/list a JSON con orjson (o json estándar si no está instalado)"""
+    response_class = ORJSONResponse if orjson is not None else JSONResponse
+    return copy_headers(response, response_class(content))
@@ -0,0 +1,227 @@
+"""
+Búsqueda de texto completo con ranking para /search (PostgreSQL).
+
+- media.search_vector: columna tsvector GENERATED (STORED) con índice GIN. Pesos:
+  título y título en inglés (A) > director (B) > elenco (C).
+- Sin acentos en ambos lados mediante f_unaccent(text), un envoltorio IMMUTABLE
+  (requisito de las columnas generadas) sobre la extensión unaccent; si no está
+  disponible se usa translate() con los mismos caracteres que database.NORM_*.
+- Las palabras de la búsqueda se tratan como prefijos ("star wa" -> star:* & wa:*)
+  y los resultados se ordenan por ts_rank_cd.
+- Si no hay coincidencias y pg_trgm está disponible, se buscan títulos/personas
+  parecidos (erratas) con word_similarity, que usa los índices *_trgm existentes.
+
+Añadir la columna reescribe la tabla media entera con un bloqueo exclusivo, así que no
+se hace al arrancar sino con una migración explícita (una vez, fuera de horas punta):
+    python fulltext.py
+Al arrancar solo se comprueba que la columna exista; si falta, si algo falla o la base
+de datos no es PostgreSQL, /search sigue usando ILIKE.
+"""
+
+import re
+from typing import Any, List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from sqlalchemy.orm import Query, Session
+
+import models
+import pagination
+from database import NORM_ACCENTS, NORM_PLAIN
+
+# "auto": texto completo, después similitud (erratas) y por último ILIKE
+MODES = ("auto", "fulltext", "fuzzy", "ilike")
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+_VECTOR_SQL = """
+    setweight(to_tsvector('simple', f_unaccent(coalesce(titulo, ''))), 'A') ||
+    setweight(to_tsvector('simple', f_unaccent(coalesce(titulo_ingles, ''))), 'A') ||
+    setweight(to_tsvector('simple', f_unaccent(coalesce(director, ''))), 'B') ||
+    setweight(to_tsvector('simple', f_unaccent(coalesce(elenco, ''))), 'C')
+"""
+
+search_vector = sa.literal_column("media.search_vector")
+
+_ready = False  # columna e índice creados: se puede buscar por texto completo
+_trgm = False   # pg_trgm instalado: hay búsqueda por similitud
+
+
+def _unaccent_function_sql(conn) -> str:
+    try:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    except Exception as e:
+        print(f"ℹ️ Extensión unaccent no disponible, se usa translate(): {e}")
+    schema = conn.execute(text(
+        "SELECT n.nspname FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace "
+        "WHERE e.extname = 'unaccent'"
+    )).scalar()
+    if schema:
+        body = f"SELECT {schema}.unaccent('{schema}.unaccent'::regdictionary, $1)"
+    else:
+        body = f"SELECT translate($1, '{NORM_ACCENTS}', '{NORM_PLAIN}')"
+    return (
+        "CREATE FUNCTION f_unaccent(text) RETURNS text "
+        f"LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $func$ {body} $func$"
+    )
+
+
+def migrate(engine) -> None:
+    """Crear f_unaccent, la columna search_vector y su índice GIN si no existen (reescribe media)"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        exists = conn.execute(text("SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL")).scalar()
+        # No se reemplaza si ya existe: los valores guardados dependen de ella
+        if not exists:
+            conn.execute(text(_unaccent_function_sql(conn)))
+        conn.execute(text(
+            f"ALTER TABLE media ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({_VECTOR_SQL}) STORED"
+        ))
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_media_search_vector "
+            "ON media USING gin (search_vector)"
+        ))
+
+
+def check_schema(engine) -> bool:
+    """Al arrancar: usar el texto completo solo si la migración ya está hecha (sin DDL)"""
+    global _ready, _trgm
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.connect() as conn:
+            column = conn.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = 'media' AND column_name = 'search_vector'"
+            )).scalar()
+            function = conn.execute(text("SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL")).scalar()
+            index = conn.execute(text("SELECT to_regclass('idx_media_search_vector') IS NOT NULL")).scalar()
+            _trgm = bool(conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar())
+        _ready = bool(column and function)
+        if not _ready:
+            print("ℹ️ Búsqueda de texto completo sin migrar (python fulltext.py): /search usa ILIKE")
+        elif not index:
+            print("⚠️ Falta el índice idx_media_search_vector (python fulltext.py)")
+    except Exception as e:
+        print(f"⚠️ Búsqueda de texto completo no disponible: {e}")
+        _ready = False
+    return _ready
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def has_fuzzy() -> bool:
+    return _ready and _trgm
+
+
+def words(term: str) -> List[str]:
+    return _WORD_RE.findall((term or "").lower())
+
+
+def tsquery(term: str):
+    """Todas las palabras como prefijo; None si el término no tiene palabras"""
+    parts = words(term)
+    if not parts:
+        return None
+    return sa.func.to_tsquery("simple", sa.func.f_unaccent(" & ".join(f"{w}:*" for w in parts)))
+
+
+def fulltext_query(db: Session, term: str):
+    """(query, rank) por texto completo, o (None, None) si el término no tiene palabras"""
+    tsq = tsquery(term)
+    if tsq is None:
+        return None, None
+    query = db.query(models.Media).filter(search_vector.op("@@")(tsq))
+    return query, sa.func.ts_rank_cd(search_vector, tsq)
+
+
+def fuzzy_query(db: Session, term: str):
+    """(query, rank) por similitud de trigramas con títulos y personas (tolera erratas)"""
+    term = (term or "").strip()
+    if not term:
+        return None, None
+    columns = [models.Media.titulo, models.Media.titulo_ingles, models.Media.director, models.Media.elenco]
+    # term <% columna: word_similarity >= pg_trgm.word_similarity_threshold (usa el índice GIN)
+    query = db.query(models.Media).filter(sa.or_(*(sa.literal(term).op("<%")(c) for c in columns)))
+    rank = sa.func.greatest(*(
+        sa.func.word_similarity(term, sa.func.coalesce(c, "")) * weight
+        for c, weight in zip(columns, (1.0, 1.0, 0.8, 0.6))
+    ))
+    return query, rank
+
+
+def ilike_query(db: Session, term: str) -> Query:
+    like = f"%{term}%"
+    return db.query(models.Media).filter(sa.or_(
+        models.Media.titulo.ilike(like),
+        models.Media.titulo_ingles.ilike(like),
+        models.Media.elenco.ilike(like),
+        models.Media.director.ilike(like),
+    ))
+
+
+def resolve_mode(mode: Optional[str]) -> str:
+    """Modo efectivo según lo que hay disponible en esta base de datos"""
+    mode = mode if mode in MODES else "auto"
+    if mode in ("auto", "fulltext") and not _ready:
+        return "ilike"
+    if mode == "fuzzy" and not has_fuzzy():
+        return "ilike"
+    return mode
+
+
+def _cursor_engine(cursor: str) -> str:
+    scope = pagination.decode_cursor(cursor)["o"]
+    return scope if scope in ("fulltext", "fuzzy") else "ilike"
+
+
+def search(
+    db: Session,
+    term: str,
+    mode: Optional[str] = "auto",
+    limit: int = 24,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    options: Sequence[Any] = (),
+) -> Tuple[List[Any], Optional[str], Optional[Query], str]:
+    """
+    Devuelve (página, cursor_siguiente, consulta_sin_orden, motor_usado).
+    En modo auto se pasa al siguiente motor solo si el anterior no tiene ninguna
+    coincidencia; el cursor recuerda el motor para las páginas siguientes.
+    `options` son opciones de carga para la página (p. ej. load_only de projection.py).
+    """
+    mode = resolve_mode(mode)
+    if mode != "auto":
+        engines = [mode]
+    elif cursor:
+        engines = [_cursor_engine(cursor)]
+    else:
+        engines = ["fulltext", "fuzzy", "ilike"] if has_fuzzy() else ["fulltext", "ilike"]
+
+    for engine in engines:
+        if engine == "ilike":
+            query = ilike_query(db, term)
+            items, next_cursor = pagination.fetch_page(query.options(*options), None, limit, cursor=cursor, skip=skip)
+        else:
+            query, rank = fulltext_query(db, term) if engine == "fulltext" else fuzzy_query(db, term)
+            if query is None:
+                continue
+            items, next_cursor = pagination.fetch_ranked(
+                query.options(*options), rank, limit, cursor=cursor, skip=skip, scope=engine
+            )
+        if items or engine == engines[-1]:
+            return items, next_cursor, query, engine
+        # Página vacía por OFFSET, pero el motor sí tiene resultados: no cambiar de motor
+        if skip and query.with_entities(models.Media.id).limit(1).first() is not None:
+            return items, next_cursor, query, engine
+    return [], None, None, engines[-1]
+
+
+if __name__ == "__main__":
+    import database
+
+    migrate(database.engine)
+    if check_schema(database.engine):
+        print("✅ Columna search_vector e índice GIN listos")
@@ -0,0 +1,58 @@
+"""
+Utilidades de cache HTTP: ETag y respuestas 304 Not Modified.
+"""
+
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import Optional, Union
+
+from fastapi import Request, Response
+
+
+def make_etag(body: Union[str, bytes]) -> str:
+    """ETag fuerte a partir del contenido de la respuesta"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True si el cliente ya tiene esta versión (If-None-Match, comparación débil)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+    return any(opaque(tag) == opaque(etag) for tag in header.split(","))
+
+
+def not_modified_since(request: Request, last_modified: float) -> bool:
+    """True si If-Modified-Since es igual o posterior a last_modified (resolución de segundos)"""
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    return int(last_modified) <= since.timestamp()
+
+
+def cached_response(
+    request: Request,
+    body: Union[str, bytes],
+    etag: Optional[str] = None,
+    max_age: int = 0,
+    media_type: str = "application/json",
+) -> Response:
+    """Respuesta con ETag y Cache-Control; 304 sin cuerpo si el ETag coincide"""
+    etag = etag or make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
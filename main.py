@@ -1,6 +1,8 @@
 import models
 import database
 import crud
+import async_db
+import db_pool
 import schemas
 from translation_service import TranslationService, get_translation_service
 from poster_cache import (
@@ -13,22 +15,58 @@ from poster_cache import (
     clear_poster_cache
 )
 from fastapi import FastAPI, Depends, HTTPException, Query, Request, Body, status, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, text
-import requests
 import time
+import asyncio
+from datetime import datetime
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 import os
 from typing import List
 import unicodedata
 from bs4 import BeautifulSoup
-from config import TMDB_BASE_URL, REQUEST_TIMEOUT, get_tmdb_auth_headers, get_allowed_origins, get_lan_origin_regex
+import tmdb_client
+import singleflight
+import stats
+import stats_snapshot
+import catalog_links
+import catalog_events
+import catalog_version
+import pagination
+import projection
+import fast_json
+import fulltext
+import search_index
+import similarity
+import totals
+import tmdb_response_cache
+from http_cache import cached_response
+from config import (
+    TMDB_SEASONS_APPEND,
+    TMDB_POSTER_CONCURRENCY,
+    TMDB_SEARCH_POSTER_DEADLINE,
+    POSTER_BACKFILL_WORKERS,
+    TMDB_CACHE_CLIENT_MAX_AGE,
+    STATS_SNAPSHOT_ENABLED,
+    SEARCH_MODE,
+    SEARCH_INDEX_ENABLED,
+    SIMILARITY_ENABLED,
+    FAST_JSON_ENABLED,
+    get_allowed_origins,
+    get_lan_origin_regex,
+)
 
 app = FastAPI()
 
+# ETag por versión del catálogo y 304 en las lecturas (catalog_version.py).
+# Se añade primero para quedar dentro de CORS: los 304 también llevan sus cabeceras
+app.add_middleware(BaseHTTPMiddleware, dispatch=catalog_version.middleware)
+
 # Activar compresión GZIP para todas las respuestas
 app.add_middleware(GZipMiddleware, minimum_size=500)
 
@@ -41,7 +79,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Total-Count"],
+    expose_headers=["X-Total-Count", "X-Total-Estimated", "X-Next-Cursor", "X-Search-Mode"],
 )
 
 # Servir frontend React compilado
@@ -56,102 +94,336 @@ def get_db():
     finally:
         db.close()
 
-def get_best_poster(tmdb_id, media_type, language="es-ES"):
+def db_get(path: str, async_impl=None, **kwargs):
+    """
+    @app.get para las lecturas calientes. Con ASYNC_DB_ENABLED se registra la versión
+    async def sobre asyncpg (async_impl o el mismo cuerpo vía async_db.async_endpoint);
+    si no, la función síncrona tal cual, en el threadpool.
+    """
+    def decorator(fn):
+        endpoint = fn
+        if async_db.enabled():
+            endpoint = async_impl or async_db.async_endpoint(fn, kwargs.get("response_model"))
+        app.get(path, **kwargs)(endpoint)
+        return fn
+    return decorator
+
+def _pick_best_poster(posters, language="es-ES"):
+    """
+    Elige la mejor portada de una lista de imágenes de TMDb:
+    idioma solicitado, luego inglés, luego sin idioma (null) y por último cualquiera.
+    """
+    if not posters:
+        return ""
+    # Extraer el código de idioma base (ej: "es" de "es-ES")
+    lang_code = language.split("-")[0] if language else "en"
+    for candidates in (
+        [p for p in posters if p.get("iso_639_1") == lang_code],
+        [p for p in posters if p.get("iso_639_1") == "en"],
+        [p for p in posters if p.get("iso_639_1") is None],
+        posters,
+    ):
+        if candidates:
+            # Ordenar por vote_average y tomar la mejor
+            best_poster = max(candidates, key=lambda x: x.get("vote_average", 0))
+            return f"https://image.tmdb.org/t/p/w500{best_poster['file_path']}"
+    return ""
+
+async def get_best_poster_async(tmdb_id, media_type, language="es-ES"):
     """
     Obtiene la mejor portada para el idioma especificado.
     Busca primero portadas en el idioma solicitado, luego en inglés, y finalmente usa la por defecto.
     """
-    headers = get_tmdb_auth_headers()
-    
     # Obtener todas las imágenes disponibles
-    images_url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}/images"
-    images_r = requests.get(images_url, headers=headers, timeout=REQUEST_TIMEOUT)
+    images_r = await tmdb_client.aget(f"/{media_type}/{tmdb_id}/images")
     
     if images_r.status_code != 200:
         # Si falla, usar la portada por defecto
-        detail_url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}"
-        detail_r = requests.get(detail_url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
+        detail_r = await tmdb_client.aget(f"/{media_type}/{tmdb_id}", params={"language": language})
         if detail_r.status_code == 200:
             detail = detail_r.json()
             if detail.get("poster_path"):
                 return f"https://image.tmdb.org/t/p/w500{detail['poster_path']}"
         return ""
     
-    images_data = images_r.json()
-    posters = images_data.get("posters", [])
-    
-    if not posters:
-        return ""
-    
-    # Extraer el código de idioma base (ej: "es" de "es-ES")
+    return _pick_best_poster(images_r.json().get("posters", []), language)
+
+def get_best_poster(tmdb_id, media_type, language="es-ES"):
+    """Versión síncrona de get_best_poster_async (se ejecuta en el loop del cliente TMDb)"""
+    return tmdb_client.run(get_best_poster_async(tmdb_id, media_type, language))
+
+def _tmdb_media_type(tipo):
+    """Convierte el tipo del catálogo ('película'/'serie') al media_type de TMDb ('movie'/'tv')"""
+    tipo_norm = unicodedata.normalize('NFKD', tipo or '').encode('ASCII', 'ignore').decode('ASCII').lower().strip()
+    return "movie" if tipo_norm in ("pelicula", "movie") else "tv"
+
+async def _gather_best_posters(items, language, max_concurrency, timeout=None):
+    """
+    Resuelve portadas para [(tmdb_id, media_type), ...] con como mucho max_concurrency en vuelo.
+    Si se pasa timeout, lo pendiente al vencer se cancela y no aparece en el resultado.
+    Devuelve {(tmdb_id, media_type): poster_url} de lo resuelto sin errores.
+    """
+    if not items:
+        return {}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def resolve(tmdb_id, media_type):
+        async with semaphore:
+            return await get_best_poster_async(tmdb_id, media_type, language)
+
+    tasks = {asyncio.ensure_future(resolve(*item)): item for item in items}
+    done, pending = await asyncio.wait(tasks.keys(), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    return {tasks[t]: t.result() for t in done if not t.cancelled() and t.exception() is None}
+
+def _pick_trailer(videos, language="es-ES"):
+    """Tráiler de YouTube: primero en el idioma solicitado, luego en cualquier otro incluido (inglés)"""
     lang_code = language.split("-")[0] if language else "en"
-    
-    # Buscar portadas en el idioma específico primero
-    lang_posters = [p for p in posters if p.get("iso_639_1") == lang_code]
-    if lang_posters:
-        # Ordenar por vote_average y tomar la mejor
-        best_poster = max(lang_posters, key=lambda x: x.get("vote_average", 0))
-        return f"https://image.tmdb.org/t/p/w500{best_poster['file_path']}"
-    
-    # Si no hay en el idioma solicitado, buscar en inglés
-    en_posters = [p for p in posters if p.get("iso_639_1") == "en"]
-    if en_posters:
-        best_poster = max(en_posters, key=lambda x: x.get("vote_average", 0))
-        return f"https://image.tmdb.org/t/p/w500{best_poster['file_path']}"
-    
-    # Si no hay en inglés, usar la mejor portada sin idioma específico (null)
-    null_posters = [p for p in posters if p.get("iso_639_1") is None]
-    if null_posters:
-        best_poster = max(null_posters, key=lambda x: x.get("vote_average", 0))
-        return f"https://image.tmdb.org/t/p/w500{best_poster['file_path']}"
-    
-    # Como último recurso, usar cualquier portada disponible
-    if posters:
-        best_poster = max(posters, key=lambda x: x.get("vote_average", 0))
-        return f"https://image.tmdb.org/t/p/w500{best_poster['file_path']}"
-    
-    return ""
+    yt_trailers = [v for v in videos if v.get("site") == "YouTube" and v.get("type") == "Trailer"]
+    if not yt_trailers:
+        return None
+    preferred = [v for v in yt_trailers if v.get("iso_639_1") == lang_code]
+    return f"https://www.youtube.com/watch?v={(preferred or yt_trailers)[0]['key']}"
+
+def fetch_tmdb_bundle(tmdb_id, media_type, language="es-ES"):
+    """
+    Obtiene detalle, créditos, vídeos e imágenes en una sola llamada con append_to_response.
+    include_image_language/include_video_language cubren los fallbacks de idioma (solicitado, inglés, sin idioma).
+    """
+    lang_code = language.split("-")[0] if language else "en"
+    r = tmdb_client.get(f"/{media_type}/{tmdb_id}", params={
+        "language": language,
+        "append_to_response": "credits,videos,images",
+        "include_image_language": f"{lang_code},en,null",
+        "include_video_language": f"{lang_code},en",
+    })
+    if r.status_code != 200:
+        raise HTTPException(status_code=502, detail="Error al obtener detalles de TMDb")
+    return r.json()
+
+def get_tmdb_detalle(tmdb_id, media_type, language="es-ES"):
+    """Construye la respuesta de /tmdb para una película o serie a partir de una única llamada a TMDb"""
+    detail = fetch_tmdb_bundle(tmdb_id, media_type, language)
+    credits = detail.get("credits") or {}
+    elenco = ", ".join([a["name"] for a in credits.get("cast", [])[:5]])
+    imagen = _pick_best_poster((detail.get("images") or {}).get("posters", []), language)
+    if not imagen and detail.get("poster_path"):
+        imagen = f"https://image.tmdb.org/t/p/w500{detail['poster_path']}"
+    trailer_url = _pick_trailer((detail.get("videos") or {}).get("results", []), language)
+    if media_type == "movie":
+        director_list = [c["name"] for c in credits.get("crew", []) if c.get("job") == "Director"]
+        return {
+            "titulo": detail.get("title") or detail.get("name", ""),
+            "titulo_original": detail.get("original_title", ""),
+            "idioma_original": detail.get("original_language", ""),
+            "anio": int(detail.get("release_date", "").split("-")[0]) if detail.get("release_date") else None,
+            "genero": ", ".join([g["name"] for g in detail.get("genres", [])]),
+            "sinopsis": detail.get("overview", ""),
+            "director": ", ".join(director_list),
+            "elenco": elenco,
+            "imagen": imagen,
+            "estado": detail.get("status", ""),
+            "tipo": "película",
+            "temporadas": None,
+            "episodios": None,
+            "nota_personal": None,
+            "nota_tmdb": detail.get("vote_average"),
+            "votos_tmdb": detail.get("vote_count"),
+            "presupuesto": detail.get("budget"),
+            "recaudacion": detail.get("revenue"),
+            "trailer": trailer_url
+        }
+    creators = [c["name"] for c in credits.get("crew", []) if c.get("job") in ("Creator", "Director")]
+    # Obtener temporadas y episodios
+    temporadas_detalle = get_temporadas_detalle(tmdb_id, detail.get("seasons", []), language)
+    return {
+        "titulo": detail.get("name", ""),
+        "titulo_original": detail.get("original_name", ""),
+        "idioma_original": detail.get("original_language", ""),
+        "anio": int(detail.get("first_air_date", "").split("-")[0]) if detail.get("first_air_date") else None,
+        "genero": ", ".join([g["name"] for g in detail.get("genres", [])]),
+        "sinopsis": detail.get("overview", ""),
+        "director": ", ".join(list(set(creators))),
+        "elenco": elenco,
+        "imagen": imagen,
+        "estado": detail.get("status", ""),
+        "tipo": "serie",
+        "temporadas": detail.get("number_of_seasons"),
+        "episodios": detail.get("number_of_episodes"),
+        "nota_personal": None,
+        "nota_tmdb": detail.get("vote_average"),
+        "votos_tmdb": detail.get("vote_count"),
+        "temporadas_detalle": temporadas_detalle,
+        "trailer": trailer_url
+    }
+
+async def _fetch_seasons_async(tv_id, season_numbers, language):
+    """Descarga las temporadas en paralelo (limitadas por el presupuesto compartido del cliente TMDb).
+    Con TMDB_SEASONS_APPEND agrupa hasta 20 temporadas por llamada con append_to_response.
+    Devuelve {numero_temporada: datos} solo para las temporadas obtenidas.
+    """
+    season_data = {}
+    if TMDB_SEASONS_APPEND:
+        chunks = [season_numbers[i:i + 20] for i in range(0, len(season_numbers), 20)]
+        responses = await asyncio.gather(*[
+            tmdb_client.aget(f"/tv/{tv_id}", params={
+                "language": language,
+                "append_to_response": ",".join(f"season/{n}" for n in chunk)
+            })
+            for chunk in chunks
+        ], return_exceptions=True)
+        for chunk, r in zip(chunks, responses):
+            if isinstance(r, Exception) or r.status_code != 200:
+                continue
+            payload = r.json()
+            for n in chunk:
+                if payload.get(f"season/{n}"):
+                    season_data[n] = payload[f"season/{n}"]
+    else:
+        responses = await asyncio.gather(*[
+            tmdb_client.aget(f"/tv/{tv_id}/season/{n}", params={"language": language})
+            for n in season_numbers
+        ], return_exceptions=True)
+        for n, r in zip(season_numbers, responses):
+            if isinstance(r, Exception) or r.status_code != 200:
+                continue  # saltar temporadas sin info
+            season_data[n] = r.json()
+    return season_data
 
-@app.get("/search", response_model=List[schemas.Media])
+def get_temporadas_detalle(tv_id, seasons, language="es-ES"):
+    """Construye temporadas_detalle (en orden de temporada) a partir de detail["seasons"]"""
+    season_numbers = [s["season_number"] for s in seasons if s.get("season_number")]
+    if not season_numbers:
+        return []
+    season_data = tmdb_client.run(_fetch_seasons_async(tv_id, season_numbers, language))
+    temporadas_detalle = []
+    for season in seasons:
+        season_number = season.get("season_number")
+        if not season_number or season_number not in season_data:
+            continue
+        episodios = []
+        for ep in season_data[season_number].get("episodes", []):
+            episodios.append({
+                "numero": ep.get("episode_number"),
+                "titulo": ep.get("name", ""),
+                "resumen": ep.get("overview", ""),
+                "imagen": f"https://image.tmdb.org/t/p/w300{ep['still_path']}" if ep.get("still_path") else "",
+                "fecha": ep.get("air_date", "")
+            })
+        temporadas_detalle.append({
+            "numero": season_number,
+            "nombre": season.get("name", f"Temporada {season_number}"),
+            "episodios": episodios
+        })
+    return temporadas_detalle
+
+@db_get("/search", response_model=List[schemas.Media])
 def search_medias(
     q: str = Query(..., description="Búsqueda por título, actor o director"),
     skip: int = 0,
     limit: int = 24,
     include_total: bool = Query(False, description="Si true, añade X-Total-Count y puede envolver en {items,total}"),
+    total_mode: str = Query("exact", description="exact | estimate (estimación del planificador en resultados grandes)"),
+    cursor: str = Query(None, description="Cursor de X-Next-Cursor (paginación por clave; ignora skip)"),
+    mode: str = Query(SEARCH_MODE, description="auto | fulltext | fuzzy | ilike"),
+    view: str = Query(None, description="card: solo los campos de la rejilla (id, titulo, anio, imagen, tipo, notas)"),
+    fields: str = Query(None, description="Campos separados por comas (p. ej. id,titulo,imagen); sustituye a view"),
     db: Session = Depends(get_db),
     response: Response = None
 ):
-    """Efficient search using SQL with ASCII-normalized LIKE across key fields.
-    Falls back to in-Python filter if DB does not support unaccent.
+    """Ranked search over title, English title, director and cast (see fulltext.py).
+    Falls back to ILIKE when full-text search is not available in the database.
     """
+    names = _projection(view, fields)
     term = (q or "").strip()
     if not term:
         return []
 
-    # Try SQL-level case-insensitive search; simple LIKE on multiple columns
-    like = f"%{term}%"
-    query = db.query(models.Media).filter(
-        or_(
-            models.Media.titulo.ilike(like),
-            models.Media.titulo_ingles.ilike(like),
-            models.Media.elenco.ilike(like),
-            models.Media.director.ilike(like),
+    try:
+        items, next_cursor, query, engine = fulltext.search(
+            db, term, mode, max(1, min(limit, 200)), cursor=cursor, skip=max(0, skip),
+            options=projection.load_options(names) if names else ()
         )
-    )
-    total = None
-    if include_total:
-        total = query.count()
-        if response is not None:
-            response.headers["X-Total-Count"] = str(total)
-    # Apply pagination
-    items = query.offset(max(0, skip)).limit(max(1, min(limit, 200))).all()
-    return items
+    except pagination.CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if response is not None:
+        response.headers["X-Search-Mode"] = engine
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    if include_total and query is not None:
+        _set_total(response, db, query, totals.signature("search", q=term, engine=engine), total_mode)
+    return projection.render(items, names, response) if names else _render(items, response)
+
+@app.get("/search/suggest")
+def search_suggest(
+    q: str = Query(..., description="Texto escrito hasta ahora (autocompletado)"),
+    limit: int = Query(8, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Sugerencias desde el índice en memoria; consulta la BD mientras se construye"""
+    result = search_index.index.suggest(q, limit) if SEARCH_INDEX_ENABLED else None
+    if result is None:
+        items, _, _, _ = fulltext.search(db, q.strip(), limit=limit) if q.strip() else ([], None, None, None)
+        return [
+            {**{field: getattr(m, field) for field in search_index.SuggestDoc._fields}, "score": None}
+            for m in items
+        ]
+    return [{**doc._asdict(), "score": score} for doc, score in result]
+
+def _set_total(response, db, query, key, total_mode):
+    """X-Total-Count desde la cache de totales (conteo ligero o estimación)"""
+    total, estimated = totals.totals.count(db, query, key, total_mode)
+    if response is not None:
+        response.headers["X-Total-Count"] = str(total)
+        if estimated:
+            response.headers["X-Total-Estimated"] = "true"
+
+def _render(content, response, model=List[schemas.Media]):
+    """Con FAST_JSON_ENABLED la respuesta sale ya serializada (fast_json.py); si no, la valida FastAPI"""
+    return fast_json.render(content, model, response) if FAST_JSON_ENABLED else content
+
+def _projection(view, fields):
+    """projection.parse con los errores como 400"""
+    try:
+        return projection.parse(view, fields)
+    except projection.ProjectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _fetch_page(query, order_by, limit, cursor, skip, seed=None):
+    """pagination.fetch_page con los errores de cursor como 400"""
+    try:
+        return pagination.fetch_page(query, order_by, limit, cursor=cursor, skip=skip, seed=seed)
+    except pagination.CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.on_event("startup")
 def startup():
     database.init_db()
-
-@app.get("/medias", response_model=List[schemas.Media])
+    catalog_version.check_backend()
+    try:
+        catalog_links.create_tables(database.engine)
+        catalog_links.ensure_links(database.SessionLocal)
+    except Exception as e:
+        print(f"⚠️ Tablas de géneros/personas no disponibles: {e}")
+    fulltext.check_schema(database.engine)
+    if SEARCH_INDEX_ENABLED:
+        search_index.index.start_background_build(database.SessionLocal)
+    if SIMILARITY_ENABLED:
+        try:
+            similarity.index.start(database.SessionLocal)
+        except Exception as e:
+            print(f"⚠️ Índice de similares no disponible: {e}")
+
+@app.on_event("shutdown")
+def shutdown():
+    tmdb_client.close()
+
+@app.on_event("shutdown")
+async def shutdown_async_db():
+    await async_db.dispose()
+
+@db_get("/medias", response_model=List[schemas.Media])
 def read_medias(
     skip: int = 0,
     limit: int = 24,
@@ -167,30 +439,46 @@ def read_medias(
     min_nota_personal: float = None,
     tmdb_id: int = None,
     include_total: bool = Query(False, description="Si true, añade X-Total-Count a la respuesta"),
+    total_mode: str = Query("exact", description="exact | estimate (estimación del planificador en resultados grandes)"),
+    cursor: str = Query(None, description="Cursor de X-Next-Cursor (paginación por clave; ignora skip)"),
+    seed: str = Query(None, description="Semilla para order_by=random (orden estable entre páginas)"),
+    view: str = Query(None, description="card: solo los campos de la rejilla (id, titulo, anio, imagen, tipo, notas)"),
+    fields: str = Query(None, description="Campos separados por comas (p. ej. id,titulo,imagen); sustituye a view"),
     db: Session = Depends(get_db),
     response: Response = None
 ):
     import traceback
+    names = _projection(view, fields)
     try:
         base_query = crud.get_medias_query(
             db, skip=skip, limit=limit, order_by=order_by, tipo=tipo, pendiente=pendiente,
             genero=genero, min_year=min_year, max_year=max_year,
             min_nota=min_nota, min_nota_personal=min_nota_personal,
-            favorito=favorito, tag_id=tag_id, tmdb_id=tmdb_id
+            favorito=favorito, tag_id=tag_id, tmdb_id=tmdb_id, ordered=False,
+            with_tags=names is None
         )
-        total = None
+        if names:
+            base_query = base_query.options(*projection.load_options(names, order_by))
         if include_total:
-            total = base_query.count()
-            if response is not None:
-                response.headers["X-Total-Count"] = str(total)
-        result = base_query.offset(skip).limit(limit).all()
-        return result
+            key = totals.signature(
+                "medias", tipo=tipo, pendiente=pendiente, genero=genero, min_year=min_year,
+                max_year=max_year, min_nota=min_nota, min_nota_personal=min_nota_personal,
+                favorito=favorito, tag_id=tag_id, tmdb_id=tmdb_id,
+            )
+            _set_total(response, db, base_query, key, total_mode)
+        result, next_cursor = _fetch_page(base_query, order_by, limit, cursor, skip, seed)
+        if next_cursor and response is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return projection.render(result, names, response) if names else _render(result, response)
+    except HTTPException:
+        raise
     except Exception as e:
         print("ERROR EN /medias:", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-import unicodedata
+# Estadísticas: instantánea en memoria mantenida por eventos, o SQL directo si está desactivada
+stats_source = stats_snapshot.snapshot if STATS_SNAPSHOT_ENABLED else stats
 
 @app.get("/medias/count")
 def count_medias(
@@ -198,168 +486,91 @@ def count_medias(
     tipo: str = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Media)
-    if pendiente is not None:
-        query = query.filter(models.Media.pendiente == pendiente)
-    if tipo:
-        def normalize(s):
-            return unicodedata.normalize('NFKD', s or '').encode('ASCII', 'ignore').decode('ASCII').lower().strip()
-        ids = [m.id for m in query if normalize(m.tipo) == normalize(tipo)]
-        query = query.filter(models.Media.id.in_(ids))
-    return {"count": query.count()}
+    return {"count": stats_source.count_medias(db, pendiente, tipo)}
 
 @app.get("/medias/top5")
 def top5_medias(
     tipo: str = Query(..., description="pelicula o serie"),
     db: Session = Depends(get_db)
 ):
-    import unicodedata
-    def normalize(s):
-        return unicodedata.normalize('NFKD', s or '').encode('ASCII', 'ignore').decode('ASCII').lower().strip()
-    tipo_norm = normalize(tipo)
-    query = db.query(models.Media).filter(
-        models.Media.pendiente == False,
-        models.Media.nota_personal != None
-    )
-    ids = [m.id for m in query if normalize(m.tipo) == tipo_norm]
-    result = db.query(models.Media).filter(
-        models.Media.id.in_(ids)
-    ).order_by(models.Media.nota_personal.desc()).limit(5).all()
-    return [
-        {
-            "id": m.id,
-            "titulo": m.titulo,
-            "nota_personal": m.nota_personal,
-            "anio": getattr(m, "anio", None),
-            "tipo": m.tipo
-        }
-        for m in result
-    ]
-
-def get_generos(db: Session):
-    import unicodedata
-    def normalize(s):
-        return unicodedata.normalize('NFKD', s or '').encode('ASCII', 'ignore').decode('ASCII').lower().strip()
-    medias = db.query(models.Media).filter(models.Media.pendiente == False).all()
-    genero_count = {}
-    genero_original = {}
-    genero_notas = {}
-    for m in medias:
-        generos = (getattr(m, 'genero', '') or '').split(',')
-        generos = [g.strip() for g in generos if g.strip()]
-        for g in generos:
-            g_norm = normalize(g)
-            genero_count[g_norm] = genero_count.get(g_norm, 0) + 1
-            if g_norm not in genero_original:
-                genero_original[g_norm] = g  # Guarda el nombre original
-            if m.nota_personal is not None:
-                genero_notas.setdefault(g_norm, []).append(m.nota_personal)
-    return genero_count, genero_original, genero_notas
+    return stats_source.top_by_tipo(db, tipo, limit=5)
 
 @app.get("/medias/distribucion_generos")
 def distribucion_generos(db: Session = Depends(get_db)):
-    genero_count, genero_original, _ = get_generos(db)
-    return {genero_original[g]: genero_count[g] for g in genero_count}
+    return {nombre: total for nombre, total, _, _ in stats_source.generos(db)}
 
 @app.get("/medias/generos_vistos")
 def generos_vistos(db: Session = Depends(get_db)):
-    genero_count, genero_original, genero_notas = get_generos(db)
-    # Género más visto
-    mas_visto = None
-    mas_visto_count = 0
-    if genero_count:
-        mas_visto_norm = max(genero_count.items(), key=lambda x: x[1])[0]
-        mas_visto = genero_original.get(mas_visto_norm, mas_visto_norm)
-        mas_visto_count = genero_count[mas_visto_norm]
-    # Género mejor valorado
-    mejor_valorado = None
-    mejor_media = None
-    if genero_notas:
-        candidatos = [(g, sum(notas)/len(notas), len(notas)) for g, notas in genero_notas.items() if len(notas) >= 1]
-        candidatos.sort(key=lambda x: (-x[1], -x[2]))
-        if candidatos:
-            mejor_valorado = genero_original.get(candidatos[0][0], candidatos[0][0])
-            mejor_media = round(candidatos[0][1], 2)
-    return {
-        "mas_visto": mas_visto or '',
-        "mas_visto_count": mas_visto_count,
-        "mejor_valorado": mejor_valorado or '',
-        "mejor_valorado_media": mejor_media if mejor_media is not None else ''
-    }
+    # Género más visto y mejor valorado
+    return stats_source.generos_destacados(db)
 
 @app.get("/medias/peor_pelicula", response_model=schemas.Media)
 def peor_pelicula(db: Session = Depends(get_db)):
-    def normalize(s):
-        return unicodedata.normalize('NFKD', s or '').encode('ASCII', 'ignore').decode('ASCII').lower().strip()
-    tipo_norm = 'pelicula'
-    query = db.query(models.Media).filter(
-        models.Media.pendiente == False,
-        models.Media.nota_personal != None
-    )
-    ids = [m.id for m in query if normalize(m.tipo) == tipo_norm]
-    result = db.query(models.Media).filter(
-        models.Media.id.in_(ids)
-    ).order_by(models.Media.nota_personal.asc()).first()
+    result = stats_source.worst_by_tipo(db, "pelicula")
     if not result:
         raise HTTPException(status_code=404, detail="No hay películas con nota personal")
     return result
 
 @app.get("/medias/peor_serie", response_model=schemas.Media)
 def peor_serie(db: Session = Depends(get_db)):
-    def normalize(s):
-        return unicodedata.normalize('NFKD', s or '').encode('ASCII', 'ignore').decode('ASCII').lower().strip()
-    tipo_norm = 'serie'
-    query = db.query(models.Media).filter(
-        models.Media.pendiente == False,
-        models.Media.nota_personal != None
-    )
-    ids = [m.id for m in query if normalize(m.tipo) == tipo_norm]
-    result = db.query(models.Media).filter(
-        models.Media.id.in_(ids)
-    ).order_by(models.Media.nota_personal.asc()).first()
+    result = stats_source.worst_by_tipo(db, "serie")
     if not result:
         raise HTTPException(status_code=404, detail="No hay series con nota personal")
     return result
 
 @app.get("/medias/vistos_por_anio")
 def vistos_por_anio(db: Session = Depends(get_db)):
-    medias = db.query(models.Media).filter(models.Media.pendiente == False).all()
-    conteo = {}
-    for m in medias:
-        anio = getattr(m, 'anio', None)
-        if anio:
-            conteo[anio] = conteo.get(anio, 0) + 1
-    return conteo
+    return stats_source.vistos_por_anio(db)
 
 @app.get("/medias/top_personas")
 def top_personas(db: Session = Depends(get_db)):
-    from collections import Counter
-    medias = db.query(models.Media).filter(models.Media.pendiente == False).all()
-    actores = []
-    directores = []
-    for m in medias:
-        # Elenco: puede ser una cadena separada por coma
-        elenco = (getattr(m, 'elenco', '') or '').split(',')
-        elenco = [a.strip() for a in elenco if a.strip()]
-        actores.extend(elenco)
-        # Director: puede ser una cadena separada por coma
-        director = (getattr(m, 'director', '') or '').split(',')
-        director = [d.strip() for d in director if d.strip()]
-        directores.extend(director)
-    top_actores = Counter(actores).most_common(5)
-    top_directores = Counter(directores).most_common(5)
-    return {
-        "top_actores": top_actores,
-        "top_directores": top_directores
-    }
+    return stats_source.top_personas(db, limit=5)
+
+@app.get("/medias/stats")
+def medias_stats(
+    fields: str = Query(None, description="Campos separados por comas: " + ",".join(stats.DASHBOARD_FIELDS)),
+    db: Session = Depends(get_db)
+):
+    """Panel de estadísticas en una sola petición; `fields` limita lo que se calcula"""
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in stats.DASHBOARD_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(unknown)}")
+    else:
+        selected = stats.DASHBOARD_FIELDS
+    result = stats_source.dashboard(db, selected)
+    for key in ("peor_pelicula", "peor_serie"):
+        if result.get(key) is not None:
+            result[key] = schemas.Media.model_validate(result[key])
+    return result
 
-    conteo = {}
-    for m in medias:
-        anio = getattr(m, 'anio', None)
-        if anio is not None:
-            conteo[anio] = conteo.get(anio, 0) + 1
-    # Devuelve ordenado por año ascendente
-    return dict(sorted(conteo.items()))
+@app.post("/medias/stats/rebuild")
+def rebuild_stats(db: Session = Depends(get_db)):
+    """Reconstruir desde la base de datos la instantánea de estadísticas (corrige deriva)"""
+    if not STATS_SNAPSHOT_ENABLED:
+        raise HTTPException(status_code=409, detail="La instantánea de estadísticas está desactivada")
+    return stats_snapshot.snapshot.rebuild(db)
+
+@app.post("/medias/similares/rebuild")
+def rebuild_similares(db: Session = Depends(get_db)):
+    """Recalcular todos los similares precalculados (actualiza el IDF de géneros/keywords)"""
+    if not SIMILARITY_ENABLED:
+        raise HTTPException(status_code=409, detail="El índice de similares está desactivado")
+    return similarity.index.rebuild(db)
+
+@app.get("/medias/recomendaciones", response_model=List[schemas.Media])
+def recomendaciones(
+    ids: List[int] = Query(..., description="Medias semilla (?ids=1&ids=2...)"),
+    limit: int = Query(24, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Medias más parecidas a un conjunto de títulos ("más como estas")"""
+    if not similarity.index.is_ready():
+        raise HTTPException(status_code=503, detail="El índice de similares se está cargando")
+    ranked = [media_id for _, media_id in similarity.index.recommend(ids[:50], limit)]
+    medias = {m.id: m for m in db.query(models.Media).filter(models.Media.id.in_(ranked))} if ranked else {}
+    return [medias[i] for i in ranked if i in medias]
 
 @app.get("/health")
 def healthcheck():
@@ -373,7 +584,14 @@ def healthcheck():
     except Exception as e:
         db_error = str(e)
     cache = {
-        "poster_cache": get_cache_stats() or {}
+        "poster_cache": get_cache_stats() or {},
+        "tmdb_responses": tmdb_response_cache.get_stats(),
+        "tmdb_singleflight": singleflight.get_stats(),
+        "stats_snapshot": stats_snapshot.snapshot.get_stats(),
+        "totals": totals.totals.get_stats(),
+        "search_index": search_index.index.get_stats(),
+        "similarity": similarity.index.get_stats(),
+        "catalog_version": catalog_version.version.get_stats()
     }
     elapsed_ms = round((time.time() - started) * 1000)
     overall = "ok" if db_status == "ok" else "degraded"
@@ -381,16 +599,22 @@ def healthcheck():
         "status": overall,
         "db": db_status,
         "db_error": db_error,
+        "db_pool": db_pool.get_stats(),
         "cache": cache,
         "latency_ms": elapsed_ms
     }
 
-@app.get("/medias/{media_id}", response_model=schemas.Media)
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métricas del pool de conexiones en formato de texto de Prometheus"""
+    return PlainTextResponse(db_pool.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+@db_get("/medias/{media_id}", response_model=schemas.Media)
 def read_media(media_id: int, db: Session = Depends(get_db)):
     db_media = crud.get_media(db, media_id=media_id)
     if db_media is None:
         raise HTTPException(status_code=404, detail="Media not found")
-    return db_media
+    return _render(db_media, None, schemas.Media)
 
 @app.get("/medias/{media_id}/similares", response_model=List[schemas.Media])
 def get_similares(media_id: int, db: Session = Depends(get_db)):
@@ -433,12 +657,42 @@ def update_anotacion_personal(media_id: int, anotacion_personal: str = Body(...)
     return db_media
 
 @app.get("/pendientes", response_model=List[schemas.Media])
-def read_pendientes(skip: int = 0, limit: int = 24, db: Session = Depends(get_db)):
-    return crud.get_pendientes(db, skip=skip, limit=limit)
+def read_pendientes(
+    skip: int = 0,
+    limit: int = 24,
+    cursor: str = None,
+    view: str = Query(None, description="card: solo los campos de la rejilla (id, titulo, anio, imagen, tipo, notas)"),
+    fields: str = Query(None, description="Campos separados por comas (p. ej. id,titulo,imagen); sustituye a view"),
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
+    names = _projection(view, fields)
+    query = crud.get_pendientes_query(db)
+    if names:
+        query = query.options(*projection.load_options(names))
+    items, next_cursor = _fetch_page(query, None, limit, cursor, skip)
+    if next_cursor and response is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return projection.render(items, names, response) if names else _render(items, response)
 
 @app.get("/favoritos", response_model=List[schemas.Media])
-def read_favoritos(skip: int = 0, limit: int = 24, db: Session = Depends(get_db)):
-    return crud.get_favoritos(db, skip=skip, limit=limit)
+def read_favoritos(
+    skip: int = 0,
+    limit: int = 24,
+    cursor: str = None,
+    view: str = Query(None, description="card: solo los campos de la rejilla (id, titulo, anio, imagen, tipo, notas)"),
+    fields: str = Query(None, description="Campos separados por comas (p. ej. id,titulo,imagen); sustituye a view"),
+    response: Response = None,
+    db: Session = Depends(get_db)
+):
+    names = _projection(view, fields)
+    query = crud.get_favoritos_query(db)
+    if names:
+        query = query.options(*projection.load_options(names))
+    items, next_cursor = _fetch_page(query, None, limit, cursor, skip)
+    if next_cursor and response is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return projection.render(items, names, response) if names else _render(items, response)
 
 @app.get("/tags", response_model=List[schemas.Tag])
 def get_tags(db: Session = Depends(get_db)):
@@ -484,161 +738,54 @@ def get_tmdb_info(
     media_type: str = Query(None, description="'movie' o 'tv' si se busca por id"),
     language: str = Query("es-ES", description="Idioma para la consulta TMDb (ej: 'es-ES', 'en-US')")
 ):
-    headers = get_tmdb_auth_headers()
     # Si se pasa id y media_type, buscar detalle exacto
     if id and media_type:
-        tipo = "película" if media_type == "movie" else "serie"
-        if tipo == "película":
-            detail_url = f"{TMDB_BASE_URL}/movie/{id}"
-            credits_url = f"{TMDB_BASE_URL}/movie/{id}/credits"
-            detail_params = {"language": language}
-            detail_r = requests.get(detail_url, headers=headers, params=detail_params, timeout=REQUEST_TIMEOUT)
-            if detail_r.status_code != 200:
-                raise HTTPException(status_code=502, detail="Error al obtener detalles de TMDb")
-            detail = detail_r.json()
-            credits_r = requests.get(credits_url, headers=headers, timeout=REQUEST_TIMEOUT)
-            director = ""
-            elenco = ""
-            if credits_r.status_code == 200:
-                credits = credits_r.json()
-                director_list = [c["name"] for c in credits.get("crew", []) if c.get("job") == "Director"]
-                director = ", ".join(director_list)
-                elenco_list = [a["name"] for a in credits.get("cast", [])[:5]]
-                elenco = ", ".join(elenco_list)
-            # Obtener tráiler de YouTube (primero en el idioma solicitado, luego en inglés si no hay)
-            trailer_url = None
-            videos_url = f"{TMDB_BASE_URL}/movie/{id}/videos"
-            videos_r = requests.get(videos_url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-            videos = []
-            if videos_r.status_code == 200:
-                videos = videos_r.json().get("results", [])
-            yt_trailers = [v for v in videos if v.get("site") == "YouTube" and v.get("type") == "Trailer"]
-            if not yt_trailers and language != "en-US":
-                videos_r_en = requests.get(videos_url, headers=headers, params={"language": "en-US"}, timeout=REQUEST_TIMEOUT)
-                if videos_r_en.status_code == 200:
-                    videos_en = videos_r_en.json().get("results", [])
-                    yt_trailers = [v for v in videos_en if v.get("site") == "YouTube" and v.get("type") == "Trailer"]
-            if yt_trailers:
-                trailer_url = f"https://www.youtube.com/watch?v={yt_trailers[0]['key']}"
-            return {
-                "titulo": detail.get("title") or detail.get("name", ""),
-                "titulo_original": detail.get("original_title", ""),
-                "idioma_original": detail.get("original_language", ""),
-                "anio": int(detail.get("release_date", "").split("-")[0]) if detail.get("release_date") else None,
-                "genero": ", ".join([g["name"] for g in detail.get("genres", [])]),
-                "sinopsis": detail.get("overview", ""),
-                "director": director,
-                "elenco": elenco,
-                "imagen": get_best_poster(id, "movie", language),
-                "estado": detail.get("status", ""),
-                "tipo": tipo,
-                "temporadas": None,
-                "episodios": None,
-                "nota_personal": None,
-                "nota_tmdb": detail.get("vote_average"),
-                "votos_tmdb": detail.get("vote_count"),
-                "presupuesto": detail.get("budget"),
-                "recaudacion": detail.get("revenue"),
-                "trailer": trailer_url
-            }
-        else:
-            detail_url = f"{TMDB_BASE_URL}/tv/{id}"
-            credits_url = f"{TMDB_BASE_URL}/tv/{id}/credits"
-            detail_params = {"language": language}
-            detail_r = requests.get(detail_url, headers=headers, params=detail_params, timeout=REQUEST_TIMEOUT)
-            if detail_r.status_code != 200:
-                raise HTTPException(status_code=502, detail="Error al obtener detalles de TMDb")
-            detail = detail_r.json()
-            credits_r = requests.get(credits_url, headers=headers, timeout=REQUEST_TIMEOUT)
-            director = ""
-            elenco = ""
-            if credits_r.status_code == 200:
-                credits = credits_r.json()
-                creators = [c["name"] for c in credits.get("crew", []) if c.get("job") in ("Creator", "Director")]
-                director = ", ".join(list(set(creators)))
-                elenco_list = [a["name"] for a in credits.get("cast", [])[:5]]
-                elenco = ", ".join(elenco_list)
-            temporadas_detalle = []
-            for season in detail.get("seasons", []):
-                if not season.get("season_number"):
-                    continue
-                season_number = season["season_number"]
-                season_url = f"{TMDB_BASE_URL}/tv/{id}/season/{season_number}"
-                season_r = requests.get(season_url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-                if season_r.status_code != 200:
-                    continue
-                season_data = season_r.json()
-                episodios = []
-                for ep in season_data.get("episodes", []):
-                    episodios.append({
-                        "numero": ep.get("episode_number"),
-                        "titulo": ep.get("name", ""),
-                        "resumen": ep.get("overview", ""),
-                        "imagen": f"https://image.tmdb.org/t/p/w300{ep['still_path']}" if ep.get("still_path") else "",
-                        "fecha": ep.get("air_date", "")
-                    })
-                temporadas_detalle.append({
-                    "numero": season_number,
-                    "nombre": season.get("name", f"Temporada {season_number}"),
-                    "episodios": episodios
-                })
-                time.sleep(0.15)
-            # Obtener tráiler de YouTube para series (primero en el idioma solicitado, luego en inglés si no hay)
-            trailer_url = None
-            videos_url = f"{TMDB_BASE_URL}/tv/{id}/videos"
-            videos_r = requests.get(videos_url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-            videos = []
-            if videos_r.status_code == 200:
-                videos = videos_r.json().get("results", [])
-            yt_trailers = [v for v in videos if v.get("site") == "YouTube" and v.get("type") == "Trailer"]
-            if not yt_trailers and language != "en-US":
-                videos_r_en = requests.get(videos_url, headers=headers, params={"language": "en-US"}, timeout=REQUEST_TIMEOUT)
-                if videos_r_en.status_code == 200:
-                    videos_en = videos_r_en.json().get("results", [])
-                    yt_trailers = [v for v in videos_en if v.get("site") == "YouTube" and v.get("type") == "Trailer"]
-            if yt_trailers:
-                trailer_url = f"https://www.youtube.com/watch?v={yt_trailers[0]['key']}"
-            return {
-                "titulo": detail.get("name", ""),
-                "titulo_original": detail.get("original_name", ""),
-                "idioma_original": detail.get("original_language", ""),
-                "anio": int(detail.get("first_air_date", "").split("-")[0]) if detail.get("first_air_date") else None,
-                "genero": ", ".join([g["name"] for g in detail.get("genres", [])]),
-                "sinopsis": detail.get("overview", ""),
-                "director": director,
-                "elenco": elenco,
-                "imagen": get_best_poster(id, "tv", language),
-                "estado": detail.get("status", ""),
-                "tipo": tipo,
-                "temporadas": detail.get("number_of_seasons"),
-                "episodios": detail.get("number_of_episodes"),
-                "nota_personal": None,
-                "nota_tmdb": detail.get("vote_average"),
-                "votos_tmdb": detail.get("vote_count"),
-                "temporadas_detalle": temporadas_detalle,
-                "trailer": trailer_url
-            }
+        return get_tmdb_detalle(id, "movie" if media_type == "movie" else "tv", language)
     # Si listar=True, devolver lista resumida de opciones
     if listar:
-        search_url = f"{TMDB_BASE_URL}/search/multi"
+        search_url = "/search/multi"
         params = {"query": title, "language": language, "include_adult": "false"}
-        r = requests.get(search_url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        r = tmdb_client.get(search_url, params=params)
         if r.status_code != 200:
             raise HTTPException(status_code=502, detail="Error al conectar con TMDb")
         data = r.json()
         if not data.get("results"):
             raise HTTPException(status_code=404, detail="No encontrado en TMDb")
+        resultados = [res for res in data["results"] if res["media_type"] in ("movie", "tv")]
+        # Portadas: cache compartido primero, luego TMDb en paralelo con tiempo límite
+        lang_code = language.split("-")[0].lower() if language else "en"
+        cache_keys = {(res["id"], res["media_type"]): get_cache_key(None, lang_code, res["id"], res["media_type"]) for res in resultados}
+        item_by_key = {key: item for item, key in cache_keys.items()}
+        cached_posters = get_batch_poster_cache(
+            list(cache_keys.values()),
+            refresh=lambda key: get_best_poster(*item_by_key[key], language)
+        )
+        posters = {item: cached_posters.get(key) for item, key in cache_keys.items() if cached_posters.get(key)}
+        pendientes = [item for item in cache_keys if item not in posters]
+        if pendientes:
+            try:
+                resueltos = tmdb_client.run(_gather_best_posters(
+                    pendientes, language, TMDB_POSTER_CONCURRENCY, timeout=TMDB_SEARCH_POSTER_DEADLINE
+                ))
+            except Exception:
+                resueltos = {}
+            resueltos = {item: url for item, url in resueltos.items() if url}
+            if resueltos:
+                set_batch_poster_cache({cache_keys[item]: url for item, url in resueltos.items()})
+            posters.update(resueltos)
         opciones = []
-        for res in data["results"]:
-            if res["media_type"] not in ("movie", "tv"):
-                continue
+        for res in resultados:
             media_type = res["media_type"]
+            imagen = posters.get((res["id"], media_type))
+            if not imagen:
+                # Fallback: portada del propio resultado de búsqueda
+                imagen = f"https://image.tmdb.org/t/p/w500{res['poster_path']}" if res.get("poster_path") else ""
             opciones.append({
                 "id": res["id"],
                 "media_type": media_type,
                 "titulo": res.get("title") or res.get("name", ""),
                 "anio": (res.get("release_date") or res.get("first_air_date") or "")[:4],
-                "imagen": get_best_poster(res["id"], media_type, language),
+                "imagen": imagen,
                 "nota_tmdb": res.get("vote_average"),
                 "votos_tmdb": res.get("vote_count")
             })
@@ -646,9 +793,9 @@ def get_tmdb_info(
     # Si no, lógica anterior (elige uno y devuelve detalle)
     item = None
     if tipo_preferido:
-        search_url = f"{TMDB_BASE_URL}/search/multi"
+        search_url = "/search/multi"
         params = {"query": title, "language": language, "include_adult": "false"}
-        r = requests.get(search_url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        r = tmdb_client.get(search_url, params=params)
         if r.status_code != 200:
             raise HTTPException(status_code=502, detail="Error al conectar con TMDb")
         data = r.json()
@@ -662,191 +809,86 @@ def get_tmdb_info(
                 item = res
                 break
     if not item:
-        search_url = f"{TMDB_BASE_URL}/search/multi"
+        search_url = "/search/multi"
         params = {"query": title, "language": language, "include_adult": "false"}
-        r = requests.get(search_url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        r = tmdb_client.get(search_url, params=params)
         if r.status_code != 200:
             raise HTTPException(status_code=502, detail="Error al conectar con TMDb")
         data = r.json()
         if not data.get("results"):
             raise HTTPException(status_code=404, detail="No encontrado en TMDb")
         item = data["results"][0]
-    tipo = "película" if item["media_type"] == "movie" else "serie"
     # Obtenemos detalles completos
-    if tipo == "película":
-        detail_url = f"{TMDB_BASE_URL}/movie/{item['id']}"
-        credits_url = f"{TMDB_BASE_URL}/movie/{item['id']}/credits"
-        detail_params = {"language": language}
-        detail_r = requests.get(detail_url, headers=headers, params=detail_params, timeout=REQUEST_TIMEOUT)
-        if detail_r.status_code != 200:
-            raise HTTPException(status_code=502, detail="Error al obtener detalles de TMDb")
-        detail = detail_r.json()
-        credits_r = requests.get(credits_url, headers=headers, timeout=REQUEST_TIMEOUT)
-        director = ""
-        elenco = ""
-        if credits_r.status_code == 200:
-            credits = credits_r.json()
-            director_list = [c["name"] for c in credits.get("crew", []) if c.get("job") == "Director"]
-            director = ", ".join(director_list)
-            elenco_list = [a["name"] for a in credits.get("cast", [])[:5]]
-            elenco = ", ".join(elenco_list)
-        return {
-            "titulo": detail.get("title") or detail.get("name", ""),
-            "titulo_original": detail.get("original_title", ""),
-            "idioma_original": detail.get("original_language", ""),
-            "anio": int(detail.get("release_date", "").split("-")[0]) if detail.get("release_date") else None,
-            "genero": ", ".join([g["name"] for g in detail.get("genres", [])]),
-            "sinopsis": detail.get("overview", ""),
-            "director": director,
-            "elenco": elenco,
-            "imagen": get_best_poster(item['id'], "movie", language),
-            "estado": detail.get("status", ""),
-            "tipo": tipo,
-            "temporadas": None,
-            "episodios": None,
-            "nota_personal": None,
-            "nota_tmdb": detail.get("vote_average"),
-            "votos_tmdb": detail.get("vote_count"),
-            "presupuesto": detail.get("budget"),
-            "recaudacion": detail.get("revenue")
-        }
-    else:
-        detail_url = f"{TMDB_BASE_URL}/tv/{item['id']}"
-        credits_url = f"{TMDB_BASE_URL}/tv/{item['id']}/credits"
-        detail_params = {"language": language}
-        detail_r = requests.get(detail_url, headers=headers, params=detail_params, timeout=REQUEST_TIMEOUT)
-        if detail_r.status_code != 200:
-            raise HTTPException(status_code=502, detail="Error al obtener detalles de TMDb")
-        detail = detail_r.json()
-        credits_r = requests.get(credits_url, headers=headers, timeout=REQUEST_TIMEOUT)
-        director = ""
-        elenco = ""
-        if credits_r.status_code == 200:
-            credits = credits_r.json()
-            creators = [c["name"] for c in credits.get("crew", []) if c.get("job") in ("Creator", "Director")]
-            director = ", ".join(list(set(creators)))
-            elenco_list = [a["name"] for a in credits.get("cast", [])[:5]]
-            elenco = ", ".join(elenco_list)
-        # Obtener temporadas y episodios
-        temporadas_detalle = []
-        for season in detail.get("seasons", []):
-            if not season.get("season_number"):
-                continue
-            season_number = season["season_number"]
-            season_url = f"{TMDB_BASE_URL}/tv/{item['id']}/season/{season_number}"
-            season_r = requests.get(season_url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-            if season_r.status_code != 200:
-                continue  # saltar temporadas sin info
-            season_data = season_r.json()
-            episodios = []
-            for ep in season_data.get("episodes", []):
-                episodios.append({
-                    "numero": ep.get("episode_number"),
-                    "titulo": ep.get("name", ""),
-                    "resumen": ep.get("overview", ""),
-                    "imagen": f"https://image.tmdb.org/t/p/w300{ep['still_path']}" if ep.get("still_path") else "",
-                    "fecha": ep.get("air_date", "")
-                })
-            temporadas_detalle.append({
-                "numero": season_number,
-                "nombre": season.get("name", f"Temporada {season_number}"),
-                "episodios": episodios
-            })
-            time.sleep(0.15)  # para no sobrecargar la API
-        return {
-            "titulo": detail.get("name", ""),
-            "titulo_original": detail.get("original_name", ""),
-            "idioma_original": detail.get("original_language", ""),
-            "anio": int(detail.get("first_air_date", "").split("-")[0]) if detail.get("first_air_date") else None,
-            "genero": ", ".join([g["name"] for g in detail.get("genres", [])]),
-            "sinopsis": detail.get("overview", ""),
-            "director": director,
-            "elenco": elenco,
-            "imagen": get_best_poster(item['id'], "tv", language),
-            "estado": detail.get("status", ""),
-            "tipo": tipo,
-            "temporadas": detail.get("number_of_seasons"),
-            "episodios": detail.get("number_of_episodes"),
-            "nota_personal": None,
-            "nota_tmdb": detail.get("vote_average"),
-            "votos_tmdb": detail.get("vote_count"),
-            "temporadas_detalle": temporadas_detalle
-        }
+    return get_tmdb_detalle(item["id"], "movie" if item["media_type"] == "movie" else "tv", language)
+
+def _tmdb_proxy(request: Request, url: str, ttl_class: str, error_detail: str, params: dict = None):
+    """
+    Proxy cacheado a TMDb: sirve el JSON desde el cache de respuestas (TTL según ttl_class)
+    con ETag, y responde 304 si el cliente ya tiene la misma versión.
+    """
+    def fetch():
+        r = tmdb_client.get(url, params=params)
+        if r.status_code != 200:
+            raise HTTPException(status_code=502, detail=error_detail)
+        return r.text
+
+    body, etag = tmdb_response_cache.get_or_fetch(url, params, ttl_class, fetch)
+    return cached_response(request, body, etag, max_age=TMDB_CACHE_CLIENT_MAX_AGE)
 
 @app.get("/tmdb/{media_type}/{tmdb_id}/watch/providers")
-def tmdb_watch_providers(media_type: str, tmdb_id: int):
+def tmdb_watch_providers(media_type: str, tmdb_id: int, request: Request):
     if media_type not in ("movie", "tv"):
         raise HTTPException(status_code=400, detail="media_type must be 'movie' or 'tv'")
-    headers = get_tmdb_auth_headers()
-    url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}/watch/providers"
-    r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener watch providers de TMDb")
-    return r.json()
+    url = f"/{media_type}/{tmdb_id}/watch/providers"
+    return _tmdb_proxy(request, url, "watch_providers", "Error al obtener watch providers de TMDb")
 
 @app.get("/tmdb/{media_type}/{tmdb_id}/external_ids")
-def tmdb_external_ids(media_type: str, tmdb_id: int):
+def tmdb_external_ids(media_type: str, tmdb_id: int, request: Request):
     # Accept person as well to avoid route conflicts with /tmdb/person/{id}/external_ids
     if media_type not in ("movie", "tv", "person"):
         raise HTTPException(status_code=400, detail="media_type must be 'movie', 'tv' or 'person'")
-    headers = get_tmdb_auth_headers()
     if media_type == "person":
-        url = f"{TMDB_BASE_URL}/person/{tmdb_id}/external_ids"
+        url = f"/person/{tmdb_id}/external_ids"
     else:
-        url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}/external_ids"
-    r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener external_ids de TMDb")
-    return r.json()
+        url = f"/{media_type}/{tmdb_id}/external_ids"
+    return _tmdb_proxy(request, url, "external_ids", "Error al obtener external_ids de TMDb")
 
 @app.get("/tmdb/{media_type}/{tmdb_id}")
-def tmdb_detail(media_type: str, tmdb_id: int, language: str = Query("es-ES")):
+def tmdb_detail(media_type: str, tmdb_id: int, request: Request, language: str = Query("es-ES")):
     # Accept person as well to avoid conflicts with /tmdb/person/{id}
     if media_type not in ("movie", "tv", "person"):
         raise HTTPException(status_code=400, detail="media_type must be 'movie', 'tv' or 'person'")
-    headers = get_tmdb_auth_headers()
     if media_type == "person":
-        url = f"{TMDB_BASE_URL}/person/{tmdb_id}"
+        url = f"/person/{tmdb_id}"
     else:
-        url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}"
-    r = requests.get(url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener detalle de TMDb")
-    return r.json()
+        url = f"/{media_type}/{tmdb_id}"
+    # Los fallos simultáneos de la misma clave comparten una sola llamada a TMDb (single-flight)
+    return _tmdb_proxy(request, url, "detail", "Error al obtener detalle de TMDb", {"language": language})
 
 @app.get("/tmdb/collection/{collection_id}")
-def tmdb_collection(collection_id: int, language: str = Query("es-ES")):
-    headers = get_tmdb_auth_headers()
-    url = f"{TMDB_BASE_URL}/collection/{collection_id}"
-    r = requests.get(url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener colección de TMDb")
-    return r.json()
+def tmdb_collection(collection_id: int, request: Request, language: str = Query("es-ES")):
+    url = f"/collection/{collection_id}"
+    return _tmdb_proxy(request, url, "detail", "Error al obtener colección de TMDb", {"language": language})
 
 
 # Endpoint para obtener los créditos (reparto y equipo) de una película o serie desde TMDb
 @app.get("/tmdb/{media_type}/{tmdb_id}/credits")
-def tmdb_credits(media_type: str, tmdb_id: int):
+def tmdb_credits(media_type: str, tmdb_id: int, request: Request):
     """Proxy para obtener créditos (cast y crew) de una película o serie desde TMDb"""
     if media_type not in ("movie", "tv"):
         raise HTTPException(status_code=400, detail="media_type must be 'movie' or 'tv'")
-    headers = get_tmdb_auth_headers()
-    url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}/credits"
-    r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener créditos de TMDb")
-    return r.json()
+    url = f"/{media_type}/{tmdb_id}/credits"
+    return _tmdb_proxy(request, url, "credits", "Error al obtener créditos de TMDb")
 
 @app.get("/tmdb/{media_type}/{tmdb_id}/recommendations")
-def tmdb_recommendations(media_type: str, tmdb_id: int, language: str = Query("es-ES"), page: int = Query(1)):
+def tmdb_recommendations(media_type: str, tmdb_id: int, request: Request, language: str = Query("es-ES"), page: int = Query(1)):
     if media_type not in ("movie", "tv"):
         raise HTTPException(status_code=400, detail="media_type must be 'movie' or 'tv'")
-    headers = get_tmdb_auth_headers()
-    url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}/recommendations"
-    r = requests.get(url, headers=headers, params={"language": language, "page": page}, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener recomendaciones de TMDb")
-    return r.json()
+    url = f"/{media_type}/{tmdb_id}/recommendations"
+    return _tmdb_proxy(
+        request, url, "recommendations", "Error al obtener recomendaciones de TMDb",
+        {"language": language, "page": page}
+    )
 
 from sqlalchemy import or_
 # --- Person endpoints (TMDb proxy) ---
@@ -854,46 +896,38 @@ from sqlalchemy import or_
 @app.get("/medias/by_actor/{person_tmdb_id}", response_model=List[schemas.Media])
 def get_medias_by_actor(person_tmdb_id: int, db: Session = Depends(get_db)):
     """
-    Devuelve todas las medias donde el actor con ese TMDb ID aparece en el campo elenco (como id o nombre).
-    Busca coincidencias en el campo elenco (que es texto, puede contener ids o nombres).
+    Devuelve todas las medias donde el actor con ese TMDb ID aparece en el elenco.
     """
-    # El campo elenco puede ser: "Nombre1 (id1), Nombre2 (id2), ..."
-    # Buscamos por id entre paréntesis o por nombre exacto si no hay id
+    if catalog_links.is_ready():
+        # Join indexado por persona.tmdb_id (exacto: 31 no coincide con 131)
+        return crud.get_medias_by_persona(db, person_tmdb_id, rol=catalog_links.ROL_ACTOR)
+    # Mientras no estén las tablas de enlace: el campo elenco puede ser "Nombre1 (id1), Nombre2 (id2), ..."
     # Ejemplo: elenco = "Tom Hanks (31), Tim Allen (12898)"
     # Para person_tmdb_id=31, buscar "(31)" en elenco
     pattern = f"({person_tmdb_id})"
     query = db.query(models.Media).filter(models.Media.elenco.ilike(f"%{pattern}%"))
     return query.all()
 @app.get("/tmdb/person/{person_id}")
-def tmdb_person_detail(person_id: int, language: str = Query("es-ES")):
+def tmdb_person_detail(person_id: int, request: Request, language: str = Query("es-ES")):
     """Proxy para obtener detalles de una persona (actor/director) desde TMDb"""
-    headers = get_tmdb_auth_headers()
-    url = f"{TMDB_BASE_URL}/person/{person_id}"
-    r = requests.get(url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener detalles de la persona en TMDb")
-    return r.json()
+    url = f"/person/{person_id}"
+    return _tmdb_proxy(request, url, "detail", "Error al obtener detalles de la persona en TMDb", {"language": language})
 
 @app.get("/tmdb/person/{person_id}/combined_credits")
-def tmdb_person_combined_credits(person_id: int, language: str = Query("es-ES")):
+def tmdb_person_combined_credits(person_id: int, request: Request, language: str = Query("es-ES")):
     """Proxy para obtener créditos combinados (películas y series) de una persona en TMDb"""
-    headers = get_tmdb_auth_headers()
-    url = f"{TMDB_BASE_URL}/person/{person_id}/combined_credits"
+    url = f"/person/{person_id}/combined_credits"
     # language suele aplicarse a los títulos de movie/tv en los créditos
-    r = requests.get(url, headers=headers, params={"language": language}, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener combined_credits de la persona en TMDb")
-    return r.json()
+    return _tmdb_proxy(
+        request, url, "credits", "Error al obtener combined_credits de la persona en TMDb",
+        {"language": language}
+    )
 
 @app.get("/tmdb/person/{person_id}/external_ids")
-def tmdb_person_external_ids(person_id: int):
+def tmdb_person_external_ids(person_id: int, request: Request):
     """Proxy para obtener IDs externos (Twitter/Instagram/FB) de una persona en TMDb"""
-    headers = get_tmdb_auth_headers()
-    url = f"{TMDB_BASE_URL}/person/{person_id}/external_ids"
-    r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Error al obtener external_ids de la persona en TMDb")
-    return r.json()
+    url = f"/person/{person_id}/external_ids"
+    return _tmdb_proxy(request, url, "external_ids", "Error al obtener external_ids de la persona en TMDb")
 
 # --- ENDPOINTS PARA TRADUCCIONES ---
 
@@ -947,7 +981,7 @@ def cache_media_translation(
         raise HTTPException(status_code=500, detail=f"Error caching translation: {str(e)}")
 
 @app.get("/translations/cache/stats")
-def get_cache_stats(db: Session = Depends(get_db)):
+def get_translation_cache_stats(db: Session = Depends(get_db)):
     """Get statistics about cached translations"""
     try:
         from sqlalchemy import func
@@ -999,6 +1033,93 @@ def clear_translation_cache(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error clearing cache: {str(e)}")
 
+def _resolve_dynamic_poster(db, tmdb_id, media_type, language, lang_code):
+    """Portada para /poster/{tmdb_id} desde la base de datos o, si no hay, desde TMDb (y la guarda)"""
+    # Buscar el media en la base de datos por tmdb_id usando índice optimizado
+    media = db.query(models.Media).filter(
+        models.Media.tmdb_id == tmdb_id
+    ).first()
+
+    if media:
+        poster_url = None
+
+        # Query optimizada: buscar español e inglés en una sola consulta
+        if lang_code == "es" and media.imagen:
+            poster_url = media.imagen
+        # Si idioma es inglés reutiliza lógica existente
+        if not poster_url and lang_code == "en":
+            translation = db.query(models.ContentTranslation).filter(
+                models.ContentTranslation.media_id == media.id,
+                models.ContentTranslation.language_code == "en-US",
+                models.ContentTranslation.poster_url.isnot(None),
+                models.ContentTranslation.poster_url != ""
+            ).first()
+            if translation:
+                poster_url = translation.poster_url
+        # Intentar traducciones adicionales (pt, fr, de)
+        if not poster_url and lang_code in ("pt", "fr", "de"):
+            lang_full_map = {"pt": "pt-PT", "fr": "fr-FR", "de": "de-DE"}
+            translation = db.query(models.ContentTranslation).filter(
+                models.ContentTranslation.media_id == media.id,
+                models.ContentTranslation.language_code == lang_full_map[lang_code],
+                models.ContentTranslation.poster_url.isnot(None),
+                models.ContentTranslation.poster_url != ""
+            ).first()
+            if translation:
+                poster_url = translation.poster_url
+        # Si no hay poster en la BD, hacer llamada a TMDb y guardar
+        if not poster_url:
+            tmdb_poster = get_best_poster(tmdb_id, media_type, language)
+            if tmdb_poster:
+                poster_url = tmdb_poster
+
+                # Guardar en la base de datos
+                if lang_code == "en":
+                    # Solo actualizar si ya existe una translation (no crear fila nueva)
+                    translation = db.query(models.ContentTranslation).filter(
+                        models.ContentTranslation.media_id == media.id,
+                        models.ContentTranslation.language_code == "en-US"
+                    ).first()
+
+                    if translation and hasattr(translation, 'poster_url'):
+                        translation.poster_url = poster_url
+                        translation.updated_at = func.now()
+                        db.commit()
+                elif lang_code in ("pt", "fr", "de"):
+                    # Actualizar/crear traducción específica si existe fila
+                    lang_full_map = {"pt": "pt-PT", "fr": "fr-FR", "de": "de-DE"}
+                    translation = db.query(models.ContentTranslation).filter(
+                        models.ContentTranslation.media_id == media.id,
+                        models.ContentTranslation.language_code == lang_full_map[lang_code]
+                    ).first()
+                    if translation and (not translation.poster_url or translation.poster_url.strip() == ""):
+                        translation.poster_url = poster_url
+                        translation.updated_at = func.now()
+                        db.commit()
+                else:
+                    # Español
+                    if not media.imagen or media.imagen.strip() == "":
+                        media.imagen = poster_url
+                        db.commit()
+                        # media.imagen aparece en /medias y en /search/suggest
+                        catalog_events.emit(catalog_events.MEDIA_UPDATED, media.id, media)
+
+        # Fallback a imagen original si no se encontró nada
+        if not poster_url:
+            poster_url = media.imagen
+    else:
+        # Si no existe en la BD, solo hacer llamada a TMDb
+        poster_url = get_best_poster(tmdb_id, media_type, language)
+    return poster_url
+
+def _with_session(fn, *args):
+    """Ejecuta fn(db, *args) con una sesión propia (refrescos en segundo plano del cache de portadas)"""
+    db = database.SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
 @app.get("/poster/{tmdb_id}")
 def get_dynamic_poster(
     tmdb_id: int,
@@ -1020,97 +1141,231 @@ def get_dynamic_poster(
         else: lang_code = "en"
         
         # Generar clave de cache
-        cache_key = get_cache_key(None, lang_code, tmdb_id)
+        cache_key = get_cache_key(None, lang_code, tmdb_id, media_type)
         
-        # Verificar cache primero
-        cached_poster = get_poster_cache(cache_key)
+        # Verificar cache primero (si está caducada se sirve y se refresca en segundo plano)
+        cached_poster = get_poster_cache(
+            cache_key,
+            refresh=lambda: _with_session(_resolve_dynamic_poster, tmdb_id, media_type, language, lang_code)
+        )
         if cached_poster:
             return {"poster_url": cached_poster}
         
-        # Buscar el media en la base de datos por tmdb_id usando índice optimizado
-        media = db.query(models.Media).filter(
-            models.Media.tmdb_id == tmdb_id
-        ).first()
-        
-        if media:
-            poster_url = None
-            
-            # Query optimizada: buscar español e inglés en una sola consulta
-            if lang_code == "es" and media.imagen:
-                poster_url = media.imagen
-            # Si idioma es inglés reutiliza lógica existente
-            if not poster_url and lang_code == "en":
-                translation = db.query(models.ContentTranslation).filter(
-                    models.ContentTranslation.media_id == media.id,
-                    models.ContentTranslation.language_code == "en-US",
-                    models.ContentTranslation.poster_url.isnot(None),
-                    models.ContentTranslation.poster_url != ""
-                ).first()
-                if translation:
-                    poster_url = translation.poster_url
-            # Intentar traducciones adicionales (pt, fr, de)
-            if not poster_url and lang_code in ("pt", "fr", "de"):
-                lang_full_map = {"pt": "pt-PT", "fr": "fr-FR", "de": "de-DE"}
-                translation = db.query(models.ContentTranslation).filter(
-                    models.ContentTranslation.media_id == media.id,
-                    models.ContentTranslation.language_code == lang_full_map[lang_code],
-                    models.ContentTranslation.poster_url.isnot(None),
-                    models.ContentTranslation.poster_url != ""
-                ).first()
-                if translation:
-                    poster_url = translation.poster_url
-            # Si no hay poster en la BD, hacer llamada a TMDb y guardar
-            if not poster_url:
-                tmdb_poster = get_best_poster(tmdb_id, media_type, language)
-                if tmdb_poster:
-                    poster_url = tmdb_poster
-                    
-                    # Guardar en la base de datos
-                    if lang_code == "en":
-                        # Solo actualizar si ya existe una translation (no crear fila nueva)
-                        translation = db.query(models.ContentTranslation).filter(
-                            models.ContentTranslation.media_id == media.id,
-                            models.ContentTranslation.language_code == "en-US"
-                        ).first()
-                        
-                        if translation and hasattr(translation, 'poster_url'):
-                            translation.poster_url = poster_url
-                            translation.updated_at = func.now()
-                            db.commit()
-                    elif lang_code in ("pt", "fr", "de"):
-                        # Actualizar/crear traducción específica si existe fila
-                        lang_full_map = {"pt": "pt-PT", "fr": "fr-FR", "de": "de-DE"}
-                        translation = db.query(models.ContentTranslation).filter(
-                            models.ContentTranslation.media_id == media.id,
-                            models.ContentTranslation.language_code == lang_full_map[lang_code]
-                        ).first()
-                        if translation and (not translation.poster_url or translation.poster_url.strip() == ""):
-                            translation.poster_url = poster_url
-                            translation.updated_at = func.now()
-                            db.commit()
-                    else:
-                        # Español
-                        if not media.imagen or media.imagen.strip() == "":
-                            media.imagen = poster_url
-                            db.commit()
-            
-            # Fallback a imagen original si no se encontró nada
-            if not poster_url:
-                poster_url = media.imagen
-        else:
-            # Si no existe en la BD, solo hacer llamada a TMDb
-            poster_url = get_best_poster(tmdb_id, media_type, language)
-        
-        # Guardar en cache si encontramos algo
+        def resolve():
+            poster_url = _resolve_dynamic_poster(db, tmdb_id, media_type, language, lang_code)
+            # Guardar en cache si encontramos algo
+            if poster_url:
+                set_poster_cache(cache_key, poster_url)
+            return poster_url
+
+        # Los fallos simultáneos de la misma portada comparten una sola resolución
+        poster_url = singleflight.do(("poster", tmdb_id, media_type, lang_code), resolve)
         if poster_url:
-            set_poster_cache(cache_key, poster_url)
             return {"poster_url": poster_url}
         else:
             raise HTTPException(status_code=404, detail="No poster found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting poster: {str(e)}")
 
-@app.get("/posters-optimized")
+def _posters_from_db(db, ids, lang_code):
+    """
+    Portadas guardadas en la base de datos.
+    Devuelve ({media_id: poster_url}, [(media_id, tmdb_id, media_type) sin portada], {media_id: imagen}).
+    """
+    # Query optimizada: una sola consulta para todos los medias
+    medias = db.query(models.Media).filter(models.Media.id.in_(ids)).all()
+
+    # Query optimizada: una sola consulta para todas las traducciones si es inglés
+    translations_map = {}
+    if lang_code == "en":
+        translations = db.query(models.ContentTranslation).filter(
+            models.ContentTranslation.media_id.in_(ids),
+            models.ContentTranslation.language_code == "en-US",
+            models.ContentTranslation.poster_url.isnot(None),
+            models.ContentTranslation.poster_url != ""
+        ).all()
+        translations_map = {t.media_id: t.poster_url for t in translations}
+    elif lang_code in ("pt", "fr", "de"):
+        lang_full_map = {"pt": "pt-PT", "fr": "fr-FR", "de": "de-DE"}
+        translations = db.query(models.ContentTranslation).filter(
+            models.ContentTranslation.media_id.in_(ids),
+            models.ContentTranslation.language_code == lang_full_map[lang_code],
+            models.ContentTranslation.poster_url.isnot(None),
+            models.ContentTranslation.poster_url != ""
+        ).all()
+        translations_map = {t.media_id: t.poster_url for t in translations}
+
+    # Procesar cada media
+    result = {}
+    tmdb_requests = []  # Para llamadas batch a TMDb
+
+    for media in medias:
+        poster_url = None
+
+        # Lógica optimizada de búsqueda
+        if lang_code == "en":
+            poster_url = translations_map.get(media.id)
+        elif lang_code == "es" and media.imagen and str(media.imagen).strip() != "":
+            poster_url = media.imagen
+        elif lang_code in ("pt", "fr", "de"):
+            poster_url = translations_map.get(media.id)
+
+        # Si no hay poster en la BD, preparar para TMDb
+        if (not poster_url or str(poster_url).strip() == "") and media.tmdb_id:
+            tmdb_requests.append((media.id, media.tmdb_id, _tmdb_media_type(media.tipo)))
+        else:
+            # Tenemos poster, agregarlo al resultado
+            if not poster_url:
+                poster_url = media.imagen  # Fallback
+
+            result[media.id] = poster_url
+
+    return result, tmdb_requests, {m.id: m.imagen for m in medias}
+
+def _tmdb_poster_items(tmdb_requests):
+    return list({(tmdb_id, media_type) for _, tmdb_id, media_type in tmdb_requests})
+
+def _apply_tmdb_posters(db, result, tmdb_requests, imagenes, tmdb_posters, lang_code, lang_db):
+    """Completa result con lo resuelto en TMDb y lo persiste (imagen o traducción)"""
+    found = {}
+    for media_id, tmdb_id, media_type in tmdb_requests:
+        poster_url = tmdb_posters.get((tmdb_id, media_type))
+        if poster_url:
+            found[media_id] = poster_url
+        else:
+            # No se encontró en TMDb, usar imagen original
+            poster_url = imagenes[media_id] or ""
+        result[media_id] = poster_url
+
+    # Guardar en BD con una sola consulta de traducciones y una actualización bulk
+    updated = []
+    if found:
+        if lang_code == "es":
+            # Español: solo actualizar si no hay imagen
+            updated = [media_id for media_id in found if not (imagenes[media_id] or "").strip()]
+            db.bulk_update_mappings(models.Media, [
+                {"id": media_id, "imagen": found[media_id]} for media_id in updated
+            ])
+        else:
+            translations = db.query(
+                models.ContentTranslation.id,
+                models.ContentTranslation.media_id,
+                models.ContentTranslation.poster_url
+            ).filter(
+                models.ContentTranslation.media_id.in_(list(found)),
+                models.ContentTranslation.language_code == lang_db
+            ).all()
+            now = datetime.utcnow()
+            db.bulk_update_mappings(models.ContentTranslation, [
+                {"id": t.id, "poster_url": found[t.media_id], "updated_at": now}
+                for t in translations
+                # Inglés sobrescribe; pt/fr/de solo rellenan si no hay poster (no se crean filas nuevas)
+                if lang_code == "en" or not (t.poster_url or "").strip()
+            ])
+        db.commit()
+    if updated:
+        # media.imagen aparece en /medias (ETag) y en /search/suggest
+        for media in db.query(models.Media).filter(models.Media.id.in_(updated)):
+            catalog_events.emit(catalog_events.MEDIA_UPDATED, media.id, media)
+    return result
+
+def _resolve_media_posters(db, ids, lang_code, lang_db, tmdb_lang):
+    """
+    Portadas de varios medias: base de datos primero y TMDb en paralelo para lo que falte.
+    Persiste lo obtenido de TMDb y devuelve {media_id: poster_url}.
+    """
+    result, tmdb_requests, imagenes = _posters_from_db(db, ids, lang_code)
+    if not tmdb_requests:
+        return result
+    # Resolver en TMDb todos los que faltan en paralelo (máx. POSTER_BACKFILL_WORKERS a la vez)
+    try:
+        tmdb_posters = tmdb_client.run(_gather_best_posters(
+            _tmdb_poster_items(tmdb_requests), tmdb_lang, POSTER_BACKFILL_WORKERS
+        ))
+    except Exception:
+        # Error con TMDb, todos usan el fallback
+        tmdb_posters = {}
+    return _apply_tmdb_posters(db, result, tmdb_requests, imagenes, tmdb_posters, lang_code, lang_db)
+
+async def _resolve_media_posters_async(db, ids, lang_code, lang_db, tmdb_lang):
+    """_resolve_media_posters con AsyncSession: TMDb se espera en el loop de la petición"""
+    result, tmdb_requests, imagenes = await db.run_sync(_posters_from_db, ids, lang_code)
+    if not tmdb_requests:
+        return result
+    try:
+        tmdb_posters = await _gather_best_posters(
+            _tmdb_poster_items(tmdb_requests), tmdb_lang, POSTER_BACKFILL_WORKERS
+        )
+    except Exception:
+        tmdb_posters = {}
+    return await db.run_sync(_apply_tmdb_posters, result, tmdb_requests, imagenes, tmdb_posters, lang_code, lang_db)
+
+def _poster_languages(language):
+    """(lang_code, lang_db, tmdb_lang) para el idioma pedido; español por defecto"""
+    lang = language.lower()
+    if lang.startswith("en"): return "en", "en-US", "en-US"
+    if lang.startswith("pt"): return "pt", "pt-PT", "pt-PT"
+    if lang.startswith("fr"): return "fr", "fr-FR", "fr-FR"
+    if lang.startswith("de"): return "de", "de-DE", "de-DE"
+    return "es", "es-ES", "es-ES"
+
+def _cached_posters(ids, lang_code, lang_db, tmdb_lang):
+    """
+    Portadas desde el cache (las entradas caducadas se refrescan en segundo plano).
+    Devuelve ({media_id: cache_key}, {"media_id": poster_url}, [ids que faltan]).
+    """
+    # Generar claves de cache para todos los medias
+    cache_keys = {media_id: get_cache_key(media_id, lang_code) for media_id in ids}
+    media_by_key = {cache_key: media_id for media_id, cache_key in cache_keys.items()}
+
+    def refresh(cache_key):
+        media_id = media_by_key[cache_key]
+        return _with_session(_resolve_media_posters, [media_id], lang_code, lang_db, tmdb_lang).get(media_id)
+
+    cached_posters = get_batch_poster_cache(list(cache_keys.values()), refresh=refresh)
+
+    # Filtrar IDs que no están en cache
+    ids_to_fetch = []
+    result = {}
+    for media_id in ids:
+        cached_value = cached_posters.get(cache_keys[media_id])
+        if cached_value:
+            result[str(media_id)] = cached_value
+        else:
+            ids_to_fetch.append(media_id)
+    return cache_keys, result, ids_to_fetch
+
+def _store_posters(result, cache_keys, resolved):
+    new_cache_data = {}
+    for media_id, poster_url in resolved.items():
+        result[str(media_id)] = poster_url
+        new_cache_data[cache_keys[media_id]] = poster_url
+    if new_cache_data:
+        set_batch_poster_cache(new_cache_data)
+
+async def get_optimized_posters_async(
+    media_ids: str = Query(..., description="Lista de IDs de media separados por comas"),
+    language: str = Query("es", description="Idioma preferido (es, en, pt, fr, de)"),
+    db=Depends(async_db.get_db)
+):
+    """Versión async de /posters-optimized (ASYNC_DB_ENABLED)"""
+    try:
+        ids = [int(id.strip()) for id in media_ids.split(",") if id.strip().isdigit()]
+        if not ids:
+            return {"posters": {}}
+        langs = _poster_languages(language)
+        # El cache puede ir a Redis (cliente síncrono): fuera del loop
+        cache_keys, result, ids_to_fetch = await run_in_threadpool(_cached_posters, ids, *langs)
+        if ids_to_fetch:
+            resolved = await _resolve_media_posters_async(db, ids_to_fetch, *langs)
+            await run_in_threadpool(_store_posters, result, cache_keys, resolved)
+        return fast_json.json_response({"posters": result}) if FAST_JSON_ENABLED else {"posters": result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting optimized posters: {str(e)}")
+
+@db_get("/posters-optimized", async_impl=get_optimized_posters_async)
 def get_optimized_posters(
     media_ids: str = Query(..., description="Lista de IDs de media separados por comas"),
     language: str = Query("es", description="Idioma preferido (es, en, pt, fr, de)"),
@@ -1124,135 +1379,14 @@ def get_optimized_posters(
         ids = [int(id.strip()) for id in media_ids.split(",") if id.strip().isdigit()]
         if not ids:
             return {"posters": {}}
-
-        # Normalizar idioma ampliado
-        lang = language.lower()
-        if lang.startswith("en"): lang_code, lang_db, tmdb_lang = "en", "en-US", "en-US"
-        elif lang.startswith("pt"): lang_code, lang_db, tmdb_lang = "pt", "pt-PT", "pt-PT"
-        elif lang.startswith("fr"): lang_code, lang_db, tmdb_lang = "fr", "fr-FR", "fr-FR"
-        elif lang.startswith("de"): lang_code, lang_db, tmdb_lang = "de", "de-DE", "de-DE"
-        else: lang_code, lang_db, tmdb_lang = "es", "es-ES", "es-ES"
-
-        # Generar claves de cache para todos los medias
-        cache_keys = {media_id: get_cache_key(media_id, lang_code) for media_id in ids}
-        
-        # Verificar cache batch
-        cached_posters = get_batch_poster_cache(list(cache_keys.values()))
-        
-        # Filtrar IDs que no están en cache
-        ids_to_fetch = []
-        result = {}
-        
-        for media_id in ids:
-            cache_key = cache_keys[media_id]
-            cached_value = cached_posters.get(cache_key)
-            if cached_value:
-                result[str(media_id)] = cached_value
-            else:
-                ids_to_fetch.append(media_id)
+        langs = _poster_languages(language)
+        cache_keys, result, ids_to_fetch = _cached_posters(ids, *langs)
 
         # Solo hacer query de BD para los que no están en cache
         if ids_to_fetch:
-            # Query optimizada: una sola consulta para todos los medias
-            medias = db.query(models.Media).filter(models.Media.id.in_(ids_to_fetch)).all()
-            
-            # Query optimizada: una sola consulta para todas las traducciones si es inglés
-            translations_map = {}
-            if lang_code == "en":
-                translations = db.query(models.ContentTranslation).filter(
-                    models.ContentTranslation.media_id.in_(ids_to_fetch),
-                    models.ContentTranslation.language_code == "en-US",
-                    models.ContentTranslation.poster_url.isnot(None),
-                    models.ContentTranslation.poster_url != ""
-                ).all()
-                translations_map = {t.media_id: t.poster_url for t in translations}
-            elif lang_code in ("pt", "fr", "de"):
-                lang_full_map = {"pt": "pt-PT", "fr": "fr-FR", "de": "de-DE"}
-                translations = db.query(models.ContentTranslation).filter(
-                    models.ContentTranslation.media_id.in_(ids_to_fetch),
-                    models.ContentTranslation.language_code == lang_full_map[lang_code],
-                    models.ContentTranslation.poster_url.isnot(None),
-                    models.ContentTranslation.poster_url != ""
-                ).all()
-                translations_map = {t.media_id: t.poster_url for t in translations}
-
-            # Procesar cada media
-            new_cache_data = {}
-            tmdb_requests = []  # Para llamadas batch a TMDb
-            
-            for media in medias:
-                poster_url = None
-
-                # Lógica optimizada de búsqueda
-                if lang_code == "en":
-                    poster_url = translations_map.get(media.id)
-                elif lang_code == "es" and media.imagen and str(media.imagen).strip() != "":
-                    poster_url = media.imagen
-                elif lang_code in ("pt", "fr", "de"):
-                    poster_url = translations_map.get(media.id)
+            _store_posters(result, cache_keys, _resolve_media_posters(db, ids_to_fetch, *langs))
 
-                # Si no hay poster en la BD, preparar para TMDb
-                if (not poster_url or str(poster_url).strip() == "") and media.tmdb_id:
-                    tmdb_requests.append((media.id, media.tmdb_id, media.tipo))
-                else:
-                    # Tenemos poster, agregarlo al resultado y cache
-                    if not poster_url:
-                        poster_url = media.imagen  # Fallback
-                    
-                    result[str(media.id)] = poster_url
-                    new_cache_data[cache_keys[media.id]] = poster_url
-
-            # Procesar llamadas a TMDb (podrían optimizarse con async en el futuro)
-            for media_id, tmdb_id, tipo in tmdb_requests:
-                try:
-                    tmdb_poster = get_best_poster(tmdb_id, tipo, tmdb_lang)
-                    if tmdb_poster:
-                        poster_url = tmdb_poster
-                        if lang_code == "en":
-                            # Solo actualizar si ya existe una translation (no crear fila nueva)
-                            translation = db.query(models.ContentTranslation).filter(
-                                models.ContentTranslation.media_id == media_id,
-                                models.ContentTranslation.language_code == "en-US"
-                            ).first()
-                            if translation and hasattr(translation, 'poster_url'):
-                                translation.poster_url = poster_url
-                                translation.updated_at = func.now()
-                        elif lang_code == "es":
-                            # Español: solo actualizar si no hay imagen
-                            media = next((m for m in medias if m.id == media_id), None)
-                            if media and (not media.imagen or media.imagen.strip() == ""):
-                                media.imagen = poster_url
-                        elif lang_code in ("pt", "fr", "de"):
-                            lang_full_map = {"pt": "pt-PT", "fr": "fr-FR", "de": "de-DE"}
-                            translation = db.query(models.ContentTranslation).filter(
-                                models.ContentTranslation.media_id == media_id,
-                                models.ContentTranslation.language_code == lang_full_map[lang_code]
-                            ).first()
-                            if translation and (not translation.poster_url or translation.poster_url.strip() == ""):
-                                translation.poster_url = poster_url
-                    else:
-                        # No se encontró en TMDb, usar imagen original
-                        media = next((m for m in medias if m.id == media_id), None)
-                        poster_url = media.imagen if media else ""
-                    
-                    result[str(media_id)] = poster_url or ""
-                    new_cache_data[cache_keys[media_id]] = poster_url or ""
-                    
-                except Exception as e:
-                    # Error con TMDb, usar fallback
-                    media = next((m for m in medias if m.id == media_id), None)
-                    fallback_poster = media.imagen if media else ""
-                    result[str(media_id)] = fallback_poster
-                    new_cache_data[cache_keys[media_id]] = fallback_poster
-
-            # Commit de cambios en BD y actualizar cache batch
-            if tmdb_requests:
-                db.commit()
-            
-            if new_cache_data:
-                set_batch_poster_cache(new_cache_data)
-
-        return {"posters": result}
+        return fast_json.json_response({"posters": result}) if FAST_JSON_ENABLED else {"posters": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting optimized posters: {str(e)}")
 
@@ -1271,6 +1405,17 @@ def clear_poster_cache_endpoint():
         "stats": result["cache_stats"]
     }
 
+@app.get("/cache/tmdb/stats")
+def get_tmdb_cache_stats():
+    """Obtener estadísticas del cache de respuestas de TMDb"""
+    return tmdb_response_cache.get_stats()
+
+@app.delete("/cache/tmdb")
+def clear_tmdb_cache_endpoint():
+    """Limpiar el cache de respuestas de TMDb"""
+    cleared = tmdb_response_cache.clear()
+    return {"message": f"Cache cleared successfully. {cleared} entries removed."}
+
 # --- Al final del archivo: servir frontend React para rutas no API ---
 @app.get("/", include_in_schema=False)
 @app.get("/{full_path:path}", include_in_schema=False)
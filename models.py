@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Table, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, Boolean, Table, ForeignKey, DateTime, Index, func, text
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import unicodedata
@@ -34,6 +34,13 @@ lista_media = Table(
     Column('media_id', Integer, ForeignKey('media.id'), primary_key=True)
 )
 
+# Tabla intermedia para la relación muchos-a-muchos Media <-> Genero
+media_genero = Table(
+    'media_genero', Base.metadata,
+    Column('media_id', Integer, ForeignKey('media.id', ondelete='CASCADE'), primary_key=True),
+    Column('genero_id', Integer, ForeignKey('genero.id', ondelete='CASCADE'), primary_key=True, index=True)
+)
+
 class Media(Base):
     __tablename__ = "media"
     id = Column(Integer, primary_key=True, index=True)
@@ -59,6 +66,55 @@ class Media(Base):
     tags = relationship('Tag', secondary=media_tag, back_populates='medias')
     listas = relationship('Lista', secondary=lista_media, back_populates='medias')
     keywords = relationship('Keyword', secondary=media_keyword, back_populates='medias')
+    # Derivadas de genero/elenco/director (ver catalog_links.py)
+    generos = relationship('Genero', secondary=media_genero, back_populates='medias')
+    personas = relationship('MediaPersona', back_populates='media', cascade='all, delete-orphan', passive_deletes=True)
+
+class Genero(Base):
+    __tablename__ = 'genero'
+    id = Column(Integer, primary_key=True, index=True)
+    nombre = Column(String, nullable=False)
+    clave = Column(String, unique=True, index=True, nullable=False)  # nombre normalizado (sin acentos, minúsculas)
+    medias = relationship('Media', secondary=media_genero, back_populates='generos')
+
+class Persona(Base):
+    __tablename__ = 'persona'
+    id = Column(Integer, primary_key=True, index=True)
+    nombre = Column(String, nullable=False)
+    clave = Column(String, nullable=False, index=True)  # nombre normalizado
+    tmdb_id = Column(Integer, nullable=True, unique=True, index=True)
+    __table_args__ = (
+        # Las personas sin TMDb ID se identifican por nombre normalizado
+        Index('uq_persona_clave_sin_tmdb', 'clave', unique=True,
+              postgresql_where=text('tmdb_id IS NULL'), sqlite_where=text('tmdb_id IS NULL')),
+    )
+
+class MediaPersona(Base):
+    __tablename__ = 'media_persona'
+    media_id = Column(Integer, ForeignKey('media.id', ondelete='CASCADE'), primary_key=True)
+    persona_id = Column(Integer, ForeignKey('persona.id', ondelete='CASCADE'), primary_key=True)
+    rol = Column(String(10), primary_key=True)  # 'actor' o 'director'
+    orden = Column(Integer, default=0)  # posición en el reparto
+    media = relationship('Media', back_populates='personas')
+    persona = relationship('Persona')
+    __table_args__ = (
+        Index('idx_media_persona_persona_rol', 'persona_id', 'rol'),
+    )
+
+class MediaSimilar(Base):
+    """Vecinos precalculados de cada media, por orden de similitud (ver similarity.py)"""
+    __tablename__ = 'media_similar'
+    media_id = Column(Integer, ForeignKey('media.id', ondelete='CASCADE'), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 = la más parecida
+    similar_id = Column(Integer, ForeignKey('media.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+
+class CatalogMeta(Base):
+    """Marcas de estado del esquema derivado (p. ej. backfill de géneros/personas terminado)"""
+    __tablename__ = 'catalog_meta'
+    clave = Column(String(50), primary_key=True)
+    valor = Column(String, nullable=True)
+    actualizado = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Keyword(Base):
     __tablename__ = 'keyword'
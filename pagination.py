@@ -0,0 +1,226 @@
+"""
+Paginación por cursor (keyset) para los listados de medias.
+
+El cursor es un token opaco con la clave de orden y el id de la última fila devuelta;
+la página siguiente se pide con `WHERE (clave, id) < (última_clave, último_id)`, que
+es una búsqueda en el índice en lugar de recorrer y descartar OFFSET filas.
+
+Órdenes soportados (mismo criterio que crud.get_medias_query, con id como desempate):
+  - fecha:          fecha_creacion DESC (NULLS FIRST, como en PostgreSQL), id DESC
+  - nota_personal:  nota_personal DESC NULLS LAST, id DESC
+  - nota_tmdb:      nota_imdb DESC NULLS LAST, id DESC
+  - random:         barajado estable md5(semilla:id); la semilla viaja en el cursor
+
+OFFSET (`skip`) se sigue admitiendo cuando no se pasa cursor.
+
+fetch_ranked pagina igual por una expresión de relevancia calculada (rank DESC, id DESC),
+como la que usa la búsqueda de fulltext.py.
+"""
+
+import base64
+import hashlib
+import json
+import secrets
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Query
+
+import models
+
+ORDERS = ("fecha", "nota_personal", "nota_tmdb", "random")
+
+# orden -> (columna, nulos primero)
+_KEYED_ORDERS = {
+    "fecha": (models.Media.fecha_creacion, True),
+    "nota_personal": (models.Media.nota_personal, False),
+    "nota_tmdb": (models.Media.nota_imdb, False),
+}
+
+
+class CursorError(ValueError):
+    """Cursor mal formado o de otro orden"""
+
+
+def normalize_order(order_by: Optional[str]) -> str:
+    if order_by in (None, "", "fecha", "fecha_creacion"):
+        return "fecha"
+    return order_by if order_by in ORDERS else "fecha"
+
+
+def key_columns(order_by: Optional[str]) -> list:
+    """Columnas que lee el cursor de ese orden además de id (para cargar solo esas)"""
+    order = normalize_order(order_by)
+    return [_KEYED_ORDERS[order][0]] if order in _KEYED_ORDERS else []
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(data, dict) or not isinstance(data.get("o"), str) or "k" not in data:
+            raise ValueError
+        if not isinstance(data.get("i"), int) or isinstance(data["i"], bool):
+            raise ValueError
+        return data
+    except Exception:
+        raise CursorError("Cursor no válido")
+
+
+def _random_key(seed: str):
+    return sa.func.md5(sa.func.concat(seed, ":", models.Media.id))
+
+
+def _random_key_value(seed: str, media_id: int) -> str:
+    """Mismo valor que _random_key calculado en Python"""
+    return hashlib.md5(f"{seed}:{media_id}".encode("utf-8")).hexdigest()
+
+
+def order_clauses(order: str, seed: Optional[str] = None) -> list:
+    if order == "random":
+        return [_random_key(seed).asc(), models.Media.id.asc()]
+    column, nulls_first = _KEYED_ORDERS[order]
+    key = column.desc().nullsfirst() if nulls_first else column.desc().nullslast()
+    return [key, models.Media.id.desc()]
+
+
+def _serialize(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _deserialize(order: str, value: Any) -> Any:
+    """Clave del cursor según el orden; CursorError si el tipo no corresponde"""
+    if value is None and order in _KEYED_ORDERS:
+        return None
+    if order == "fecha" and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    elif order == "random" and isinstance(value, str):
+        return value
+    elif order in ("nota_personal", "nota_tmdb") and _is_number(value):
+        return value
+    raise CursorError("Cursor no válido")
+
+
+def _segments(order: str, cursor: Optional[dict], seed: Optional[str]) -> list:
+    """
+    Condiciones WHERE a consultar en orden para obtener lo que va después del cursor.
+    Se separa el bloque de NULL del resto para que cada consulta sea un rango del índice
+    (un OR con IS NULL impediría usarlo como condición de búsqueda).
+    """
+    if cursor is None:
+        return [None]
+    last_id = cursor["i"]
+    if order == "random":
+        key = _random_key(seed)
+        last_key = _deserialize(order, cursor["k"])
+        return [sa.or_(key > last_key, sa.and_(key == last_key, models.Media.id > last_id))]
+    column, nulls_first = _KEYED_ORDERS[order]
+    last_key = _deserialize(order, cursor["k"])
+    if last_key is None:
+        in_nulls = sa.and_(column.is_(None), models.Media.id < last_id)
+        return [in_nulls, column.isnot(None)] if nulls_first else [in_nulls]
+    after = sa.and_(column <= last_key, sa.or_(column < last_key, models.Media.id < last_id))
+    return [after] if nulls_first else [after, column.is_(None)]
+
+
+def _cursor_for(order: str, item, seed: Optional[str]) -> str:
+    if order == "random":
+        key = _random_key_value(seed, item.id)
+        return encode_cursor({"o": order, "s": seed, "k": key, "i": item.id})
+    column, _ = _KEYED_ORDERS[order]
+    return encode_cursor({"o": order, "k": _serialize(getattr(item, column.key)), "i": item.id})
+
+
+def fetch_page(
+    query: Query,
+    order_by: Optional[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    seed: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Ejecuta `query` (filtrada y sin ORDER BY) y devuelve (página, cursor_siguiente).
+    Con cursor se ignora `skip`. cursor_siguiente es None si no hay más filas.
+    """
+    order = normalize_order(order_by)
+    decoded = None
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded["o"] != order:
+            raise CursorError("El cursor corresponde a otro orden (order_by)")
+        if order == "random":
+            seed = decoded.get("s")
+            if not seed:
+                raise CursorError("Cursor no válido")
+    if order == "random" and not seed:
+        seed = secrets.token_hex(4)
+
+    ordering = order_clauses(order, seed)
+    items: List[Any] = []
+    wanted = limit + 1  # una fila de más para saber si hay página siguiente
+    for condition in _segments(order, decoded, seed):
+        page = query if condition is None else query.filter(condition)
+        page = page.order_by(*ordering)
+        if decoded is None and skip:
+            page = page.offset(skip)
+        items.extend(page.limit(wanted - len(items)).all())
+        if len(items) >= wanted:
+            break
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = _cursor_for(order, items[-1], seed) if has_more and items else None
+    return items, next_cursor
+
+
+def fetch_ranked(
+    query: Query,
+    rank,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    scope: str = "rank",
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Como fetch_page pero ordenando por `rank` (expresión SQL no nula) descendente.
+    `scope` identifica el tipo de ranking: un cursor de otro scope se rechaza.
+    """
+    # real -> double: el valor que viaja en el cursor se compara sin pérdida de precisión
+    rank = sa.cast(rank, sa.Float(precision=53))
+    decoded = None
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded["o"] != scope:
+            raise CursorError("El cursor corresponde a otra búsqueda")
+        if not _is_number(decoded["k"]):
+            raise CursorError("Cursor no válido")
+    page = query.add_columns(rank.label("rank"))
+    if decoded is not None:
+        last_rank, last_id = decoded["k"], decoded["i"]
+        page = page.filter(sa.or_(rank < last_rank, sa.and_(rank == last_rank, models.Media.id < last_id)))
+    elif skip:
+        page = page.offset(skip)
+    rows = page.order_by(rank.desc(), models.Media.id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [item for item, _ in rows]
+    next_cursor = None
+    if has_more and rows:
+        item, last_rank = rows[-1]
+        next_cursor = encode_cursor({"o": scope, "k": last_rank, "i": item.id})
+    return items, next_cursor
@@ -1,20 +1,58 @@
 """
 Sistema de cache para portadas dinámicas.
 Soporta cache en memoria (por defecto) y Redis (opcional).
+Con stale-while-revalidate, las entradas caducadas dentro del periodo de gracia
+se sirven al momento mientras se refrescan en segundo plano.
 """
 
+import heapq
 import json
+import os
+import sys
+import threading
 import time
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, Tuple, List
 from functools import lru_cache
 
-# Cache en memoria como fallback
-_memory_cache: Dict[str, Dict[str, Any]] = {}
-_cache_stats = {"hits": 0, "misses": 0, "sets": 0}
+
+class AtomicCounters:
+    """Contadores de estadísticas seguros entre hilos"""
+
+    def __init__(self, *names: str):
+        self._lock = threading.Lock()
+        self._values = {name: 0 for name in names}
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._values[name] += amount
+
+    def copy(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+
+_cache_stats = AtomicCounters(
+    "hits",
+    "misses",
+    "sets",
+    "stale_hits",              # entradas caducadas servidas dentro del periodo de gracia
+    "background_refreshes",    # refrescos en segundo plano completados
+    "refresh_errors",
+    "refreshes_deduplicated",  # refrescos no lanzados porque ya había uno en curso
+)
 
 # Configuración
-CACHE_TTL = 3600  # 1 hora en segundos
-MAX_MEMORY_CACHE_SIZE = 1000  # Máximo número de entradas en cache de memoria
+CACHE_TTL = int(os.getenv("POSTER_CACHE_TTL", "3600"))  # 1 hora en segundos
+# Presupuesto de memoria del cache en proceso (bytes aproximados de claves + valores)
+MEMORY_CACHE_MAX_BYTES = int(os.getenv("POSTER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Particiones con lock propio (lock striping) para el threadpool de FastAPI
+MEMORY_CACHE_SHARDS = int(os.getenv("POSTER_CACHE_SHARDS", "16"))
+# Stale-while-revalidate: segundos tras CACHE_TTL en los que se sirve la entrada caducada
+CACHE_SWR_ENABLED = os.getenv("POSTER_CACHE_SWR", "true").lower() in ("1", "true", "yes")
+CACHE_STALE_GRACE = int(os.getenv("POSTER_CACHE_STALE_GRACE", "86400"))
+CACHE_REFRESH_WORKERS = int(os.getenv("POSTER_CACHE_REFRESH_WORKERS", "4"))
 
 # Intentar importar Redis (opcional)
 try:
@@ -39,80 +77,276 @@ except ImportError:
     redis_client = None
     print("ℹ️ Redis no instalado, usando cache en memoria")
 
-def _clean_memory_cache():
-    """Limpiar cache en memoria si supera el tamaño máximo"""
-    if len(_memory_cache) > MAX_MEMORY_CACHE_SIZE:
-        # Eliminar las entradas más antiguas (simple FIFO)
-        items_to_remove = len(_memory_cache) - MAX_MEMORY_CACHE_SIZE + 100
-        keys_to_remove = list(_memory_cache.keys())[:items_to_remove]
-        for key in keys_to_remove:
-            del _memory_cache[key]
-
-def get_poster_cache(key: str) -> Optional[str]:
-    """Obtener portada del cache"""
-    global _cache_stats
-    
+class _LRUCache:
+    """
+    Cache LRU en memoria con presupuesto en bytes (sin locks: ver ShardedLRUCache).
+    get/set son O(1) (OrderedDict); cada entrada es una única tupla
+    (valor, fresca_hasta, caduca_en, tamaño).
+    Las entradas caducadas se purgan en orden de caducidad con un heap en cada escritura,
+    sin esperar a que alguien vuelva a pedirlas.
+    """
+
+    # Coste aproximado por entrada además de clave y valor (nodo del OrderedDict, tupla, heap)
+    ENTRY_OVERHEAD = 160
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data: "OrderedDict[str, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _entry_size(self, key: str, value: Any) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(value) + self.ENTRY_OVERHEAD
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+
+    def get(self, key: str, now: float) -> Optional[Tuple[Any, float]]:
+        """Devuelve (valor, fresca_hasta) y marca la entrada como usada recientemente"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return entry[0], entry[1]
+
+    def set(self, key: str, value: Any, fresh_until: float, expires_at: float) -> None:
+        now = time.time()
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return  # nunca cabría
+        self._remove(key)
+        self._data[key] = (value, fresh_until, expires_at, size)
+        self.bytes += size
+        heapq.heappush(self._expiry_heap, (expires_at, key))
+        self.purge_expired(now)
+        # Expulsar las menos usadas recientemente hasta volver al presupuesto
+        while self.bytes > self.max_bytes and self._data:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def purge_expired(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            # El heap puede tener restos de escrituras anteriores de la misma clave
+            if entry is not None and entry[2] == expires_at:
+                self._remove(key)
+                self.expirations += 1
+        # Compactar si se acumulan demasiados restos
+        if len(heap) > 2 * len(self._data) + 64:
+            self._expiry_heap = [(entry[2], key) for key, entry in self._data.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._expiry_heap = []
+        self.bytes = 0
+
+
+class ShardedLRUCache:
+    """
+    LRU seguro entre hilos: las claves se reparten por hash entre varias particiones,
+    cada una con su propio lock y su parte del presupuesto de bytes. Hilos que tocan
+    claves distintas rara vez compiten por el mismo lock.
+    """
+
+    def __init__(self, max_bytes: int, shards: int):
+        shards = max(1, shards)
+        self.max_bytes = max_bytes
+        self._shards = [_LRUCache(max(1, max_bytes // shards)) for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def _index(self, key: str) -> int:
+        return hash(key) % len(self._shards)
+
+    def get(self, key: str, now: float) -> Optional[Tuple[Any, float]]:
+        i = self._index(key)
+        with self._locks[i]:
+            return self._shards[i].get(key, now)
+
+    def set(self, key: str, value: Any, fresh_until: float, expires_at: float) -> None:
+        i = self._index(key)
+        with self._locks[i]:
+            self._shards[i].set(key, value, fresh_until, expires_at)
+
+    def clear(self) -> int:
+        """Vaciar todas las particiones; devuelve cuántas entradas había"""
+        cleared = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                cleared += len(shard)
+                shard.clear()
+        return cleared
+
+    def _sum(self, attr: str) -> int:
+        total = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                total += len(shard) if attr == "entries" else getattr(shard, attr)
+        return total
+
+    def __len__(self) -> int:
+        return self._sum("entries")
+
+    @property
+    def bytes(self) -> int:
+        return self._sum("bytes")
+
+    @property
+    def evictions(self) -> int:
+        return self._sum("evictions")
+
+    @property
+    def expirations(self) -> int:
+        return self._sum("expirations")
+
+
+# Cache en memoria como fallback
+_memory_cache = ShardedLRUCache(MEMORY_CACHE_MAX_BYTES, MEMORY_CACHE_SHARDS)
+
+def _redis_ttl() -> int:
+    """TTL real en Redis: incluye el periodo de gracia si SWR está activo"""
+    return CACHE_TTL + (CACHE_STALE_GRACE if CACHE_SWR_ENABLED else 0)
+
+def _redis_is_stale(ttl: int) -> bool:
+    """En Redis una entrada es stale cuando solo le queda el periodo de gracia"""
+    return CACHE_SWR_ENABLED and 0 <= ttl <= CACHE_STALE_GRACE
+
+def _memory_lookup(key: str) -> Tuple[Optional[str], bool]:
+    """Buscar en memoria. Devuelve (valor, es_stale)"""
+    now = time.time()
+    entry = _memory_cache.get(key, now)
+    if entry is None:
+        return None, False
+    value, fresh_until = entry
+    return value, now >= fresh_until
+
+def _memory_store(key: str, value: str) -> None:
+    now = time.time()
+    fresh_until = now + CACHE_TTL
+    expires_at = fresh_until + (CACHE_STALE_GRACE if CACHE_SWR_ENABLED else 0)
+    _memory_cache.set(key, value, fresh_until, expires_at)
+
+# Refrescos en segundo plano (uno como máximo por clave)
+_refresh_executor = ThreadPoolExecutor(max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix="poster-refresh")
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+def _run_refresh(key: str, refresh: Callable[[], Optional[str]]) -> None:
+    try:
+        value = refresh()
+        if value:
+            set_poster_cache(key, value)
+        _cache_stats.incr("background_refreshes")
+    except Exception:
+        _cache_stats.incr("refresh_errors")
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+def _schedule_refresh(key: str, refresh: Callable[[], Optional[str]]) -> None:
+    """Lanzar un refresco en segundo plano salvo que ya haya uno en curso para la clave"""
+    with _refresh_lock:
+        if key in _refreshing:
+            _cache_stats.incr("refreshes_deduplicated")
+            return
+        _refreshing.add(key)
+    try:
+        _refresh_executor.submit(_run_refresh, key, refresh)
+    except RuntimeError:
+        # Executor cerrado (apagado del proceso)
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+def _serve(key: str, value: Optional[str], stale: bool, refresh: Optional[Callable[[], Optional[str]]]) -> Optional[str]:
+    """Contabilizar y decidir si se sirve un valor encontrado en cache"""
+    if value and not stale:
+        _cache_stats.incr("hits")
+        return value
+    if value and refresh is not None:
+        # Stale-while-revalidate: servir ya y refrescar en segundo plano
+        _cache_stats.incr("stale_hits")
+        _schedule_refresh(key, refresh)
+        return value
+    _cache_stats.incr("misses")
+    return None
+
+def get_poster_cache(key: str, refresh: Optional[Callable[[], Optional[str]]] = None) -> Optional[str]:
+    """Obtener portada del cache.
+    Si se pasa `refresh` y la entrada está caducada dentro del periodo de gracia,
+    se devuelve igualmente y se recalcula en segundo plano con refresh().
+    """
     # Intentar Redis primero
     if redis_client:
         try:
-            cached = redis_client.get(f"poster:{key}")
+            pipe = redis_client.pipeline()
+            pipe.get(f"poster:{key}")
+            pipe.ttl(f"poster:{key}")
+            cached, ttl = pipe.execute()
             if cached:
-                _cache_stats["hits"] += 1
-                return cached
+                return _serve(key, cached, _redis_is_stale(ttl), refresh)
         except:
             pass  # Fallback a memoria
     
     # Fallback a cache en memoria
-    if key in _memory_cache:
-        entry = _memory_cache[key]
-        # Verificar TTL
-        if time.time() - entry["timestamp"] < CACHE_TTL:
-            _cache_stats["hits"] += 1
-            return entry["value"]
-        else:
-            del _memory_cache[key]
-    
-    _cache_stats["misses"] += 1
-    return None
+    value, stale = _memory_lookup(key)
+    return _serve(key, value, stale, refresh)
 
 def set_poster_cache(key: str, value: str) -> None:
     """Guardar portada en cache"""
-    global _cache_stats
-    _cache_stats["sets"] += 1
+    _cache_stats.incr("sets")
     
     # Intentar Redis primero
     if redis_client:
         try:
-            redis_client.setex(f"poster:{key}", CACHE_TTL, value)
+            redis_client.setex(f"poster:{key}", _redis_ttl(), value)
             return
         except:
             pass  # Fallback a memoria
     
     # Fallback a cache en memoria
-    _clean_memory_cache()
-    _memory_cache[key] = {
-        "value": value,
-        "timestamp": time.time()
-    }
+    _memory_store(key, value)
 
-def get_batch_poster_cache(keys: list) -> Dict[str, Optional[str]]:
-    """Obtener múltiples portadas del cache"""
+def get_batch_poster_cache(keys: list, refresh: Optional[Callable[[str], Optional[str]]] = None) -> Dict[str, Optional[str]]:
+    """Obtener múltiples portadas del cache.
+    `refresh(key)` se usa para revalidar en segundo plano las entradas stale.
+    """
     result = {}
     
     # Intentar Redis primero (más eficiente para batch)
     if redis_client:
         try:
-            redis_keys = [f"poster:{key}" for key in keys]
-            cached_values = redis_client.mget(redis_keys)
+            pipe = redis_client.pipeline()
+            for key in keys:
+                pipe.get(f"poster:{key}")
+                pipe.ttl(f"poster:{key}")
+            values = pipe.execute()
             for i, key in enumerate(keys):
-                result[key] = cached_values[i]
+                cached, ttl = values[2 * i], values[2 * i + 1]
+                key_refresh = (lambda k=key: refresh(k)) if refresh else None
+                result[key] = _serve(key, cached, _redis_is_stale(ttl), key_refresh)
             return result
         except:
             pass  # Fallback a memoria
     
     # Fallback a cache en memoria
     for key in keys:
-        result[key] = get_poster_cache(key)
+        value, stale = _memory_lookup(key)
+        key_refresh = (lambda k=key: refresh(k)) if refresh else None
+        result[key] = _serve(key, value, stale, key_refresh)
     
     return result
 
@@ -122,8 +356,9 @@ def set_batch_poster_cache(data: Dict[str, str]) -> None:
         try:
             pipe = redis_client.pipeline()
             for key, value in data.items():
-                pipe.setex(f"poster:{key}", CACHE_TTL, value)
+                pipe.setex(f"poster:{key}", _redis_ttl(), value)
             pipe.execute()
+            _cache_stats.incr("sets", len(data))
             return
         except:
             pass  # Fallback a memoria
@@ -134,8 +369,6 @@ def set_batch_poster_cache(data: Dict[str, str]) -> None:
 
 def clear_poster_cache() -> Dict[str, int]:
     """Limpiar todo el cache de portadas"""
-    global _memory_cache, _cache_stats
-    
     cleared_count = 0
     
     # Limpiar Redis
@@ -148,9 +381,7 @@ def clear_poster_cache() -> Dict[str, int]:
             pass
     
     # Limpiar memoria
-    memory_count = len(_memory_cache)
-    _memory_cache.clear()
-    cleared_count += memory_count
+    cleared_count += _memory_cache.clear()
     
     return {
         "cleared": cleared_count,
@@ -161,6 +392,11 @@ def get_cache_stats() -> Dict[str, Any]:
     """Obtener estadísticas del cache"""
     stats = _cache_stats.copy()
     stats["memory_cache_size"] = len(_memory_cache)
+    stats["memory_cache_bytes"] = _memory_cache.bytes
+    stats["memory_cache_max_bytes"] = _memory_cache.max_bytes
+    stats["memory_evictions"] = _memory_cache.evictions
+    stats["memory_expirations"] = _memory_cache.expirations
+    stats["memory_shards"] = len(_memory_cache._shards)
     
     if redis_client:
         try:
@@ -172,15 +408,23 @@ def get_cache_stats() -> Dict[str, Any]:
     else:
         stats["redis_connected"] = False
     
-    # Calcular hit rate
-    total_requests = stats["hits"] + stats["misses"]
-    stats["hit_rate"] = (stats["hits"] / total_requests * 100) if total_requests > 0 else 0
+    stats["swr_enabled"] = CACHE_SWR_ENABLED
+    stats["refreshing"] = len(_refreshing)
+    
+    # Calcular hit rate (las respuestas stale también se sirven desde cache)
+    total_requests = stats["hits"] + stats["stale_hits"] + stats["misses"]
+    served = stats["hits"] + stats["stale_hits"]
+    stats["hit_rate"] = (served / total_requests * 100) if total_requests > 0 else 0
+    stats["stale_rate"] = (stats["stale_hits"] / total_requests * 100) if total_requests > 0 else 0
     
     return stats
 
 @lru_cache(maxsize=128)
-def get_cache_key(media_id: int, language: str, tmdb_id: Optional[int] = None) -> str:
+def get_cache_key(media_id: int, language: str, tmdb_id: Optional[int] = None, media_type: Optional[str] = None) -> str:
     """Generar clave de cache consistente"""
+    if tmdb_id and media_type:
+        # Los ids de TMDb de películas y series pueden coincidir
+        return f"tmdb_{media_type}_{tmdb_id}_{language}"
     if tmdb_id:
         return f"tmdb_{tmdb_id}_{language}"
     return f"media_{media_id}_{language}"
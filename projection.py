@@ -0,0 +1,78 @@
+"""
+Proyecciones ligeras de los listados de medias (view=card / fields=...).
+
+La rejilla solo pinta unos pocos campos por tarjeta; con view=card (o una lista
+fields=id,titulo,...) la consulta carga solo esas columnas (load_only), no trae los
+tags salvo que se pidan y la respuesta se serializa con un modelo reducido en vez de
+schemas.Media completo (sin sinopsis, anotacion_personal ni elenco).
+
+Sin view ni fields los endpoints responden igual que siempre.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from fastapi import Response
+from pydantic import ConfigDict, create_model
+from sqlalchemy.orm import load_only, selectinload
+
+import fast_json
+import models
+import pagination
+import schemas
+
+VIEWS = {"card": tuple(schemas.MediaCard.model_fields)}
+
+FIELDS = tuple(schemas.Media.model_fields)
+RELATIONS = ("tags",)
+
+
+class ProjectionError(ValueError):
+    """view o fields no válidos"""
+
+
+def parse(view: Optional[str], fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Campos pedidos (siempre con id), o None para la respuesta completa"""
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in FIELDS]
+        if unknown:
+            raise ProjectionError(f"Campos no válidos: {', '.join(unknown)}")
+    elif view and view != "full":
+        if view not in VIEWS:
+            raise ProjectionError(f"Vista no válida: {view} (full, {', '.join(VIEWS)})")
+        names = list(VIEWS[view])
+    else:
+        return None
+    return tuple(dict.fromkeys(["id", *names]))
+
+
+def load_options(names: Tuple[str, ...], order_by: Optional[str] = None) -> list:
+    """Opciones de carga para la consulta: las columnas pedidas y las que lee el cursor"""
+    columns = [getattr(models.Media, name) for name in names if name not in RELATIONS]
+    for column in pagination.key_columns(order_by):
+        if column.key not in names:
+            columns.append(column)
+    options = [load_only(*columns)]
+    if "tags" in names:
+        options.append(selectinload(models.Media.tags))
+    return options
+
+
+@lru_cache(maxsize=64)
+def _model(names: Tuple[str, ...]):
+    if names == tuple(dict.fromkeys(["id", *VIEWS["card"]])):
+        return schemas.MediaCard
+    return create_model(
+        "MediaFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schemas.Media.model_fields[name].annotation, schemas.Media.model_fields[name]) for name in names},
+    )
+
+
+def render(items, names: Tuple[str, ...], response: Optional[Response] = None) -> Response:
+    """
+    Respuesta JSON con el modelo reducido. Se devuelve ya serializada (FastAPI no la
+    vuelve a validar contra el response_model completo) y con las cabeceras de `response`.
+    """
+    return fast_json.render(items, List[_model(names)], response)
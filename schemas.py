@@ -50,6 +50,18 @@ class Media(MediaBase):
     class Config:
         from_attributes = True
 
+class MediaCard(BaseModel):
+    """Lo que pinta la rejilla de portadas (view=card en los listados)"""
+    id: int
+    titulo: str
+    anio: int
+    imagen: str
+    tipo: str
+    nota_imdb: Optional[float] = None
+    nota_personal: Optional[float] = None
+    class Config:
+        from_attributes = True
+
 class ListaBase(BaseModel):
     nombre: str
     descripcion: str = ""
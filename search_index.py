@@ -0,0 +1,345 @@
+"""
+Índice de búsqueda en memoria para el autocompletado (/search/suggest).
+
+Sobre título, título en inglés, director y elenco (normalizados sin acentos):
+  - array ordenado de términos -> búsqueda por prefijo con bisect
+  - postings de trigramas -> coincidencias aproximadas cuando faltan resultados
+
+Se construye en segundo plano al arrancar y se mantiene con catalog_events, igual
+que stats_snapshot; mientras no está listo /search/suggest consulta la base de datos.
+"""
+
+import bisect
+import heapq
+import re
+from array import array
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import catalog_events
+import models
+from catalog_links import parse_personas
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Peso de cada campo en la puntuación (un término aparece con el mayor de sus pesos)
+FIELD_WEIGHTS = (("titulo", 3.0), ("titulo_ingles", 3.0), ("director", 2.0), ("elenco", 1.0))
+# Términos máximos recorridos por palabra (prefijos muy cortos como "a")
+MAX_KEYS_PER_PREFIX = 5000
+# Títulos que empiezan por la frase puntuados directamente (sin recorrer postings)
+MAX_TITLE_SHORTCUT = 256
+# Fracción mínima de trigramas compartidos para una coincidencia aproximada
+MIN_NGRAM_SIMILARITY = 0.5
+
+SuggestDoc = namedtuple("SuggestDoc", ["id", "titulo", "titulo_ingles", "anio", "tipo", "imagen"])
+_COLUMNS = SuggestDoc._fields + ("director", "elenco")
+
+
+def tokens(value: Optional[str]) -> List[str]:
+    return _WORD_RE.findall(models.normalize_str(value))
+
+
+def trigrams(token: str) -> Set[str]:
+    # Un solo espacio delante: "  a" aparecería en casi todos los términos
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _field_text(field: str, value: Optional[str]) -> str:
+    if field in ("director", "elenco"):
+        # El elenco puede traer el TMDb ID entre paréntesis: "Tom Hanks (31)"
+        return " ".join(nombre for nombre, _ in parse_personas(value))
+    return value or ""
+
+
+class _Index:
+    """Estructuras del índice. No es thread-safe: el acceso se serializa en SearchIndex."""
+
+    def __init__(self):
+        self.docs: Dict[int, SuggestDoc] = {}
+        self.keys: List[str] = []                          # términos ordenados
+        self.postings: Dict[str, Dict[int, float]] = {}    # término -> {media_id: peso}
+        self.grams: Dict[str, array] = {}                  # trigrama -> media_ids ordenados
+        self.doc_terms: Dict[int, Dict[str, float]] = {}
+        self.title_keys: List[Tuple[str, int]] = []        # (título normalizado, id) ordenados
+        self.doc_titles: Dict[int, Tuple[str, ...]] = {}
+        self.order_key: Dict[int, Tuple[int, str, int]] = {}  # desempate: título corto primero
+
+    def add(self, values: Dict[str, Any]) -> None:
+        media_id = values["id"]
+        self.remove(media_id)
+        terms: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokens(_field_text(field, values.get(field))):
+                if weight > terms.get(token, 0.0):
+                    terms[token] = weight
+        doc = self.docs[media_id] = SuggestDoc(*(values.get(f) for f in SuggestDoc._fields))
+        titles = {" ".join(tokens(values.get(f))) for f in ("titulo", "titulo_ingles")} - {""}
+        self.doc_titles[media_id] = tuple(titles)
+        for title in titles:
+            bisect.insort(self.title_keys, (title, media_id))
+        self.order_key[media_id] = (len(doc.titulo or ""), doc.titulo or "", media_id)
+        self.doc_terms[media_id] = terms
+        doc_grams: Set[str] = set()
+        for token, weight in terms.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                bisect.insort(self.keys, token)
+            posting[media_id] = weight
+            doc_grams |= trigrams(token)
+        for gram in doc_grams:
+            ids = self.grams.setdefault(gram, array("i"))
+            if not ids or media_id > ids[-1]:
+                ids.append(media_id)  # construcción en orden de id: sin desplazar el array
+            else:
+                bisect.insort(ids, media_id)
+
+    def remove(self, media_id: int) -> None:
+        terms = self.doc_terms.pop(media_id, None)
+        if terms is None:
+            return
+        self.docs.pop(media_id, None)
+        self.order_key.pop(media_id, None)
+        for title in self.doc_titles.pop(media_id, ()):
+            i = bisect.bisect_left(self.title_keys, (title, media_id))
+            if i < len(self.title_keys) and self.title_keys[i] == (title, media_id):
+                del self.title_keys[i]
+        for token in terms:
+            posting = self.postings[token]
+            posting.pop(media_id, None)
+            if not posting:
+                del self.postings[token]
+                i = bisect.bisect_left(self.keys, token)
+                if i < len(self.keys) and self.keys[i] == token:
+                    del self.keys[i]
+        doc_grams: Set[str] = set()
+        for token in terms:
+            doc_grams |= trigrams(token)
+        for gram in doc_grams:
+            ids = self.grams.get(gram)
+            if ids is None:
+                continue
+            i = bisect.bisect_left(ids, media_id)
+            if i < len(ids) and ids[i] == media_id:
+                del ids[i]
+            if not ids:
+                del self.grams[gram]
+
+    def _prefix_scores(self, word: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        i = bisect.bisect_left(self.keys, word)
+        end = min(len(self.keys), i + MAX_KEYS_PER_PREFIX)
+        while i < end and self.keys[i].startswith(word):
+            key = self.keys[i]
+            exact = 0.5 if key == word else 0.0
+            for media_id, weight in self.postings[key].items():
+                score = weight + exact
+                if score > scores.get(media_id, 0.0):
+                    scores[media_id] = score
+            i += 1
+        return scores
+
+    def _ngram_scores(self, words: List[str], exclude: Dict[int, float]) -> Dict[int, float]:
+        query_grams: Set[str] = set()
+        for word in words:
+            query_grams |= trigrams(word)
+        shared: Counter = Counter()
+        for gram in query_grams:
+            shared.update(self.grams.get(gram, ()))
+        # Siempre por debajo de cualquier coincidencia por prefijo (peso mínimo 1.0)
+        return {
+            media_id: 0.9 * n / len(query_grams)
+            for media_id, n in shared.items()
+            if media_id not in exclude and n / len(query_grams) >= MIN_NGRAM_SIMILARITY
+        }
+
+    def _title_prefix_ids(self, phrase: str, cap: Optional[int] = None) -> Optional[List[int]]:
+        """Medias cuyo título empieza por `phrase`; None si el rango pasa de `cap` entradas"""
+        start = i = bisect.bisect_left(self.title_keys, (phrase,))
+        while i < len(self.title_keys) and self.title_keys[i][0].startswith(phrase):
+            i += 1
+            if cap is not None and i - start > cap:
+                return None
+        return list(dict.fromkeys(media_id for _, media_id in self.title_keys[start:i]))
+
+    def _doc_score(self, media_id: int, words: List[str]) -> float:
+        terms = self.doc_terms[media_id]
+        total = 0.0
+        for word in words:
+            total += max(
+                (weight + (0.5 if term == word else 0.0) for term, weight in terms.items() if term.startswith(word)),
+                default=0.0,
+            )
+        return total
+
+    def search(self, query: str, limit: int) -> List[Tuple[SuggestDoc, float]]:
+        words = tokens(query)
+        if not words:
+            return []
+        phrase = " ".join(words)
+        if len(words) <= 3:
+            # Atajo: un título que empieza por la frase suma >= 3n + 2 y cualquier otra media
+            # como mucho 3.5n, así que si hay `limit` de ellas el resultado sale solo de ahí
+            prefixed = self._title_prefix_ids(phrase, MAX_TITLE_SHORTCUT)
+            if prefixed is not None and len(prefixed) >= limit:
+                return self._top({m: self._doc_score(m, words) + 2.0 for m in prefixed}, limit)
+        scores: Optional[Dict[int, float]] = None
+        for word in words:
+            word_scores = self._prefix_scores(word)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {m: s + word_scores[m] for m, s in scores.items() if m in word_scores}
+            if not scores:
+                break
+        scores = scores or {}
+        if scores:
+            # Bonus si el título completo empieza por la frase (rango del array de títulos)
+            for media_id in self._title_prefix_ids(phrase):
+                if media_id in scores:
+                    scores[media_id] += 2.0
+        if len(scores) < limit:
+            scores.update(self._ngram_scores(words, scores))
+        return self._top(scores, limit)
+
+    def _top(self, scores: Dict[int, float], limit: int) -> List[Tuple[SuggestDoc, float]]:
+        if not scores:
+            return []
+        # Solo se ordenan por título los candidatos con nota suficiente para entrar
+        threshold = heapq.nlargest(limit, scores.values())[-1]
+        tied = [media_id for media_id, score in scores.items() if score >= threshold]
+        best = sorted(tied, key=lambda m: (-scores[m], self.order_key[m]))[:limit]
+        return [(self.docs[media_id], round(scores[media_id], 3)) for media_id in best]
+
+    def size_bytes(self) -> int:
+        """Tamaño aproximado de las estructuras (contenedores y claves, sin objetos compartidos)"""
+        size = sys.getsizeof(self.keys) + sum(sys.getsizeof(k) for k in self.keys)
+        size += sys.getsizeof(self.postings) + sum(sys.getsizeof(p) for p in self.postings.values())
+        size += sys.getsizeof(self.grams) + sum(sys.getsizeof(g) + sys.getsizeof(ids) for g, ids in self.grams.items())
+        size += sys.getsizeof(self.docs) + sum(sys.getsizeof(d) for d in self.docs.values())
+        size += sys.getsizeof(self.title_keys) + sum(sys.getsizeof(t) for t in self.title_keys)
+        size += sum(sys.getsizeof(t) for t in self.doc_terms.values())
+        return size
+
+
+def _values_from_media(media) -> Dict[str, Any]:
+    return {field: getattr(media, field, None) for field in _COLUMNS}
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._index: Optional[_Index] = None
+        # Cambios recibidos durante la construcción; se reaplican sobre el índice nuevo
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+        self._version = 0
+        self._size: Tuple[int, int] = (-1, 0)  # (versión, bytes) calculado bajo demanda
+        self.build_ms: Optional[int] = None
+        self.built_at: Optional[float] = None
+        self.updates = 0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    def build(self, db: Session) -> Dict[str, Any]:
+        with self._build_lock:
+            started = time.time()
+            with self._lock:
+                self._pending = []
+            try:
+                index = _Index()
+                columns = [getattr(models.Media, field) for field in _COLUMNS]
+                for row in db.query(*columns).yield_per(1000):
+                    index.add(dict(zip(_COLUMNS, row)))
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                for kind, payload in self._pending:
+                    if kind == "add":
+                        index.add(payload)
+                    else:
+                        index.remove(payload)
+                self._pending = None
+                self._index = index
+                self._version += 1
+                self.build_ms = round((time.time() - started) * 1000)
+                self.built_at = time.time()
+            return {"medias": len(index.docs), "terms": len(index.keys), "elapsed_ms": self.build_ms}
+
+    def start_background_build(self, session_factory) -> None:
+        def run():
+            db = session_factory()
+            try:
+                result = self.build(db)
+                print(f"✅ Índice de búsqueda: {result['medias']} medias, {result['terms']} términos en {result['elapsed_ms']} ms")
+            except Exception as e:
+                print(f"⚠️ No se pudo construir el índice de búsqueda: {e}")
+            finally:
+                db.close()
+
+        threading.Thread(target=run, name="search-index-build", daemon=True).start()
+
+    def is_ready(self) -> bool:
+        return self._index is not None
+
+    def on_event(self, event: str, media_id: Optional[int], media=None) -> None:
+        if event == catalog_events.MEDIA_DELETED:
+            change = ("remove", media_id)
+        elif media is not None:
+            change = ("add", _values_from_media(media))
+        else:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self._index is None:
+                return
+            if change[0] == "add":
+                self._index.add(change[1])
+            else:
+                self._index.remove(change[1])
+            self._version += 1
+            self.updates += 1
+
+    def suggest(self, query: str, limit: int = 8) -> Optional[List[Tuple[SuggestDoc, float]]]:
+        """[(doc, puntuación)] mejor primero, o None si el índice aún no está construido"""
+        started = time.perf_counter()
+        with self._lock:
+            if self._index is None:
+                return None
+            result = self._index.search(query, limit)
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - started
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            index = self._index
+            if index is None:
+                return {"built": False, "medias": 0}
+            if self._size[0] != self._version:
+                self._size = (self._version, index.size_bytes())
+            return {
+                "built": True,
+                "medias": len(index.docs),
+                "terms": len(index.keys),
+                "ngrams": len(index.grams),
+                "size_bytes": self._size[1],
+                "build_ms": self.build_ms,
+                "age_seconds": round(time.time() - self.built_at, 1),
+                "updates": self.updates,
+                "lookups": self.lookups,
+                "avg_lookup_us": round(self.lookup_seconds / self.lookups * 1e6, 1) if self.lookups else None,
+            }
+
+
+index = SearchIndex()
+catalog_events.subscribe(index.on_event)
@@ -0,0 +1,463 @@
+"""
+Índice de similitud precalculado para /medias/{id}/similares.
+
+Cada media es un vector disperso de rasgos: sus géneros y sus keywords. Dos medias
+puntúan la suma de los rasgos que comparten, ponderados por tipo (keyword = 2 x
+género, como el cálculo original) y por IDF, para que "Drama" pese menos que una
+keyword poco frecuente. Con postings invertidos (rasgo -> medias) solo se recorren
+las medias que comparten algún rasgo.
+
+Los N vecinos de cada media se guardan en la tabla media_similar, así que el
+endpoint es una lectura por clave primaria. Las altas, bajas y cambios de género
+(catalog_events) actualizan solo las listas afectadas, en un hilo aparte y no en la
+petición de escritura; los cambios que no tocan los rasgos (favorito, pendiente,
+anotaciones, tags) se descartan sin ir a la base de datos. Cada escritura de
+media_similar sube la versión guardada en catalog_meta (bloqueando la fila), así que
+si otro proceso escribió entretanto se recargan sus listas antes de aplicar las
+propias. El IDF usado en las actualizaciones es el del momento, así que conviene una
+reconstrucción completa de vez en cuando:
+    python similarity.py
+o POST /medias/similares/rebuild
+
+La reconstrucción completa y las recomendaciones multi-semilla usan el motor de
+matrices dispersas de similarity_matrix.py si numpy/scipy están instalados.
+"""
+
+import heapq
+import math
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+import catalog_events
+import models
+from catalog_links import insert_ignore, parse_generos
+from config import SIMILARITY_ENGINE, SIMILARITY_TOP_N
+
+# Peso por tipo de rasgo (misma proporción que get_similares_para_media)
+GENERO_WEIGHT = 1.0
+KEYWORD_WEIGHT = 2.0
+
+Feature = Tuple[str, object]  # ("g", clave_genero) | ("k", keyword_id)
+Neighbours = List[Tuple[float, int]]  # [(score, media_id)] mejor primero
+
+VERSION_KEY = "similarity_version"  # fila de catalog_meta
+
+
+def _features(genero: Optional[str], keyword_ids: Iterable[int]) -> FrozenSet[Feature]:
+    return frozenset([("g", clave) for clave in parse_generos(genero)] + [("k", k) for k in keyword_ids])
+
+
+def load_features(db: Session, media_ids: Optional[List[int]] = None) -> Dict[int, FrozenSet[Feature]]:
+    """Rasgos de las medias indicadas (o de todo el catálogo) en dos consultas"""
+    medias = select(models.Media.id, models.Media.genero)
+    keywords = select(models.media_keyword.c.media_id, models.media_keyword.c.keyword_id)
+    if media_ids is not None:
+        medias = medias.where(models.Media.id.in_(media_ids))
+        keywords = keywords.where(models.media_keyword.c.media_id.in_(media_ids))
+    keyword_ids: Dict[int, List[int]] = {}
+    for media_id, keyword_id in db.execute(keywords):
+        keyword_ids.setdefault(media_id, []).append(keyword_id)
+    return {media_id: _features(genero, keyword_ids.get(media_id, ())) for media_id, genero in db.execute(medias)}
+
+
+class Features:
+    """Postings invertidos rasgo -> medias. No es thread-safe."""
+
+    def __init__(self, docs: Optional[Dict[int, FrozenSet[Feature]]] = None):
+        self.docs: Dict[int, FrozenSet[Feature]] = {}
+        self.postings: Dict[Feature, Set[int]] = {}
+        for media_id, features in (docs or {}).items():
+            self.add(media_id, features)
+
+    def add(self, media_id: int, features: FrozenSet[Feature]) -> None:
+        self.remove(media_id)
+        self.docs[media_id] = features
+        for feature in features:
+            self.postings.setdefault(feature, set()).add(media_id)
+
+    def remove(self, media_id: int) -> None:
+        for feature in self.docs.pop(media_id, ()):
+            ids = self.postings[feature]
+            ids.discard(media_id)
+            if not ids:
+                del self.postings[feature]
+
+    def weight(self, feature: Feature) -> float:
+        # IDF suavizado: un rasgo presente en todo el catálogo sigue sumando algo
+        idf = math.log((1 + len(self.docs)) / (1 + len(self.postings.get(feature, ())))) + 1.0
+        return (KEYWORD_WEIGHT if feature[0] == "k" else GENERO_WEIGHT) * idf
+
+    def scores(self, features: Iterable[Feature], exclude: Optional[int] = None) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for feature in features:
+            ids = self.postings.get(feature)
+            if not ids:
+                continue
+            weight = self.weight(feature)
+            for media_id in ids:
+                scores[media_id] = scores.get(media_id, 0.0) + weight
+        scores.pop(exclude, None)
+        return scores
+
+
+def top_neighbours(scores: Dict[int, float], n: int) -> Neighbours:
+    """Mejores n por puntuación; a igualdad, la media más reciente (id mayor)"""
+    # Redondeo: el orden de las sumas no debe decidir los empates (ver similarity_matrix)
+    return heapq.nlargest(n, ((round(score, 9), media_id) for media_id, score in scores.items()))
+
+
+def compute_all(features: Features, n: int) -> Dict[int, Neighbours]:
+    return {
+        media_id: top_neighbours(features.scores(doc, exclude=media_id), n)
+        for media_id, doc in features.docs.items()
+    }
+
+
+def recommend(features: Features, seed_ids: Iterable[int], n: int, exclude: Iterable[int] = ()) -> Neighbours:
+    """Más parecidas a un conjunto de semillas: suma de las puntuaciones con cada una"""
+    seed_ids = list(seed_ids)
+    scores: Dict[int, float] = {}
+    for seed in seed_ids:
+        for media_id, score in features.scores(features.docs.get(seed, ())).items():
+            scores[media_id] = scores.get(media_id, 0.0) + score
+    for media_id in seed_ids + list(exclude):
+        scores.pop(media_id, None)
+    return top_neighbours(scores, n)
+
+
+def engine_name() -> str:
+    """'sparse' (numpy/scipy, similarity_matrix.py) o 'python' según SIMILARITY_ENGINE"""
+    if SIMILARITY_ENGINE == "python":
+        return "python"
+    import similarity_matrix
+    return "sparse" if similarity_matrix.AVAILABLE else "python"
+
+
+def compute_all_with_engine(features: Features, n: int) -> Dict[int, Neighbours]:
+    if engine_name() == "sparse":
+        import similarity_matrix
+        return similarity_matrix.SparseEngine(features.docs).compute_all(n)
+    return compute_all(features, n)
+
+
+class SimilarityIndex:
+    def __init__(self, top_n: int = SIMILARITY_TOP_N):
+        self.top_n = top_n
+        self._lock = threading.RLock()
+        self._session_factory = None
+        self._features = Features()
+        self._neighbours: Dict[int, Neighbours] = {}
+        self._reverse: Dict[int, Set[int]] = {}  # media -> medias que la tienen como vecina
+        self._ready = False
+        self._version = 0  # cambia con cada alta/baja de rasgos
+        self._sparse = None  # (versión, SparseEngine) para las recomendaciones
+        self._sparse_building = False
+        self._stored_version = 0  # versión de media_similar que refleja la memoria
+        # Eventos pendientes para el hilo de actualización: media_id -> último evento
+        # (acotado por el tamaño del catálogo; se acumulan mientras se carga el índice)
+        self._pending: Dict[int, str] = {}
+        self._pending_cond = threading.Condition()
+        self.rebuild_ms: Optional[int] = None
+        self.incremental_updates = 0
+        self.skipped_events = 0
+        self.reloads = 0
+
+    # --- Estado en memoria ---
+
+    def _set_list(self, media_id: int, neighbours: Neighbours) -> None:
+        for _, other in self._neighbours.get(media_id, ()):
+            owners = self._reverse.get(other)
+            if owners is not None:
+                owners.discard(media_id)
+        if neighbours:
+            self._neighbours[media_id] = neighbours
+        else:
+            self._neighbours.pop(media_id, None)
+        for _, other in neighbours:
+            self._reverse.setdefault(other, set()).add(media_id)
+
+    def _recompute(self, media_id: int) -> None:
+        doc = self._features.docs.get(media_id, frozenset())
+        self._set_list(media_id, top_neighbours(self._features.scores(doc, exclude=media_id), self.top_n))
+
+    def _add(self, media_id: int, features: FrozenSet[Feature]) -> Set[int]:
+        """Alta/cambio de una media; devuelve las medias cuya lista ha cambiado"""
+        self._features.add(media_id, features)
+        self._version += 1
+        scores = self._features.scores(features, exclude=media_id)
+        self._set_list(media_id, top_neighbours(scores, self.top_n))
+        dirty = {media_id}
+        # La puntuación es simétrica: la nueva media entra en las listas a las que supera
+        for other, score in scores.items():
+            score = round(score, 9)
+            neighbours = self._neighbours.get(other, [])
+            if len(neighbours) < self.top_n or (score, media_id) > neighbours[-1]:
+                updated = sorted(neighbours + [(score, media_id)], reverse=True)[:self.top_n]
+                self._set_list(other, updated)
+                dirty.add(other)
+        return dirty
+
+    def _remove(self, media_id: int) -> Set[int]:
+        self._features.remove(media_id)
+        self._version += 1
+        self._set_list(media_id, [])
+        affected = self._reverse.pop(media_id, set())
+        for other in affected:
+            self._recompute(other)
+        return affected | {media_id}
+
+    # --- Persistencia ---
+
+    def _lock_version(self, db: Session) -> int:
+        """Versión de media_similar, con la fila bloqueada hasta el commit (un escritor a la vez)"""
+        meta = models.CatalogMeta
+        query = select(meta.valor).where(meta.clave == VERSION_KEY).with_for_update()
+        stored = db.execute(query).scalar()
+        if stored is None:
+            db.execute(insert_ignore(db, meta.__table__), [{"clave": VERSION_KEY, "valor": "0"}])
+            stored = db.execute(query).scalar()
+        return int(stored)
+
+    def _snapshot_lists(self, media_ids: Iterable[int]) -> Dict[int, Neighbours]:
+        """Con self._lock: copia de las listas a escribir (la escritura se hace sin el lock)"""
+        return {media_id: list(self._neighbours.get(media_id, ())) for media_id in media_ids}
+
+    def _write(self, db: Session, lists: Dict[int, Neighbours], version: int) -> None:
+        """
+        Borra e inserta las listas y guarda la versión en la misma transacción.
+        Sin self._lock: la fila de versión bloqueada (_lock_version) ya serializa a los escritores.
+        """
+        media_ids = list(lists)
+        table = models.MediaSimilar.__table__
+        for i in range(0, len(media_ids), 500):
+            batch = media_ids[i:i + 500]
+            db.execute(table.delete().where(table.c.media_id.in_(batch)))
+            rows = [
+                {"media_id": media_id, "rank": rank, "similar_id": other, "score": score}
+                for media_id in batch
+                for rank, (score, other) in enumerate(lists[media_id])
+            ]
+            if rows:
+                db.execute(table.insert(), rows)
+        db.execute(
+            update(models.CatalogMeta).where(models.CatalogMeta.clave == VERSION_KEY).values(valor=str(version))
+        )
+        db.commit()
+        self._stored_version = version
+
+    def _replace(self, features: Features, lists: Dict[int, Neighbours]) -> None:
+        self._features = features
+        self._version += 1
+        self._neighbours = {}
+        self._reverse = {}
+        for media_id, items in lists.items():
+            self._set_list(media_id, items)
+
+    def _stored_lists(self, db: Session) -> Dict[int, Neighbours]:
+        lists: Dict[int, Neighbours] = {}
+        for media_id, other, score in db.execute(
+            select(models.MediaSimilar.media_id, models.MediaSimilar.similar_id, models.MediaSimilar.score)
+            .order_by(models.MediaSimilar.media_id, models.MediaSimilar.rank)
+        ):
+            lists.setdefault(media_id, []).append((score, other))
+        return lists
+
+    def rebuild(self, db: Session) -> Dict[str, int]:
+        """Recalcula todas las listas desde la base de datos y reescribe media_similar"""
+        started = time.time()
+        features = Features(load_features(db))
+        neighbours = compute_all_with_engine(features, self.top_n)
+        stored = self._lock_version(db)
+        with self._lock:
+            self._replace(features, neighbours)
+            lists = self._snapshot_lists(self._neighbours)
+        db.execute(models.MediaSimilar.__table__.delete())
+        self._write(db, lists, stored + 1)
+        self._ready = True
+        self.rebuild_ms = round((time.time() - started) * 1000)
+        return {"medias": len(features.docs), "pairs": sum(len(v) for v in neighbours.values()), "elapsed_ms": self.rebuild_ms}
+
+    def load(self, db: Session) -> Dict[str, int]:
+        """Carga las listas guardadas (o las calcula si la tabla está vacía)"""
+        stored = self._lock_version(db)
+        lists = self._stored_lists(db)
+        if not lists and db.query(models.Media.id).first() is not None:
+            db.rollback()
+            return self.rebuild(db)
+        features = Features(load_features(db))
+        db.commit()
+        with self._lock:
+            self._replace(features, lists)
+            self._stored_version = stored
+            self._ready = True
+        return {"medias": len(features.docs), "pairs": sum(len(v) for v in lists.values())}
+
+    def start(self, session_factory) -> None:
+        """Al arrancar: crear las tablas si faltan, cargar/calcular el índice y atender los eventos"""
+        self._session_factory = session_factory
+        db = session_factory()
+        try:
+            models.Base.metadata.create_all(
+                bind=db.get_bind(), tables=[models.MediaSimilar.__table__, models.CatalogMeta.__table__]
+            )
+        finally:
+            db.close()
+
+        def run():
+            db = session_factory()
+            try:
+                result = self.load(db)
+                print(f"✅ Índice de similares: {result['medias']} medias, {result['pairs']} pares")
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ No se pudo cargar el índice de similares: {e}")
+            finally:
+                db.close()
+            self._process_events()
+
+        threading.Thread(target=run, name="similarity-index", daemon=True).start()
+
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def recommend(self, seed_ids: List[int], n: int = 24) -> Neighbours:
+        """
+        [(score, media_id)] más parecidas al conjunto de semillas, sin incluirlas.
+        Con el motor disperso, si el catálogo cambió se sigue usando la matriz anterior
+        mientras se construye la nueva en segundo plano (la primera vez, los postings).
+        """
+        with self._lock:
+            if engine_name() == "sparse":
+                if self._sparse is None or self._sparse[0] != self._version:
+                    self._schedule_sparse_build()
+                if self._sparse is not None:
+                    engine = self._sparse[1]
+                else:
+                    return recommend(self._features, seed_ids, n)
+            else:
+                return recommend(self._features, seed_ids, n)
+        return engine.recommend(seed_ids, n)
+
+    def _schedule_sparse_build(self) -> None:
+        """Con self._lock: lanza la construcción de la matriz de la versión actual si no hay otra en curso"""
+        if self._sparse_building:
+            return
+        self._sparse_building = True
+        version, docs = self._version, dict(self._features.docs)
+
+        def run():
+            import similarity_matrix
+            try:
+                engine = similarity_matrix.SparseEngine(docs)
+                with self._lock:
+                    if self._sparse is None or self._sparse[0] < version:
+                        self._sparse = (version, engine)
+            except Exception as e:
+                print(f"⚠️ Error construyendo la matriz de similares: {e}")
+            finally:
+                with self._lock:
+                    self._sparse_building = False
+
+        threading.Thread(target=run, name="similarity-sparse-build", daemon=True).start()
+
+    # --- Eventos ---
+
+    def on_event(self, event: str, media_id: Optional[int], media=None) -> None:
+        """En el hilo de la escritura: solo decide si el evento afecta y lo encola"""
+        if media_id is None or self._session_factory is None:
+            return
+        if event == catalog_events.MEDIA_UPDATED and media is not None:
+            # Las actualizaciones solo pueden cambiar el género (las keywords se fijan al crear)
+            generos = frozenset(("g", clave) for clave in parse_generos(getattr(media, "genero", None)))
+            with self._lock:
+                current = self._features.docs.get(media_id)
+                if self._ready and current is not None and generos == {f for f in current if f[0] == "g"}:
+                    self.skipped_events += 1
+                    return
+        with self._pending_cond:
+            self._pending[media_id] = event
+            self._pending_cond.notify()
+
+    def _process_events(self) -> None:
+        while True:
+            with self._pending_cond:
+                while not self._pending:
+                    self._pending_cond.wait()
+                batch, self._pending = self._pending, {}
+            if not self._ready:
+                # La carga falló: una reconstrucción (POST /medias/similares/rebuild) lo recogerá todo
+                continue
+            db = self._session_factory()
+            try:
+                self._apply(db, batch)
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Error actualizando similares de {len(batch)} medias: {e}")
+            finally:
+                db.close()
+
+    def _apply(self, db: Session, batch: Dict[int, str]) -> None:
+        live = [media_id for media_id, event in batch.items() if event != catalog_events.MEDIA_DELETED]
+        features = load_features(db, live) if live else {}
+        stored = self._lock_version(db)
+        reload = stored != self._stored_version
+        if reload:
+            # Otro proceso escribió media_similar: partir de sus listas y de los rasgos actuales
+            all_features = Features(load_features(db))
+            lists = self._stored_lists(db)
+            self.reloads += 1
+        with self._lock:
+            if reload:
+                self._replace(all_features, lists)
+            dirty: Set[int] = set()
+            for media_id in batch:
+                media_features = features.get(media_id)
+                if media_features is None:
+                    if media_id in self._features.docs:
+                        dirty |= self._remove(media_id)
+                elif reload or media_features != self._features.docs.get(media_id):
+                    dirty |= self._remove(media_id) | self._add(media_id, media_features)
+            lists = self._snapshot_lists(dirty)
+        if lists:
+            self._write(db, lists, stored + 1)
+            self.incremental_updates += 1
+        else:
+            db.rollback()
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "ready": self._ready,
+                "medias": len(self._features.docs),
+                "features": len(self._features.postings),
+                "lists": len(self._neighbours),
+                "top_n": self.top_n,
+                "engine": engine_name(),
+                "rebuild_ms": self.rebuild_ms,
+                "incremental_updates": self.incremental_updates,
+                "skipped_events": self.skipped_events,
+                "pending_events": len(self._pending),
+                "reloads": self.reloads,
+            }
+
+
+index = SimilarityIndex()
+catalog_events.subscribe(index.on_event)
+
+
+if __name__ == "__main__":
+    import database
+
+    models.Base.metadata.create_all(
+        bind=database.engine, tables=[models.MediaSimilar.__table__, models.CatalogMeta.__table__]
+    )
+    session = database.SessionLocal()
+    try:
+        result = index.rebuild(session)
+        print(f"✅ Similares recalculados: {result['medias']} medias, {result['pairs']} pares en {result['elapsed_ms']} ms")
+    finally:
+        session.close()
@@ -0,0 +1,118 @@
+"""
+Motor vectorizado de similitud con matrices dispersas (NumPy/SciPy, opcional).
+
+Con A = matriz binaria media x rasgo (géneros + keywords) y w = peso de cada rasgo
+(similarity.Features.weight), la puntuación de todos los pares es
+
+    S = (A · diag(w)) · Aᵀ
+
+es decir, la misma suma ponderada de rasgos compartidos que similarity.py pero
+calculada con productos de matrices dispersas. Para todo el catálogo se procesa
+por bloques de filas con un presupuesto de elementos no nulos, de forma que la
+memoria no crece con el cuadrado del catálogo. Para un conjunto de semillas
+("más como estas 5") basta un producto matriz-vector.
+
+Si numpy/scipy no están instalados, AVAILABLE es False y similarity.py usa sus
+postings en Python puro.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+try:
+    import numpy as np
+    from scipy import sparse
+    AVAILABLE = True
+except ImportError:
+    np = None
+    sparse = None
+    AVAILABLE = False
+
+from similarity import GENERO_WEIGHT, KEYWORD_WEIGHT, Feature, Neighbours
+
+# Pares (no nulos) máximos por bloque de filas en compute_all
+BLOCK_NNZ_BUDGET = 20_000_000
+
+
+class SparseEngine:
+    """Matriz media x rasgo construida una vez; las consultas no la modifican"""
+
+    def __init__(self, docs: Dict[int, FrozenSet[Feature]]):
+        if not AVAILABLE:
+            raise RuntimeError("numpy/scipy no están instalados")
+        self.ids = np.fromiter(sorted(docs), dtype=np.int64, count=len(docs))
+        self.row_of = {int(media_id): row for row, media_id in enumerate(self.ids)}
+        feature_col: Dict[Feature, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        for row, media_id in enumerate(self.ids):
+            for feature in docs[int(media_id)]:
+                rows.append(row)
+                cols.append(feature_col.setdefault(feature, len(feature_col)))
+        shape = (len(self.ids), len(feature_col))
+        data = np.ones(len(rows), dtype=np.float64)
+        self.matrix = sparse.csr_matrix((data, (rows, cols)), shape=shape)
+        self.matrix.sum_duplicates()
+
+        # Pesos por columna: tipo de rasgo x IDF suavizado (mismo criterio que Features.weight)
+        df = np.asarray((self.matrix > 0).sum(axis=0)).ravel()
+        is_keyword = np.zeros(len(feature_col), dtype=bool)
+        for feature, col in feature_col.items():
+            is_keyword[col] = feature[0] == "k"
+        type_weight = np.where(is_keyword, KEYWORD_WEIGHT, GENERO_WEIGHT)
+        self.weights = type_weight * (np.log((1 + len(self.ids)) / (1 + df)) + 1.0)
+        self.weighted = (self.matrix @ sparse.diags(self.weights)).tocsr()
+        self.matrix_t = self.matrix.T.tocsr()
+
+    def _top_row(self, cols, values, n: int, exclude) -> Neighbours:
+        """Mejores n de una fila: puntuación descendente y, a igualdad, id mayor primero"""
+        values = np.round(values, 9)
+        keep = values > 0
+        if exclude is not None:
+            keep &= ~np.isin(cols, exclude)
+        cols, values = cols[keep], values[keep]
+        if len(values) > n:
+            # Todos los empatados con el n-ésimo entran al desempate por id
+            threshold = np.partition(values, len(values) - n)[len(values) - n]
+            keep = values >= threshold
+            cols, values = cols[keep], values[keep]
+        ids = self.ids[cols]
+        order = np.lexsort((-ids, -values))[:n]
+        return [(float(values[i]), int(ids[i])) for i in order]
+
+    def _blocks(self, first: int, last: int):
+        # Coste de cada fila en el producto: suma del df de sus rasgos
+        df = np.diff(self.matrix_t.indptr)
+        cost = self.matrix[first:last] @ df.astype(np.float64)
+        start = 0
+        total = 0.0
+        for row, row_cost in enumerate(cost):
+            if row > start and total + row_cost > BLOCK_NNZ_BUDGET:
+                yield first + start, first + row
+                start, total = row, 0.0
+            total += row_cost
+        if start < len(cost):
+            yield first + start, first + len(cost)
+
+    def compute_all(self, n: int, first: int = 0, last: Optional[int] = None) -> Dict[int, Neighbours]:
+        """Vecinos de todas las medias (o de las filas first:last), mismo formato que similarity.compute_all"""
+        result: Dict[int, Neighbours] = {}
+        last = len(self.ids) if last is None else min(last, len(self.ids))
+        for start, end in self._blocks(first, last):
+            scores = (self.weighted[start:end] @ self.matrix_t).tocsr()
+            for offset in range(end - start):
+                row = start + offset
+                lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+                neighbours = self._top_row(scores.indices[lo:hi], scores.data[lo:hi], n, [row])
+                if neighbours:
+                    result[int(self.ids[row])] = neighbours
+        return result
+
+    def recommend(self, seed_ids: Iterable[int], n: int, exclude: Optional[Iterable[int]] = None) -> Neighbours:
+        """Medias más parecidas al conjunto de semillas (suma de sus puntuaciones por pares)"""
+        rows = [self.row_of[i] for i in seed_ids if i in self.row_of]
+        if not rows:
+            return []
+        profile = np.asarray(self.weighted[rows].sum(axis=0)).ravel()
+        scores = self.matrix @ profile
+        excluded = rows + [self.row_of[i] for i in (exclude or ()) if i in self.row_of]
+        return self._top_row(np.arange(len(scores)), scores, n, excluded)
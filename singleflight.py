@@ -0,0 +1,81 @@
+"""
+Single-flight: agrupa llamadas concurrentes idénticas.
+Si varios hilos piden la misma clave a la vez, solo el primero ejecuta la función;
+los demás esperan y reciben su mismo resultado (o su misma excepción).
+Pensado para los fallos de cache que acaban en TMDb.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class Group:
+    """Conjunto de vuelos en curso indexados por clave"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Ejecuta fn() una sola vez por clave entre las llamadas concurrentes"""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            # Las llamadas que lleguen a partir de aquí inician un vuelo nuevo
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["coalesce_rate"] = (stats["coalesced"] / stats["calls"] * 100) if stats["calls"] else 0
+        return stats
+
+
+# Grupo compartido por los endpoints que consultan TMDb
+tmdb_flights = Group()
+
+
+def do(key: Hashable, fn: Callable[[], Any]) -> Any:
+    return tmdb_flights.do(key, fn)
+
+
+def get_stats() -> Dict[str, Any]:
+    return tmdb_flights.get_stats()
@@ -0,0 +1,318 @@
+"""
+Estadísticas del catálogo calculadas en la base de datos.
+Agrupaciones, conteos, medias y top-N se resuelven en SQL (PostgreSQL) para que
+memoria y latencia no crezcan con el tamaño del catálogo.
+Los géneros usan la tabla de enlace media_genero cuando está disponible (catalog_links);
+el elenco y los directores se separan del texto con string_to_array/unnest.
+"""
+
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.orm import Session
+
+import catalog_links
+import models
+from database import NORM_ACCENTS, NORM_PLAIN
+
+
+def normalize(s: Optional[str]) -> str:
+    """Normalización en Python equivalente a sql_normalize (sin acentos, minúsculas, sin espacios)"""
+    return unicodedata.normalize('NFKD', s or '').encode('ASCII', 'ignore').decode('ASCII').lower().strip()
+
+
+def sql_normalize(column):
+    """
+    Expresión SQL que normaliza un texto: btrim(lower(translate(col, acentos, sin_acentos))).
+    Para `media.tipo` coincide con el índice idx_media_tipo_norm; las constantes van en
+    línea (no como parámetros) para que el planificador pueda usar el índice.
+    """
+    return func.btrim(func.lower(func.translate(
+        column,
+        literal_column(f"'{NORM_ACCENTS}'"),
+        literal_column(f"'{NORM_PLAIN}'"),
+    )))
+
+
+TIPO_NORM = sql_normalize(models.Media.tipo)
+
+# Texto SQL equivalente a sql_normalize para las consultas con unnest
+_NORM_SQL = "btrim(lower(translate({col}, '" + NORM_ACCENTS + "', '" + NORM_PLAIN + "')))"
+
+
+def count_medias(db: Session, pendiente: Optional[bool] = None, tipo: Optional[str] = None) -> int:
+    query = db.query(func.count(models.Media.id))
+    if pendiente is not None:
+        query = query.filter(models.Media.pendiente == pendiente)
+    if tipo:
+        query = query.filter(TIPO_NORM == normalize(tipo))
+    return query.scalar() or 0
+
+
+def rated_by_tipo(db: Session, tipo: str, best: bool = True, limit: Optional[int] = None):
+    """Medias vistas y con nota personal de un tipo, ordenadas por nota (mejor o peor primero)"""
+    order = models.Media.nota_personal.desc() if best else models.Media.nota_personal.asc()
+    query = db.query(models.Media).filter(
+        models.Media.pendiente == False,
+        models.Media.nota_personal != None,
+        TIPO_NORM == normalize(tipo),
+    ).order_by(order, models.Media.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def top_by_tipo(db: Session, tipo: str, limit: int = 5) -> List[Dict[str, object]]:
+    """Mejor valoradas de un tipo (resumen para /medias/top5)"""
+    return [
+        {
+            "id": m.id,
+            "titulo": m.titulo,
+            "nota_personal": m.nota_personal,
+            "anio": getattr(m, "anio", None),
+            "tipo": m.tipo
+        }
+        for m in rated_by_tipo(db, tipo, best=True, limit=limit)
+    ]
+
+
+def worst_by_tipo(db: Session, tipo: str):
+    """Media vista con la nota personal más baja de un tipo (o None)"""
+    return rated_by_tipo(db, tipo, best=False).first()
+
+
+_GENEROS_SQL = f"""
+    WITH generos AS (
+        SELECT btrim(g) AS nombre, m.nota_personal
+        FROM media m
+        CROSS JOIN LATERAL unnest(string_to_array(m.genero, ',')) AS g
+        WHERE m.pendiente = false AND m.genero IS NOT NULL
+    )
+    SELECT {_NORM_SQL.format(col='nombre')} AS clave,
+           min(nombre) AS nombre,
+           count(*) AS total,
+           avg(nota_personal) AS media_nota,
+           count(nota_personal) AS total_notas
+    FROM generos
+    WHERE nombre <> ''
+    GROUP BY clave
+"""
+
+
+def generos(db: Session) -> List[Tuple[str, int, Optional[float], int]]:
+    """[(nombre, vistos, nota_media, n_notas)] por género normalizado, más vistos primero"""
+    if catalog_links.is_ready():
+        # Join indexado sobre media_genero en lugar de separar el texto
+        total = func.count(models.Media.id)
+        rows = db.query(
+            models.Genero.nombre, total, func.avg(models.Media.nota_personal), func.count(models.Media.nota_personal)
+        ).join(models.media_genero, models.media_genero.c.genero_id == models.Genero.id).join(
+            models.Media, models.Media.id == models.media_genero.c.media_id
+        ).filter(models.Media.pendiente == False).group_by(
+            models.Genero.id, models.Genero.nombre
+        ).order_by(total.desc(), models.Genero.nombre).all()
+        return [(nombre, n, float(media) if media is not None else None, notas) for nombre, n, media, notas in rows]
+    rows = db.execute(text(_GENEROS_SQL + " ORDER BY total DESC, nombre")).all()
+    return [(r.nombre, r.total, r.media_nota, r.total_notas) for r in rows]
+
+
+def generos_destacados(db: Session) -> Dict[str, object]:
+    """Género más visto y género mejor valorado (media de nota personal)"""
+    return resumen_generos(generos(db))
+
+
+def vistos_por_anio(db: Session) -> Dict[int, int]:
+    """{año: vistos}, ordenado por año ascendente"""
+    rows = db.query(models.Media.anio, func.count(models.Media.id)).filter(
+        models.Media.pendiente == False,
+        models.Media.anio != None,
+        models.Media.anio != 0,
+    ).group_by(models.Media.anio).order_by(models.Media.anio).all()
+    return {anio: total for anio, total in rows}
+
+
+def _top_nombres_sql(column: str) -> str:
+    return f"""
+        SELECT btrim(p) AS nombre, count(*) AS total
+        FROM media m
+        CROSS JOIN LATERAL unnest(string_to_array(m.{column}, ',')) AS p
+        WHERE m.pendiente = false AND m.{column} IS NOT NULL AND btrim(p) <> ''
+        GROUP BY btrim(p)
+        ORDER BY total DESC, nombre
+        LIMIT :limit
+    """
+
+
+def top_personas(db: Session, limit: int = 5) -> Dict[str, List[Tuple[str, int]]]:
+    """Actores (elenco) y directores que más aparecen en lo visto"""
+    actores = db.execute(text(_top_nombres_sql("elenco")), {"limit": limit}).all()
+    directores = db.execute(text(_top_nombres_sql("director")), {"limit": limit}).all()
+    return {
+        "top_actores": [(r.nombre, r.total) for r in actores],
+        "top_directores": [(r.nombre, r.total) for r in directores],
+    }
+
+
+# --- Panel de estadísticas (/medias/stats) ---
+
+DASHBOARD_FIELDS = (
+    "distribucion_generos",
+    "generos_vistos",
+    "vistos_por_anio",
+    "top_personas",
+    "top5",
+    "peor_pelicula",
+    "peor_serie",
+)
+
+_DASHBOARD_VISTOS = f"""
+    WITH vistos AS (
+        SELECT id, titulo, anio, tipo, nota_personal, genero, elenco, director,
+               {_NORM_SQL.format(col='tipo')} AS tipo_norm
+        FROM media
+        WHERE pendiente = false
+    ),"""
+
+# Géneros separando el texto de media.genero
+_DASHBOARD_GENEROS_TEXT = f"""
+    generos AS (
+        SELECT {_NORM_SQL.format(col='nombre')} AS clave,
+               min(nombre) AS nombre,
+               count(*) AS total,
+               avg(nota_personal) AS media_nota,
+               count(nota_personal) AS total_notas
+        FROM (
+            SELECT btrim(g) AS nombre, v.nota_personal
+            FROM vistos v
+            CROSS JOIN LATERAL unnest(string_to_array(v.genero, ',')) AS g
+        ) x
+        WHERE nombre <> ''
+        GROUP BY clave
+    ),"""
+
+# Géneros con la tabla de enlace media_genero (catalog_links completo), como generos()
+_DASHBOARD_GENEROS_LINKS = """
+    generos AS (
+        SELECT g.nombre,
+               count(*) AS total,
+               avg(v.nota_personal) AS media_nota,
+               count(v.nota_personal) AS total_notas
+        FROM vistos v
+        JOIN media_genero mg ON mg.media_id = v.id
+        JOIN genero g ON g.id = mg.genero_id
+        GROUP BY g.id, g.nombre
+    ),"""
+
+_DASHBOARD_CTES = """
+    personas AS (
+        SELECT rol, nombre, total,
+               row_number() OVER (PARTITION BY rol ORDER BY total DESC, nombre) AS posicion
+        FROM (
+            SELECT rol, nombre, count(*) AS total
+            FROM (
+                SELECT 'actor' AS rol, btrim(p) AS nombre
+                FROM vistos v CROSS JOIN LATERAL unnest(string_to_array(v.elenco, ',')) AS p
+                UNION ALL
+                SELECT 'director' AS rol, btrim(p) AS nombre
+                FROM vistos v CROSS JOIN LATERAL unnest(string_to_array(v.director, ',')) AS p
+            ) todas
+            WHERE nombre <> ''
+            GROUP BY rol, nombre
+        ) conteo
+    ),
+    ranking AS (
+        SELECT id, titulo, nota_personal, anio, tipo, tipo_norm,
+               row_number() OVER (PARTITION BY tipo_norm ORDER BY nota_personal DESC, id) AS mejor,
+               row_number() OVER (PARTITION BY tipo_norm ORDER BY nota_personal ASC, id) AS peor
+        FROM vistos
+        WHERE nota_personal IS NOT NULL AND tipo_norm IN ('pelicula', 'serie')
+    )
+"""
+
+# Columnas del SELECT final; PostgreSQL no evalúa los CTE que no se usan
+_DASHBOARD_COLUMNS = {
+    "generos": """(SELECT coalesce(json_agg(json_build_array(nombre, total, media_nota, total_notas)
+                    ORDER BY total DESC, nombre), '[]') FROM generos)""",
+    "anios": """(SELECT coalesce(json_agg(json_build_array(anio, total) ORDER BY anio), '[]')
+                 FROM (SELECT anio, count(*) AS total FROM vistos
+                       WHERE anio IS NOT NULL AND anio <> 0 GROUP BY anio) a)""",
+    "personas": """(SELECT coalesce(json_agg(json_build_array(rol, nombre, total) ORDER BY rol, posicion), '[]')
+                    FROM personas WHERE posicion <= :limit)""",
+    "top5": """(SELECT coalesce(json_agg(json_build_object(
+                    'id', id, 'titulo', titulo, 'nota_personal', nota_personal,
+                    'anio', anio, 'tipo', tipo, 'tipo_norm', tipo_norm
+                ) ORDER BY tipo_norm, mejor), '[]') FROM ranking WHERE mejor <= :limit)""",
+    "peores": """(SELECT coalesce(json_object_agg(tipo_norm, id), '{}') FROM ranking WHERE peor = 1)""",
+}
+
+
+def resumen_generos(generos_rows) -> Dict[str, object]:
+    """Más visto / mejor valorado a partir de [(nombre, total, media, n_notas)] ordenado por total"""
+    mas_visto = generos_rows[0] if generos_rows else None
+    valorados = sorted((g for g in generos_rows if g[3] > 0), key=lambda g: (-g[2], -g[3], g[0]))
+    mejor = valorados[0] if valorados else None
+    return {
+        "mas_visto": mas_visto[0] if mas_visto else '',
+        "mas_visto_count": mas_visto[1] if mas_visto else 0,
+        "mejor_valorado": mejor[0] if mejor else '',
+        "mejor_valorado_media": round(float(mejor[2]), 2) if mejor else '',
+    }
+
+
+def dashboard(db: Session, fields=DASHBOARD_FIELDS, limit: int = 5) -> Dict[str, object]:
+    """
+    Todas las estadísticas del panel en una sola sentencia SQL (varios CTE sobre un único
+    recorrido de las medias vistas). Solo se calculan las partes que piden `fields`.
+    Los géneros salen de media_genero cuando catalog_links está listo, como en generos().
+    Las peores película/serie se devuelven como objetos Media.
+    """
+    fields = set(fields)
+    columns = set()
+    if fields & {"distribucion_generos", "generos_vistos"}:
+        columns.add("generos")
+    if "vistos_por_anio" in fields:
+        columns.add("anios")
+    if "top_personas" in fields:
+        columns.add("personas")
+    if "top5" in fields:
+        columns.add("top5")
+    if fields & {"peor_pelicula", "peor_serie"}:
+        columns.add("peores")
+    if not columns:
+        return {}
+
+    select = ",\n".join(f"{_DASHBOARD_COLUMNS[name]} AS {name}" for name in sorted(columns))
+    generos_cte = _DASHBOARD_GENEROS_LINKS if catalog_links.is_ready() else _DASHBOARD_GENEROS_TEXT
+    sql = f"{_DASHBOARD_VISTOS}{generos_cte}{_DASHBOARD_CTES} SELECT {select}"
+    row = db.execute(text(sql), {"limit": limit}).mappings().one()
+
+    result: Dict[str, object] = {}
+    if "generos" in columns:
+        generos_rows = [tuple(g) for g in row["generos"]]
+        if "distribucion_generos" in fields:
+            result["distribucion_generos"] = {nombre: total for nombre, total, _, _ in generos_rows}
+        if "generos_vistos" in fields:
+            result["generos_vistos"] = resumen_generos(generos_rows)
+    if "anios" in columns:
+        result["vistos_por_anio"] = {anio: total for anio, total in row["anios"]}
+    if "personas" in columns:
+        personas = row["personas"]
+        result["top_personas"] = {
+            "top_actores": [(nombre, total) for rol, nombre, total in personas if rol == "actor"],
+            "top_directores": [(nombre, total) for rol, nombre, total in personas if rol == "director"],
+        }
+    if "top5" in columns:
+        top5 = {"pelicula": [], "serie": []}
+        for item in row["top5"]:
+            top5[item.pop("tipo_norm")].append(item)
+        result["top5"] = top5
+    if "peores" in columns:
+        peores = row["peores"] or {}
+        ids = [peores[t] for t in ("pelicula", "serie") if t in peores]
+        medias = {m.id: m for m in db.query(models.Media).filter(models.Media.id.in_(ids))} if ids else {}
+        if "peor_pelicula" in fields:
+            result["peor_pelicula"] = medias.get(peores.get("pelicula"))
+        if "peor_serie" in fields:
+            result["peor_serie"] = medias.get(peores.get("serie"))
+    return result
@@ -0,0 +1,326 @@
+"""
+Instantánea en memoria de las estadísticas del catálogo.
+
+Se construye una vez con una consulta ligera (solo las columnas necesarias) y después
+se mantiene de forma incremental con los eventos de catalog_events, así que los
+endpoints de estadísticas leen valores ya calculados en lugar de recorrer el catálogo.
+
+Garantía `stale_after`: una instantánea con más de STATS_STALE_AFTER segundos se
+sigue sirviendo, pero se reconstruye desde la base de datos en segundo plano
+(stale-while-revalidate, como poster_cache); solo la primera construcción se hace en
+la petición. Eso acota la deriva por escrituras que no pasan por este proceso (otros
+workers, SQL manual).
+
+Las medias con pendiente NULL cuentan en el total pero no como vistas ni como
+pendientes, igual que los filtros pendiente = true/false de stats.py.
+Para forzar una reconstrucción: POST /medias/stats/rebuild
+"""
+
+import bisect
+import threading
+import time
+from collections import Counter, namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, sessionmaker
+
+import catalog_events
+import models
+from config import STATS_STALE_AFTER
+from stats import DASHBOARD_FIELDS, normalize, resumen_generos
+
+# Columnas de Media que intervienen en las estadísticas
+MediaRow = namedtuple(
+    "MediaRow",
+    ["id", "titulo", "anio", "tipo", "pendiente", "nota_personal", "genero", "elenco", "director"],
+)
+
+
+def _row_from_media(media) -> MediaRow:
+    return MediaRow(*(getattr(media, field, None) for field in MediaRow._fields))
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+class _Snapshot:
+    """Agregados del catálogo. No es thread-safe: el acceso se serializa en StatsSnapshot."""
+
+    def __init__(self):
+        self.rows: Dict[int, MediaRow] = {}
+        self.counts: Counter = Counter()          # (pendiente o None, tipo_norm) -> medias
+        self.generos: Dict[str, Dict[str, Any]] = {}  # genero_norm -> {nombres, total, suma, notas}
+        self.anios: Counter = Counter()
+        self.actores: Counter = Counter()
+        self.directores: Counter = Counter()
+        # tipo_norm -> [(-nota, id)] ordenada: mejor nota primero, id como desempate
+        self.ratings: Dict[str, List[Tuple[float, int]]] = {}
+
+    def add(self, row: MediaRow, sign: int = 1) -> None:
+        tipo = normalize(row.tipo)
+        # pendiente tal cual (True/False/None): NULL no es ni vista ni pendiente, como en SQL
+        self.counts[(row.pendiente, tipo)] += sign
+        if row.pendiente is not False:
+            return
+        if row.nota_personal is not None:
+            ratings = self.ratings.setdefault(tipo, [])
+            entry = (-row.nota_personal, row.id)
+            if sign > 0:
+                bisect.insort(ratings, entry)
+            else:
+                i = bisect.bisect_left(ratings, entry)
+                if i < len(ratings) and ratings[i] == entry:
+                    del ratings[i]
+        for g in _split(row.genero):
+            agg = self.generos.setdefault(normalize(g), {"nombres": Counter(), "total": 0, "suma": 0.0, "notas": 0})
+            agg["nombres"][g] += sign
+            agg["total"] += sign
+            if row.nota_personal is not None:
+                agg["suma"] += sign * row.nota_personal
+                agg["notas"] += sign
+        if row.anio:
+            self.anios[row.anio] += sign
+        for actor in _split(row.elenco):
+            self.actores[actor] += sign
+        for director in _split(row.director):
+            self.directores[director] += sign
+
+    def upsert(self, row: MediaRow) -> None:
+        old = self.rows.get(row.id)
+        if old is not None:
+            self.add(old, -1)
+        self.rows[row.id] = row
+        self.add(row)
+
+    def remove(self, media_id: int) -> None:
+        old = self.rows.pop(media_id, None)
+        if old is not None:
+            self.add(old, -1)
+
+
+def _top(counter: Counter, n: int) -> List[Tuple[str, int]]:
+    """Top-n por conteo descendente y nombre ascendente (mismo orden que stats.py)"""
+    return sorted(((k, v) for k, v in counter.items() if v > 0), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+
+class StatsSnapshot:
+    def __init__(self, stale_after: float = STATS_STALE_AFTER):
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._built_at = 0.0
+        self._version = 0
+        self._derived: Dict[str, Any] = {}
+        # Eventos recibidos mientras se reconstruye; se reaplican sobre la nueva instantánea
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+        self.rebuilds = 0
+        self.background_rebuilds = 0
+        self.incremental_updates = 0
+
+    # --- Construcción ---
+
+    def rebuild(self, db: Session) -> Dict[str, Any]:
+        """Reconstrucción completa desde la base de datos (corrige cualquier deriva)"""
+        with self._rebuild_lock:
+            return self._rebuild_locked(db)
+
+    def _rebuild_locked(self, db: Session) -> Dict[str, Any]:
+        started = time.time()
+        with self._lock:
+            self._pending = []
+        try:
+            columns = [getattr(models.Media, field) for field in MediaRow._fields]
+            snapshot = _Snapshot()
+            for values in db.query(*columns).yield_per(1000):
+                snapshot.upsert(MediaRow(*values))
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for kind, payload in self._pending:
+                if kind == "upsert":
+                    snapshot.upsert(payload)
+                else:
+                    snapshot.remove(payload)
+            self._pending = None
+            self._snapshot = snapshot
+            self._built_at = time.time()
+            self._version += 1
+            self._derived = {}
+            self.rebuilds += 1
+        return {"medias": len(snapshot.rows), "elapsed_ms": round((time.time() - started) * 1000)}
+
+    def _is_stale(self) -> bool:
+        return self._snapshot is None or time.time() - self._built_at > self.stale_after
+
+    def _ensure_fresh(self, db: Session) -> None:
+        if self._snapshot is None:
+            # Primera construcción: no hay nada que servir mientras tanto
+            with self._rebuild_lock:
+                if self._snapshot is None:
+                    self._rebuild_locked(db)
+        elif self._is_stale() and self._rebuild_lock.acquire(blocking=False):
+            # Caducada: se sirve la actual y se reconstruye en segundo plano (una a la vez)
+            self.background_rebuilds += 1
+            threading.Thread(
+                target=self._rebuild_in_background, args=(sessionmaker(bind=db.get_bind()),),
+                name="stats-snapshot-rebuild", daemon=True,
+            ).start()
+
+    def _rebuild_in_background(self, session_factory) -> None:
+        db = session_factory()
+        try:
+            self._rebuild_locked(db)
+        except Exception as e:
+            print(f"⚠️ Error reconstruyendo la instantánea de estadísticas: {e}")
+        finally:
+            db.close()
+            self._rebuild_lock.release()
+
+    def on_event(self, event: str, media_id: int, media=None) -> None:
+        if event == catalog_events.MEDIA_DELETED:
+            change = ("remove", media_id)
+        elif media is not None:
+            change = ("upsert", _row_from_media(media))
+        else:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self._snapshot is None:
+                return
+            if change[0] == "upsert":
+                self._snapshot.upsert(change[1])
+            else:
+                self._snapshot.remove(change[1])
+            self._version += 1
+            self._derived = {}
+            self.incremental_updates += 1
+
+    def _read(self, db: Session, name: str, compute):
+        """Valor derivado memoizado por versión de la instantánea"""
+        self._ensure_fresh(db)
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = compute(self._snapshot)
+            return self._derived[name]
+
+    # --- Lecturas ---
+
+    def count_medias(self, db: Session, pendiente: Optional[bool] = None, tipo: Optional[str] = None) -> int:
+        def compute(s: _Snapshot):
+            tipo_norm = normalize(tipo) if tipo else None
+            return sum(
+                n for (p, t), n in s.counts.items()
+                if (pendiente is None or p == pendiente) and (tipo_norm is None or t == tipo_norm)
+            )
+        return self._read(db, f"count:{pendiente}:{normalize(tipo) if tipo else ''}", compute)
+
+    def rated_ids(self, db: Session, tipo: str, best: bool = True, limit: int = 1) -> List[int]:
+        """Ids de medias vistas con nota, por nota descendente (best) o ascendente"""
+        def compute(s: _Snapshot):
+            ratings = s.ratings.get(normalize(tipo), [])
+            if best:
+                return [media_id for _, media_id in ratings[:limit]]
+            # Peores: desde el final, pero con id ascendente dentro de la misma nota
+            result = []
+            end = len(ratings)
+            while end > 0 and len(result) < limit:
+                start = bisect.bisect_left(ratings, (ratings[end - 1][0],))
+                result.extend(media_id for _, media_id in ratings[start:end])
+                end = start
+            return result[:limit]
+        return self._read(db, f"rated:{normalize(tipo)}:{best}:{limit}", compute)
+
+    def worst_by_tipo(self, db: Session, tipo: str):
+        ids = self.rated_ids(db, tipo, best=False, limit=1)
+        return db.get(models.Media, ids[0]) if ids else None
+
+    def top_by_tipo(self, db: Session, tipo: str, limit: int = 5) -> List[Dict[str, Any]]:
+        def compute(s: _Snapshot):
+            result = []
+            for _, media_id in s.ratings.get(normalize(tipo), [])[:limit]:
+                row = s.rows[media_id]
+                result.append({
+                    "id": row.id,
+                    "titulo": row.titulo,
+                    "nota_personal": row.nota_personal,
+                    "anio": row.anio,
+                    "tipo": row.tipo,
+                })
+            return result
+        return self._read(db, f"top:{normalize(tipo)}:{limit}", compute)
+
+    def generos(self, db: Session) -> List[Tuple[str, int, Optional[float], int]]:
+        """[(nombre, vistos, nota_media, n_notas)] más vistos primero"""
+        def compute(s: _Snapshot):
+            result = []
+            for agg in s.generos.values():
+                if agg["total"] <= 0:
+                    continue
+                nombre = min(n for n, c in agg["nombres"].items() if c > 0)
+                media_nota = agg["suma"] / agg["notas"] if agg["notas"] > 0 else None
+                result.append((nombre, agg["total"], media_nota, agg["notas"]))
+            result.sort(key=lambda g: (-g[1], g[0]))
+            return result
+        return self._read(db, "generos", compute)
+
+    def generos_destacados(self, db: Session) -> Dict[str, Any]:
+        return resumen_generos(self.generos(db))
+
+    def vistos_por_anio(self, db: Session) -> Dict[int, int]:
+        return self._read(db, "anios", lambda s: {a: n for a, n in sorted(s.anios.items()) if n > 0})
+
+    def top_personas(self, db: Session, limit: int = 5) -> Dict[str, List[Tuple[str, int]]]:
+        return self._read(db, f"personas:{limit}", lambda s: {
+            "top_actores": _top(s.actores, limit),
+            "top_directores": _top(s.directores, limit),
+        })
+
+    def dashboard(self, db: Session, fields=DASHBOARD_FIELDS, limit: int = 5) -> Dict[str, Any]:
+        """Mismo resultado que stats.dashboard, leído de la instantánea"""
+        fields = set(fields)
+        result: Dict[str, Any] = {}
+        if "distribucion_generos" in fields:
+            result["distribucion_generos"] = {nombre: total for nombre, total, _, _ in self.generos(db)}
+        if "generos_vistos" in fields:
+            result["generos_vistos"] = self.generos_destacados(db)
+        if "vistos_por_anio" in fields:
+            result["vistos_por_anio"] = self.vistos_por_anio(db)
+        if "top_personas" in fields:
+            result["top_personas"] = self.top_personas(db, limit)
+        if "top5" in fields:
+            result["top5"] = {tipo: self.top_by_tipo(db, tipo, limit) for tipo in ("pelicula", "serie")}
+        peores = {
+            field: self.rated_ids(db, tipo, best=False, limit=1)
+            for field, tipo in (("peor_pelicula", "pelicula"), ("peor_serie", "serie"))
+            if field in fields
+        }
+        if peores:
+            ids = [ids[0] for ids in peores.values() if ids]
+            medias = {m.id: m for m in db.query(models.Media).filter(models.Media.id.in_(ids))} if ids else {}
+            for field, ids in peores.items():
+                result[field] = medias.get(ids[0]) if ids else None
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            built = self._snapshot is not None
+            return {
+                "built": built,
+                "medias": len(self._snapshot.rows) if built else 0,
+                "age_seconds": round(time.time() - self._built_at, 1) if built else None,
+                "stale_after": self.stale_after,
+                "version": self._version,
+                "rebuilds": self.rebuilds,
+                "background_rebuilds": self.background_rebuilds,
+                "incremental_updates": self.incremental_updates,
+            }
+
+
+snapshot = StatsSnapshot()
+catalog_events.subscribe(snapshot.on_event)
+
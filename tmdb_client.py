@@ -0,0 +1,216 @@
+"""
+Cliente compartido para la API de TMDb.
+Reutiliza conexiones keep-alive (HTTP/2 si está disponible), limita la
+concurrencia por host y reparte un presupuesto común de peticiones por segundo.
+Ofrece una cara síncrona para los endpoints que se ejecutan en el threadpool
+y otra asíncrona para código asyncio.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import (
+    TMDB_BASE_URL,
+    TMDB_API_KEY,
+    REQUEST_TIMEOUT,
+    TMDB_HTTP2,
+    TMDB_MAX_CONNECTIONS,
+    TMDB_MAX_KEEPALIVE,
+    TMDB_KEEPALIVE_EXPIRY,
+    TMDB_MAX_CONCURRENCY_PER_HOST,
+    TMDB_RATE_LIMIT,
+    TMDB_RATE_BURST,
+    get_tmdb_auth_headers,
+)
+
+# HTTP/2 es opcional: requiere el paquete 'h2' (pip install httpx[http2])
+try:
+    import h2  # type: ignore  # noqa: F401
+    HTTP2_ENABLED = TMDB_HTTP2
+except ImportError:
+    HTTP2_ENABLED = False
+
+_TMDB_HOST = urlsplit(TMDB_BASE_URL).netloc
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    """Configuración común a los clientes síncrono y asíncrono"""
+    headers = get_tmdb_auth_headers()
+    params = {}
+    # Preferir Bearer; si no hay, usar api_key como parámetro
+    if not headers and TMDB_API_KEY:
+        params["api_key"] = TMDB_API_KEY
+    return {
+        "base_url": TMDB_BASE_URL,
+        "headers": headers,
+        "params": params,
+        "timeout": REQUEST_TIMEOUT,
+        "http2": HTTP2_ENABLED,
+        "limits": httpx.Limits(
+            max_connections=TMDB_MAX_CONNECTIONS,
+            max_keepalive_connections=TMDB_MAX_KEEPALIVE,
+            keepalive_expiry=TMDB_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _host_for(path: str) -> str:
+    if path.startswith("http://") or path.startswith("https://"):
+        return urlsplit(path).netloc
+    return _TMDB_HOST
+
+
+class _RateLimiter:
+    """Token bucket compartido entre hilos y event loops"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserva un token y devuelve los segundos que hay que esperar antes de usarlo"""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+_rate_limiter = _RateLimiter(TMDB_RATE_LIMIT, TMDB_RATE_BURST)
+
+
+# --- Cara síncrona (threadpool de FastAPI) ---
+
+_sync_client: Optional[httpx.Client] = None
+_sync_lock = threading.Lock()
+_sync_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(**_client_kwargs())
+    return _sync_client
+
+
+def _sync_semaphore(host: str) -> threading.BoundedSemaphore:
+    sem = _sync_semaphores.get(host)
+    if sem is None:
+        with _sync_lock:
+            sem = _sync_semaphores.setdefault(
+                host, threading.BoundedSemaphore(TMDB_MAX_CONCURRENCY_PER_HOST)
+            )
+    return sem
+
+
+def get(path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+    """GET síncrono contra TMDb. `path` es relativo a TMDB_BASE_URL (ej: '/movie/550')."""
+    client = _get_sync_client()
+    delay = _rate_limiter.reserve()
+    if delay:
+        time.sleep(delay)
+    with _sync_semaphore(_host_for(path)):
+        return client.get(path, params=params)
+
+
+def close() -> None:
+    """Cerrar los pools de conexiones (síncrono y del loop dedicado)"""
+    global _sync_client, _runner_loop
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+    with _runner_lock:
+        if _runner_loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(aclose(), _runner_loop).result(timeout=5)
+            finally:
+                _runner_loop.call_soon_threadsafe(_runner_loop.stop)
+                _runner_loop = None
+
+
+# --- Cara asíncrona (un cliente por event loop) ---
+
+class _LoopState:
+    def __init__(self):
+        self.client = httpx.AsyncClient(**_client_kwargs())
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        sem = self.semaphores.get(host)
+        if sem is None:
+            sem = self.semaphores[host] = asyncio.Semaphore(TMDB_MAX_CONCURRENCY_PER_HOST)
+        return sem
+
+
+_loop_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+
+def _get_loop_state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        with _sync_lock:
+            state = _loop_states.get(loop)
+            if state is None:
+                state = _loop_states[loop] = _LoopState()
+    return state
+
+
+async def aget(path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+    """GET asíncrono contra TMDb. Comparte pool y límites dentro del event loop actual."""
+    state = _get_loop_state()
+    delay = _rate_limiter.reserve()
+    if delay:
+        await asyncio.sleep(delay)
+    async with state.semaphore(_host_for(path)):
+        return await state.client.get(path, params=params)
+
+
+async def aclose() -> None:
+    """Cerrar el cliente asíncrono del event loop actual"""
+    loop = asyncio.get_running_loop()
+    state = _loop_states.pop(loop, None)
+    if state is not None:
+        await state.client.aclose()
+
+
+# --- Loop dedicado para que el código síncrono pueda lanzar peticiones en paralelo ---
+
+_runner_loop: Optional[asyncio.AbstractEventLoop] = None
+_runner_lock = threading.Lock()
+
+
+def _get_runner_loop() -> asyncio.AbstractEventLoop:
+    global _runner_loop
+    if _runner_loop is None:
+        with _runner_lock:
+            if _runner_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="tmdb-client-loop", daemon=True).start()
+                _runner_loop = loop
+    return _runner_loop
+
+
+def run(coro, timeout: Optional[float] = None):
+    """Ejecuta una corrutina en el loop del cliente y espera su resultado.
+    Pensado para endpoints síncronos; no llamar desde dentro de un event loop.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_runner_loop())
+    return future.result(timeout)
@@ -0,0 +1,120 @@
+"""
+Cache de respuestas para los endpoints proxy de TMDb (/tmdb/...).
+Reutiliza el backend del cache de portadas: Redis si está disponible y,
+si no, un LRU en memoria con presupuesto propio. Cada entrada guarda el
+cuerpo JSON tal cual llega de TMDb junto con un ETag calculado aquí (md5 del
+cuerpo, http_cache.make_etag) para los 304 de nuestros clientes; el ETag que
+envía TMDb no se guarda ni se usa para revalidar contra TMDb.
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import poster_cache
+import singleflight
+from config import TMDB_CACHE_TTLS, TMDB_CACHE_MAX_BYTES
+from http_cache import make_etag
+
+REDIS_PREFIX = "tmdb:"
+
+_memory_cache = poster_cache.ShardedLRUCache(TMDB_CACHE_MAX_BYTES, 8)
+_stats = poster_cache.AtomicCounters("hits", "misses", "sets")
+
+
+def make_key(path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Clave de cache: ruta + parámetros normalizados (ordenados, sin vacíos)"""
+    normalized = sorted(
+        (str(k).lower(), str(v).strip())
+        for k, v in (params or {}).items()
+        if v is not None and str(v).strip() != ""
+    )
+    return f"{path.rstrip('/')}?{urlencode(normalized)}"
+
+
+def _pack(etag: str, body: str) -> str:
+    return f"{etag}\n{body}"
+
+
+def _unpack(value: str) -> Tuple[str, str]:
+    etag, _, body = value.partition("\n")
+    return body, etag
+
+
+def _lookup(key: str) -> Optional[str]:
+    redis_client = poster_cache.redis_client
+    if redis_client:
+        try:
+            cached = redis_client.get(REDIS_PREFIX + key)
+            if cached:
+                return cached
+        except Exception:
+            pass  # Fallback a memoria
+    entry = _memory_cache.get(key, time.time())
+    return entry[0] if entry else None
+
+
+def _store(key: str, value: str, ttl: int) -> None:
+    _stats.incr("sets")
+    redis_client = poster_cache.redis_client
+    if redis_client:
+        try:
+            redis_client.setex(REDIS_PREFIX + key, ttl, value)
+            return
+        except Exception:
+            pass  # Fallback a memoria
+    expires_at = time.time() + ttl
+    _memory_cache.set(key, value, expires_at, expires_at)
+
+
+def get_or_fetch(
+    path: str,
+    params: Optional[Dict[str, Any]],
+    ttl_class: str,
+    fetch: Callable[[], str],
+) -> Tuple[str, str]:
+    """
+    Devuelve (cuerpo_json, etag) para la petición a TMDb `path` + `params`.
+    En un fallo llama a fetch() (una sola vez aunque haya peticiones simultáneas)
+    y guarda el resultado con el TTL de `ttl_class`. Si fetch() lanza, no se cachea nada.
+    """
+    key = make_key(path, params)
+    cached = _lookup(key)
+    if cached is not None:
+        _stats.incr("hits")
+        return _unpack(cached)
+    _stats.incr("misses")
+
+    def load() -> str:
+        body = fetch()
+        value = _pack(make_etag(body), body)
+        _store(key, value, TMDB_CACHE_TTLS[ttl_class])
+        return value
+
+    return _unpack(singleflight.do(("tmdb_proxy", key), load))
+
+
+def clear() -> int:
+    """Vaciar el cache de respuestas; devuelve cuántas entradas se borraron"""
+    cleared = 0
+    redis_client = poster_cache.redis_client
+    if redis_client:
+        try:
+            keys = redis_client.keys(REDIS_PREFIX + "*")
+            if keys:
+                cleared += redis_client.delete(*keys)
+        except Exception:
+            pass
+    return cleared + _memory_cache.clear()
+
+
+def get_stats() -> Dict[str, Any]:
+    stats = _stats.copy()
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] / total * 100) if total else 0
+    stats["memory_cache_size"] = len(_memory_cache)
+    stats["memory_cache_bytes"] = _memory_cache.bytes
+    stats["memory_cache_max_bytes"] = _memory_cache.max_bytes
+    stats["memory_evictions"] = _memory_cache.evictions
+    stats["ttls"] = dict(TMDB_CACHE_TTLS)
+    return stats
@@ -0,0 +1,149 @@
+"""
+Totales de los listados (X-Total-Count) sin duplicar el coste de cada petición.
+
+- El conteo se hace sobre la consulta ya filtrada pero proyectada a COUNT(media.id):
+  sin joinedload de tags, sin ORDER BY y sin subconsulta envolvente.
+- El resultado se guarda por firma normalizada de filtros y se invalida entero con
+  cualquier escritura del catálogo (catalog_events); TOTALS_CACHE_TTL acota la
+  deriva por escrituras de otros procesos.
+- total_mode=estimate usa la estimación de filas del planificador (EXPLAIN) cuando
+  pasa de TOTALS_ESTIMATE_THRESHOLD; por debajo el conteo exacto ya es barato.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Query, Session
+
+import catalog_events
+import models
+from config import TOTALS_CACHE_MAX_ENTRIES, TOTALS_CACHE_TTL, TOTALS_ESTIMATE_THRESHOLD
+
+MODES = ("exact", "estimate")
+
+
+def signature(scope: str, **filters: Any) -> Tuple:
+    """
+    Clave de cache: filtros sin valores vacíos, ordenados y con el texto en minúsculas
+    (los filtros usan ILIKE; los acentos sí distinguen, así que no se eliminan).
+    """
+    items = []
+    for name, value in sorted(filters.items()):
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            value = value.strip().lower()
+        items.append((name, value))
+    return (scope, tuple(items))
+
+
+def _count_query(query: Query) -> Query:
+    # with_entities descarta las opciones de carga (joinedload) del SELECT original
+    return query.with_entities(sa.func.count(models.Media.id)).order_by(None)
+
+
+def exact_count(query: Query) -> int:
+    return _count_query(query).scalar() or 0
+
+
+def estimate_count(db: Session, query: Query) -> Optional[int]:
+    """Filas estimadas por el planificador para la consulta (None si no hay estimación)"""
+    if db.bind.dialect.name != "postgresql":
+        return None
+    statement = query.with_entities(models.Media.id).order_by(None).statement
+    compiled = statement.compile(dialect=db.bind.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positiontup is not None:
+        # Drivers con parámetros posicionales ($1 en asyncpg)
+        params = tuple(params[name] for name in compiled.positiontup)
+    row = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    plan = json.loads(row) if isinstance(row, str) else row
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class TotalsCache:
+    def __init__(self, ttl: float = TOTALS_CACHE_TTL, max_entries: int = TOTALS_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple, Tuple[float, int, bool]] = {}
+        # Se incrementa con cada escritura: un conteo iniciado antes no se guarda después
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.estimates = 0
+        self.invalidations = 0
+
+    def _get(self, key: Tuple) -> Optional[Tuple[int, bool]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def _set(self, key: Tuple, generation: int, total: int, estimated: bool) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (time.time(), total, estimated)
+
+    def count(self, db: Session, query: Query, key: Tuple, mode: str = "exact") -> Tuple[int, bool]:
+        """(total, es_estimación) para `query`, desde la cache si está vigente"""
+        mode = mode if mode in MODES else "exact"
+        key = key + (mode,)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            generation = self._generation
+        total, estimated = None, False
+        if mode == "estimate":
+            try:
+                estimate = estimate_count(db, query)
+            except Exception as e:
+                print(f"⚠️ No se pudo estimar el total: {e}")
+                estimate = None
+            if estimate is not None and estimate >= TOTALS_ESTIMATE_THRESHOLD:
+                total, estimated = estimate, True
+                with self._lock:
+                    self.estimates += 1
+        if total is None:
+            total = exact_count(query)
+        self._set(key, generation, total, estimated)
+        return total, estimated
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._generation += 1
+            self.invalidations += 1
+            return removed
+
+    def on_event(self, event: str, media_id: Optional[int], media=None) -> None:
+        self.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "estimates": self.estimates,
+                "invalidations": self.invalidations,
+                "estimate_threshold": TOTALS_ESTIMATE_THRESHOLD,
+            }
+
+
+totals = TotalsCache()
+catalog_events.subscribe(totals.on_event)
@@ -5,9 +5,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from models import ContentTranslation, Media
 from datetime import datetime
-import requests
+import tmdb_client
 import logging
-from config import get_tmdb_auth_headers, TMDB_BASE_URL, TMDB_API_KEY, REQUEST_TIMEOUT
+from config import TMDB_BASE_URL, TMDB_API_KEY
 
 logger = logging.getLogger(__name__)
 
@@ -69,14 +69,8 @@ class TranslationService:
             # Determine endpoint based on media type
             endpoint = "movie" if media_type.lower() in ["movie", "película", "pelicula"] else "tv"
             
-            url = f"{self.tmdb_base_url}/{endpoint}/{tmdb_id}"
-            headers = get_tmdb_auth_headers()
-            # Prefer Bearer header; if not present, fall back to API key param
-            params = {"language": tmdb_language}
-            if not headers and self.tmdb_api_key:
-                params["api_key"] = self.tmdb_api_key
-            
-            response = requests.get(url, headers=headers or None, params=params, timeout=REQUEST_TIMEOUT)
+            # Shared pooled client handles auth (Bearer or api_key)
+            response = tmdb_client.get(f"/{endpoint}/{tmdb_id}", params={"language": tmdb_language})
             response.raise_for_status()
             data = response.json()
             